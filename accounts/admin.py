@@ -2,9 +2,11 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from job_board.admin_paging import LargeTableAdmin
 from .models import User, Company, Applicant
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdmin, BaseUserAdmin):
     """
     Defines a custom admin panel for our User model.
     This fixes the issue where saving a user requires re-entering a password.
@@ -15,7 +17,7 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ('is_staff', 'is_active', 'user_type')
     # These are the fields available for searching
     search_fields = ('username', 'email')
-    # This controls the ordering of users
+    # This controls the ordering of users. Usernames are unique, so this is indexed.
     ordering = ('username',)
 
     # This is the most important part. It organizes the fields on the user edit page.
@@ -33,5 +35,21 @@ class UserAdmin(BaseUserAdmin):
 
 # Register our custom User admin
 admin.site.register(User, UserAdmin)
-admin.site.register(Company)
-admin.site.register(Applicant)
\ No newline at end of file
+
+
+@admin.register(Company)
+class CompanyAdmin(LargeTableAdmin):
+    list_display = ('name', 'user', 'website')
+    list_select_related = ('user',)
+    # Also used by the company autocomplete on the job form.
+    search_fields = ('name', '=user__username')
+    raw_id_fields = ('user',)
+
+
+@admin.register(Applicant)
+class ApplicantAdmin(LargeTableAdmin):
+    # Applicant.__str__ is the user's username, so join the user in.
+    list_display = ('user', 'cv_original_name')
+    list_select_related = ('user',)
+    search_fields = ('=user__username', '=user__email')
+    raw_id_fields = ('user',)
@@ -66,3 +66,12 @@ class CVUploadForm(forms.ModelForm):
         labels = {
             'cv': 'Upload your CV (PDF or Word document)',
         }
+
+    def save(self, commit=True):
+        applicant = super().save(commit=False)
+        # The stored file is named after its hash, so remember what the applicant called it.
+        if 'cv' in self.changed_data and applicant.cv:
+            applicant.cv_original_name = self.cleaned_data['cv'].name[:255]
+        if commit:
+            applicant.save()
+        return applicant
@@ -0,0 +1,23 @@
+# Path: /accounts/management/commands/gc_cv_blobs.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from accounts.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Deletes stored CV files that no applicant uses any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help="Only delete files that have been unused for at least this long.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        deleted, freed = collect_garbage(timedelta(hours=options['grace_hours']), using=options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} unused CV file(s), freeing {freed / (1024 * 1024):.1f} MB."
+        ))
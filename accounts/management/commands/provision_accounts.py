@@ -0,0 +1,68 @@
+# Path: /accounts/management/commands/provision_accounts.py
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from accounts import provisioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates applicant and company accounts from a CSV file (see accounts/provisioning.py), "
+        "hashing the passwords on every core. Rows with a taken username are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The CSV file of accounts.")
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes hashing passwords (default: one per core).")
+        parser.add_argument('--batch-size', type=int, default=provisioning.PROVISION_BATCH_SIZE,
+                            help="How many accounts to write per transaction.")
+        parser.add_argument('--verified', action='store_true',
+                            help="Mark the email addresses as verified instead of emailing a verification link.")
+        parser.add_argument('--base-url', default=settings.SITE_URL,
+                            help="The site's root URL, for the verification links.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--max-errors', type=int, default=20,
+                            help="How many skipped rows to print before going quiet.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        errors_shown = 0
+
+        def on_error(position, message):
+            nonlocal errors_shown
+            if errors_shown < options['max_errors']:
+                self.stderr.write(f"Row {position}: {message}")
+            errors_shown += 1
+
+        def on_batch(stats):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{stats['rows']} rows ({stats['rows'] / elapsed:,.0f} rows/s): "
+                f"{stats['created']} created, {stats['failed']} failed"
+            )
+
+        if not os.path.exists(options['path']):
+            raise CommandError(f"No such file: {options['path']}")
+        stats = provisioning.provision_accounts(
+            provisioning.read_accounts(options['path']),
+            processes=options['processes'],
+            batch_size=options['batch_size'],
+            verified=options['verified'],
+            verify_base_url=options['base_url'],
+            using=options['database'],
+            on_batch=on_batch,
+            on_error=on_error,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Provisioned {stats['created']} accounts ({stats['applicants']} applicants, "
+            f"{stats['companies']} companies) from {stats['rows']} rows in {elapsed:.1f}s "
+            f"({stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s) with {options['processes']} processes; "
+            f"{stats['failed']} failed."
+        ))
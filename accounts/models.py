@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.validators import FileExtensionValidator
+from django.db import models, router, transaction
+
+from .storage import cv_storage, add_reference, remove_reference
 
 # This is our custom User model. It's the master table for all users.
 class User(AbstractUser):
@@ -42,8 +45,62 @@ class Applicant(models.Model):
     """
     # The 'OneToOneField' ensures each Applicant profile is linked to exactly one User.
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
-    cv = models.FileField(upload_to='cvs/', blank=True, null=True)
+    # CVs are stored by content hash, so two applicants with the same CV share one file.
+    cv = models.FileField(
+        upload_to='cvs/', storage=cv_storage, blank=True, null=True,
+        validators=[FileExtensionValidator(['pdf', 'doc', 'docx'])],
+    )
+    # The file name the applicant uploaded, since the stored name is a hash.
+    cv_original_name = models.CharField(max_length=255, blank=True)
     bio = models.TextField(blank=True, null=True)
 
     def __str__(self):
         return self.user.username
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the applicant and moves the CV reference counts along with it,
+        in one transaction, when the CV changes.
+        """
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous_cv = None
+            if not self._state.adding:
+                previous_cv = (
+                    Applicant.objects.using(using).select_for_update()
+                    .filter(pk=self.pk).values_list('cv', flat=True).first()
+                )
+            # A CV uploaded just now, kept in case its stored copy has to be
+            # written again (see add_reference()).
+            upload = self.cv.file if self.cv and not self.cv._committed else None
+            super().save(*args, **kwargs)
+            current_cv = self.cv.name or None
+            if (previous_cv or None) != current_cv:
+                add_reference(current_cv, using=using, content=upload, storage=self.cv.storage)
+                remove_reference(previous_cv, using=using)
+
+
+# This model keeps track of every stored CV file and how many applicants use it.
+class CVBlob(models.Model):
+    """
+    One row per file in the content-addressed CV storage.
+    'refcount' is the number of applicants whose CV is this file; files whose
+    count has been zero for a while are deleted by 'manage.py gc_cv_blobs'.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField(default=0)
+    # The file's CRC-32, which ZIP archives need up front (see jobs/exports.py).
+    # Older rows may not have it yet; the export fills it in when it meets them.
+    crc32 = models.PositiveBigIntegerField(null=True, blank=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When the refcount last changed, so the collector can leave fresh files alone.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at'], name='cvblob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
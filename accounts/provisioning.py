@@ -0,0 +1,219 @@
+# Path: /accounts/provisioning.py
+
+"""
+Bulk account creation from a CSV file, for onboarding a partner university
+or staffing agency in one go instead of one signup at a time.
+
+Columns: 'username', 'email', 'user_type' ('applicant' or 'company'),
+'password' (optional: without one the account can't log in until a password
+is set), 'first_name', 'last_name' and, for companies, 'company_name'.
+
+Hashing a password with PBKDF2 is deliberately slow (a few hundred ms) and
+CPU-bound, so it dominates everything else here. The hashing is spread over a
+pool of worker processes, one per core by default, and runs for the next
+batch while the current one is written. Rows are read one at a time and
+written a batch per transaction with bulk_create(), so files of any size work.
+A bad row (taken username, missing column) is reported and skipped; the rest
+of its batch is still written.
+"""
+
+import csv
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+from .models import User, Applicant, Company
+
+PROVISION_BATCH_SIZE = 500
+
+USER_TYPES = {value for value, _ in User.USER_TYPE_CHOICES}
+
+_validate_username = UnicodeUsernameValidator()
+
+
+class ProvisionRowError(ValueError):
+    """A CSV row that can't be turned into an account."""
+
+
+def read_accounts(path):
+    """Yields the rows of an accounts CSV file as dicts, streaming it."""
+    with Path(path).open(newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def _clean(row, name):
+    return (row.get(name) or '').strip()
+
+
+def build_account(row):
+    """Turns one CSV row into (unsaved User, company name or None, raw password), or raises ProvisionRowError."""
+    username, email, user_type = _clean(row, 'username'), _clean(row, 'email'), _clean(row, 'user_type').lower()
+    if not username:
+        raise ProvisionRowError("missing username")
+    try:
+        _validate_username(username)
+    except ValidationError:
+        raise ProvisionRowError(f"invalid username {username!r}")
+    if len(username) > User._meta.get_field('username').max_length:
+        raise ProvisionRowError(f"username {username!r} is too long")
+    if user_type not in USER_TYPES:
+        raise ProvisionRowError(f"user_type must be one of {', '.join(sorted(USER_TYPES))}, not {user_type!r}")
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ProvisionRowError(f"invalid email {email!r}")
+    company_name = _clean(row, 'company_name') if user_type == 'company' else None
+    if user_type == 'company' and not company_name:
+        raise ProvisionRowError("missing company_name")
+    user = User(
+        username=username, email=email, user_type=user_type,
+        first_name=_clean(row, 'first_name'), last_name=_clean(row, 'last_name'),
+    )
+    # The raw password isn't kept on the user; the pool hashes it.
+    return user, company_name, row.get('password') or None
+
+
+def hash_passwords(passwords, pool=None, processes=1):
+    """
+    Returns an iterator over the hashes of 'passwords' (None gives an unusable
+    password). With a pool of 'processes' workers the work is submitted
+    straight away and the iterator waits for the results, so the caller can
+    do other work meanwhile.
+    """
+    if pool is None:
+        return iter([make_password(password) for password in passwords])
+    # A few chunks per worker keeps them all busy without much pickling.
+    chunksize = max(1, len(passwords) // (processes * 4))
+    return pool.map(make_password, passwords, chunksize=chunksize)
+
+
+def _existing_usernames(usernames, using):
+    return set(User.objects.using(using).filter(username__in=usernames).values_list('username', flat=True))
+
+
+def _write_batch(accounts, hashes, stats, on_error, using, verify_base_url):
+    """Writes one batch of (position, user, company name) whose passwords are in 'hashes'."""
+    from .tasks import send_verification_email
+
+    for (_, user, _), password in zip(accounts, hashes):
+        user.password = password
+    for attempt in range(2):
+        taken = _existing_usernames([user.username for _, user, _ in accounts], using)
+        fresh = [account for account in accounts if account[1].username not in taken]
+        try:
+            with transaction.atomic(using=using):
+                User.objects.using(using).bulk_create([user for _, user, _ in fresh])
+                # Not every database returns the new primary keys from a bulk
+                # insert, so they are read back by username.
+                ids = dict(
+                    User.objects.using(using)
+                    .filter(username__in=[user.username for _, user, _ in fresh])
+                    .values_list('username', 'pk')
+                )
+                for _, user, _ in fresh:
+                    user.pk = ids[user.username]
+                Applicant.objects.using(using).bulk_create([
+                    Applicant(user_id=user.pk) for _, user, company_name in fresh if company_name is None
+                ])
+                Company.objects.using(using).bulk_create([
+                    Company(user_id=user.pk, name=company_name)
+                    for _, user, company_name in fresh if company_name is not None
+                ])
+                if verify_base_url:
+                    send_verification_email.enqueue_many(
+                        [((user.pk, verify_base_url), {}) for _, user, _ in fresh if user.email], _using=using,
+                    )
+            break
+        except IntegrityError:
+            # Someone signed up with one of these usernames since we looked.
+            # The transaction rolled back, so look again and retry once.
+            if attempt:
+                raise
+    for position, user, _ in accounts:
+        if user.username in taken:
+            stats['failed'] += 1
+            if on_error:
+                on_error(position, f"username {user.username!r} is already taken")
+    stats['created'] += len(fresh)
+    stats['applicants'] += sum(1 for _, _, company_name in fresh if company_name is None)
+    stats['companies'] += sum(1 for _, _, company_name in fresh if company_name is not None)
+
+
+def provision_accounts(rows, processes=None, batch_size=PROVISION_BATCH_SIZE, verified=False,
+                       verify_base_url=None, using=DEFAULT_DB_ALIAS, on_batch=None, on_error=None):
+    """
+    Creates a User and an Applicant or Company for every row of 'rows' (dicts,
+    as read_accounts() yields them).
+
+    'processes' is the size of the hashing pool (None: one per core, 1: hash
+    in this process). Accounts are marked as verified with verified=True,
+    otherwise a verification email is queued for each when 'verify_base_url'
+    is given. 'on_batch(stats)' is called after every batch is written and
+    'on_error(position, message)' for every row that is skipped. Returns a
+    Counter with 'rows', 'created', 'applicants', 'companies' and 'failed' totals.
+    """
+    processes = processes or os.cpu_count() or 1
+    stats = Counter()
+    seen = set()
+
+    def build(batch):
+        """Validates a batch of (position, row) and starts hashing its passwords."""
+        accounts, passwords = [], []
+        for position, row in batch:
+            try:
+                user, company_name, password = build_account(row)
+                if user.username in seen:
+                    raise ProvisionRowError(f"username {user.username!r} appears earlier in the file")
+            except ProvisionRowError as error:
+                stats['failed'] += 1
+                if on_error:
+                    on_error(position, str(error))
+                continue
+            seen.add(user.username)
+            user.email_verified = verified
+            accounts.append((position, user, company_name))
+            passwords.append(password)
+        return accounts, hash_passwords(passwords, pool, processes)
+
+    def write(pending):
+        accounts, hashes = pending
+        # Waits for the pool to finish this batch's hashes.
+        hashes = list(hashes)
+        if accounts:
+            _write_batch(accounts, hashes, stats, on_error, using, None if verified else verify_base_url)
+        if on_batch:
+            on_batch(stats)
+
+    pool = ProcessPoolExecutor(processes) if processes > 1 else None
+    try:
+        pending = None
+        batch = []
+        for position, row in enumerate(rows, start=1):
+            stats['rows'] += 1
+            batch.append((position, row))
+            if len(batch) >= batch_size:
+                # Hash this batch in the pool while the previous one is written.
+                started = build(batch)
+                batch = []
+                if pending:
+                    write(pending)
+                pending = started
+        if batch:
+            started = build(batch)
+            if pending:
+                write(pending)
+            pending = started
+        if pending:
+            write(pending)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    return stats
@@ -0,0 +1,13 @@
+# Path: /accounts/signals.py
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Applicant
+from .storage import remove_reference
+
+
+@receiver(post_delete, sender=Applicant)
+def release_cv(sender, instance, using, **kwargs):
+    """A deleted applicant no longer references their CV file."""
+    remove_reference(instance.cv.name, using=using)
@@ -0,0 +1,231 @@
+# Path: /accounts/storage.py
+
+"""
+Content-addressed, streaming storage for applicant CVs.
+
+* CVUploadHandler streams an uploaded CV to a temporary file while hashing it,
+  so a large file is never held in memory. It rejects files that are too big or
+  are not PDF/Word documents as soon as it can tell, without reading the rest
+  of the request body.
+* ContentAddressedStorage stores every file under the SHA-256 of its content
+  (e.g. 'cvs/ab/cd/abcd...ef.pdf'). Identical CVs therefore share one file on
+  disk, and storing a file that already exists costs nothing.
+* CVBlob rows count how many applicants point at each stored file. A CV that
+  nobody references any more is removed by 'manage.py gc_cv_blobs'. They also
+  keep each file's size and CRC-32 for the applications export.
+"""
+
+import hashlib
+import os
+import zlib
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+# The first bytes of each kind of document we accept.
+CV_SIGNATURES = {
+    '.pdf': (b'%PDF',),
+    '.doc': (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',),
+    '.docx': (b'PK\x03\x04',),
+}
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def cv_max_size():
+    return getattr(settings, 'CV_MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+
+
+def _extension(name):
+    return os.path.splitext(name or '')[1].lower()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    A FileSystemStorage that names files after the SHA-256 of their content.
+    The directory part of the requested name (the field's 'upload_to') is kept,
+    the file name is replaced.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Two uploads of the same file may race to store it. Overwriting a file
+        # with identical content is harmless, so we allow it instead of renaming.
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(*args, **kwargs)
+
+    def hashed_name(self, name, digest):
+        directory = os.path.dirname(name)
+        return os.path.join(directory, digest[:2], digest[2:4], f"{digest}{_extension(name)}")
+
+    def _save(self, name, content):
+        digest = getattr(content, 'content_hash', None)
+        if digest is None:
+            # Not uploaded through CVUploadHandler (e.g. the admin), hash it here.
+            hasher = hashlib.sha256()
+            for chunk in content.chunks(HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+            content.seek(0)
+        name = self.hashed_name(name, digest)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def restore(self, name, content):
+        """Writes 'content' under 'name' as is, for a file the collector deleted (see add_reference())."""
+        return super()._save(name, content)
+
+
+cv_storage = ContentAddressedStorage()
+
+
+class CVUploadHandler(FileUploadHandler):
+    """
+    Streams the 'cv' file of a request to disk while hashing it and checking
+    its size and type. Anything wrong is recorded in 'self.error' for the view
+    to show. Other fields and files are passed on to Django's default handlers.
+    """
+
+    def __init__(self, request=None, field_name='cv', max_size=None):
+        super().__init__(request)
+        self.field = field_name
+        self.max_size = max_size or cv_max_size()
+        self.active = False
+        self.error = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self.active = field_name == self.field
+        if not self.active:
+            return
+        if _extension(file_name) not in CV_SIGNATURES:
+            self.active = False
+            self.error = "Please upload a PDF or Word document."
+            raise SkipFile()
+        self.hasher = hashlib.sha256()
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if start == 0 and not raw_data.startswith(CV_SIGNATURES[_extension(self.file_name)]):
+            self.error = "That file doesn't look like a PDF or Word document."
+            self.active = False
+            self.upload_interrupted()
+            raise SkipFile()
+        if start + len(raw_data) > self.max_size:
+            self.error = f"Your CV is too large. The limit is {self.max_size // (1024 * 1024)} MB."
+            self.upload_interrupted()
+            # Stop reading the request right here instead of receiving the rest of the file.
+            raise StopUpload(connection_reset=True)
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.hasher.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+def file_crc32(name, storage=cv_storage):
+    """Returns (size, CRC-32) of the stored file 'name', or None if it isn't there."""
+    crc, size = 0, 0
+    try:
+        with storage.open(name, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+    except FileNotFoundError:
+        return None
+    return size, crc
+
+
+# --- Reference counting ---
+
+def add_reference(name, using=DEFAULT_DB_ALIAS, content=None, storage=cv_storage):
+    """
+    Records one more applicant pointing at the stored file 'name'. 'content'
+    is the file itself, to store it again if the collector deleted it after
+    the upload found it already there.
+    """
+    from .models import CVBlob
+
+    if not name:
+        return
+    # Locking the row waits for a collector that is deleting it (it deletes
+    # the row and the file in one transaction). If it did, the row is created
+    # again here and the file may be gone.
+    _, created = CVBlob.objects.using(using).select_for_update().get_or_create(name=name)
+    changes = {'refcount': F('refcount') + 1, 'updated_at': timezone.now()}
+    if created:
+        # A new file: read it once now so exports never have to.
+        checked = file_crc32(name, storage)
+        if checked is None and content is not None:
+            storage.restore(name, content)
+            checked = file_crc32(name, storage)
+        if checked:
+            changes['size'], changes['crc32'] = checked
+    CVBlob.objects.using(using).filter(name=name).update(**changes)
+
+
+def remove_reference(name, using=DEFAULT_DB_ALIAS):
+    """Records one applicant fewer pointing at the stored file 'name'."""
+    from .models import CVBlob
+
+    if not name:
+        return
+    CVBlob.objects.using(using).filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, updated_at=timezone.now(),
+    )
+
+
+def collect_garbage(grace, storage=cv_storage, using=DEFAULT_DB_ALIAS):
+    """
+    Deletes stored CVs that no applicant has referenced for at least 'grace'
+    (a timedelta). The grace period keeps files that are in the middle of being
+    uploaded or re-referenced safe. Returns (files deleted, bytes freed).
+    """
+    from django.db import transaction
+    from .models import CVBlob
+
+    cutoff = timezone.now() - grace
+    deleted, freed = 0, 0
+    candidates = CVBlob.objects.using(using).filter(refcount=0, updated_at__lt=cutoff)
+    for name in candidates.values_list('name', flat=True).iterator():
+        with transaction.atomic(using=using):
+            # Delete the row only if it is still unreferenced; an upload may have
+            # picked the same file up again since we listed it.
+            blob = CVBlob.objects.using(using).select_for_update().filter(
+                name=name, refcount=0, updated_at__lt=cutoff,
+            ).first()
+            if blob is None:
+                continue
+            blob.delete()
+            # The file goes while the row is still locked, so an upload of the
+            # same CV that found the file a moment ago waits in add_reference()
+            # and then sees it gone. If deleting fails, the row comes back.
+            try:
+                storage.delete(name)
+            except FileNotFoundError:
+                pass
+        deleted += 1
+        freed += blob.size
+    return deleted, freed
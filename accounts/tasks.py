@@ -0,0 +1,33 @@
+# Path: /accounts/tasks.py
+
+from urllib.parse import urljoin
+
+from django.contrib.auth.tokens import default_token_generator
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from tasks.registry import task
+from .models import User
+
+
+@task(max_attempts=5, backoff=60)
+def send_verification_email(user_id, base_url):
+    """
+    Emails a new user the link that verifies their address.
+    'base_url' is the site's root URL, e.g. 'https://jobboard.com/'.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or user.email_verified or not user.email:
+        return
+    path = reverse('verify_email', args=[
+        urlsafe_base64_encode(force_bytes(user.pk)),
+        default_token_generator.make_token(user),
+    ])
+    verification_link = urljoin(base_url, path)
+    message = render_to_string('accounts/email_verification.html', {
+        'user': user,
+        'verification_link': verification_link,
+    })
+    user.email_user('Activate Your JobBoard Account', message, html_message=message)
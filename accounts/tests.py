@@ -1,3 +1,469 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.contrib.auth import hashers
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job, Application, ApplicationSummary, ApplicationStatusCount
+from jobs.status import bulk_change_status
+from jobs.summaries import rebuild_summaries
+from job_board import sessions
+from tasks.models import Task
+from .models import User, Company, Applicant, CVBlob
+from .storage import CVUploadHandler, collect_garbage, cv_storage
+
+
+def make_applicant(username='ada', password='pass12345'):
+    user = User.objects.create_user(username=username, password=password, user_type='applicant')
+    return Applicant.objects.create(user=user)
+
+
+def make_company(username='acme', name='Acme'):
+    user = User.objects.create_user(username=username, password='pass12345', user_type='company')
+    return Company.objects.create(user=user, name=name)
+
+
+class ApplicationSummaryTests(TestCase):
+    def setUp(self):
+        self.applicant = make_applicant()
+        self.company = make_company()
+        self.job = Job.objects.create(company=self.company, title='Nurse', description='Care.', location='Accra')
+
+    def counts(self):
+        return dict(ApplicationStatusCount.objects.filter(applicant=self.applicant).values_list('status', 'count'))
+
+    def test_summary_follows_application(self):
+        application = Application.objects.create(job=self.job, applicant=self.applicant)
+        summary = ApplicationSummary.objects.get(application=application)
+        self.assertEqual((summary.job_title, summary.company_name, summary.status), ('Nurse', 'Acme', 'applied'))
+        self.assertEqual(self.counts(), {'applied': 1})
+
+        application.status = 'selected'
+        application.save()
+        summary.refresh_from_db()
+        self.assertEqual(summary.status, 'selected')
+        self.assertEqual(self.counts(), {'applied': 0, 'selected': 1})
+
+        application.delete()
+        self.assertFalse(ApplicationSummary.objects.exists())
+        self.assertEqual(self.counts(), {'applied': 0, 'selected': 0})
+
+    def test_job_and_company_renames_are_copied(self):
+        Application.objects.create(job=self.job, applicant=self.applicant)
+        self.job.title = 'Senior Nurse'
+        self.job.save()
+        self.company.name = 'Acme Health'
+        self.company.save()
+        summary = ApplicationSummary.objects.get()
+        self.assertEqual((summary.job_title, summary.company_name), ('Senior Nurse', 'Acme Health'))
+
+    def test_deleting_applicant_removes_everything(self):
+        Application.objects.create(job=self.job, applicant=self.applicant)
+        self.applicant.user.delete()
+        self.assertFalse(ApplicationStatusCount.objects.exists())
+
+    def test_rebuild(self):
+        Application.objects.create(job=self.job, applicant=self.applicant)
+        ApplicationSummary.objects.all().delete()
+        ApplicationStatusCount.objects.all().delete()
+        self.assertEqual(rebuild_summaries(), 1)
+        self.assertEqual(self.counts(), {'applied': 1})
+
+
+# A fast hasher: these tests are about the rows written, not PBKDF2.
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisionAccountsTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        make_applicant('taken')
+
+    def write_csv(self, lines):
+        path = f'{self.dir}/accounts.csv'
+        with open(path, 'w') as f:
+            f.write('username,email,user_type,password,first_name,company_name\n')
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+    def provision(self, path, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command('provision_accounts', path, *args, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_accounts_and_profiles_are_created_and_bad_rows_reported(self):
+        path = self.write_csv([
+            'grace,grace@uni.edu,applicant,s3cret-pass,Grace,',
+            'taken,taken@uni.edu,applicant,s3cret-pass,,',
+            'initech,hr@initech.com,company,s3cret-pass,,Initech',
+            'grace,other@uni.edu,applicant,s3cret-pass,,',
+            'noname,hr@noname.com,company,s3cret-pass,,',
+            'nopass,nopass@uni.edu,Applicant,,,',
+            'bad name!,x@uni.edu,applicant,s3cret-pass,,',
+        ])
+        out, err = self.provision(path, processes=1, batch_size=2)
+        self.assertIn('Provisioned 3 accounts (2 applicants, 1 companies) from 7 rows', out)
+        self.assertIn("Row 2: username 'taken' is already taken", err)
+        self.assertIn("Row 4: username 'grace' appears earlier in the file", err)
+        self.assertIn('Row 5: missing company_name', err)
+        self.assertIn("Row 7: invalid username 'bad name!'", err)
+
+        grace = User.objects.get(username='grace')
+        self.assertTrue(grace.check_password('s3cret-pass'))
+        self.assertEqual((grace.first_name, grace.user_type, grace.email_verified), ('Grace', 'applicant', False))
+        self.assertTrue(Applicant.objects.filter(user=grace).exists())
+        self.assertEqual(Company.objects.get(user__username='initech').name, 'Initech')
+        self.assertFalse(User.objects.get(username='nopass').has_usable_password())
+        # Each new account with an email gets a verification email, through the task queue.
+        self.assertEqual(Task.objects.filter(name__endswith='send_verification_email').count(), 3)
+
+    def test_passwords_are_hashed_in_a_process_pool(self):
+        path = self.write_csv([f'student{i},s{i}@uni.edu,applicant,pass-{i},,' for i in range(6)])
+        out, _ = self.provision(path, processes=2, batch_size=4, verified=True)
+        self.assertIn('Provisioned 6 accounts', out)
+        for i in (0, 5):
+            user = User.objects.get(username=f'student{i}')
+            self.assertTrue(user.check_password(f'pass-{i}'))
+            self.assertTrue(user.email_verified)
+        self.assertFalse(Task.objects.exists())
+
+
+class ApplicantDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.applicant = make_applicant()
+        company = make_company()
+        for i in range(30):
+            job = Job.objects.create(company=company, title=f'Job {i}', description='x', location='Lagos')
+            Application.objects.create(job=job, applicant=self.applicant)
+        self.client.login(username='ada', password='pass12345')
+
+    def test_dashboard_query_count_does_not_grow_with_applications(self):
+        # session, user, applicant, summaries page, status counters. The test
+        # cache is per-process, so the session comes from the database.
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('applicant_dashboard'))
+        self.assertContains(response, 'Job 29')
+        self.assertContains(response, 'My Applications (30)')
+        self.assertNotContains(response, 'Job 0<')
+
+    def test_dashboard_pages(self):
+        response = self.client.get(reverse('applicant_dashboard'))
+        cursor = response.context['next_cursor']
+        response = self.client.get(reverse('applicant_dashboard'), {'cursor': cursor})
+        self.assertEqual(len(response.context['applications']), 5)
+        self.assertIsNone(response.context['next_cursor'])
+
+
+class CompanyDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = make_company()
+        self.job = Job.objects.create(company=self.company, title='Driver', description='Drive.', location='Kigali')
+        self.other_job = Job.objects.create(company=make_company('globex', 'Globex'), title='Pilot',
+                                            description='Fly.', location='Kigali')
+        self.applicants = [make_applicant(f'applicant{i}') for i in range(3)]
+        self.applications = [Application.objects.create(job=self.job, applicant=a) for a in self.applicants]
+        self.foreign = Application.objects.create(job=self.other_job, applicant=self.applicants[0])
+        self.client.login(username='acme', password='pass12345')
+
+    def test_pipeline_counts_are_cached(self):
+        response = self.client.get(reverse('company_dashboard'))
+        self.assertEqual(response.context['rows'][0]['counts'], [3, 0, 0, 0, 0])
+        # session, user, company, jobs (the counts come from the cache)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('company_dashboard'))
+
+    def test_bulk_status_change(self):
+        self.client.get(reverse('company_dashboard'))
+        ids = [self.applications[0].pk, self.applications[1].pk, self.foreign.pk]
+        response = self.client.post(reverse('company_dashboard'), {'status': 'rejected', 'applications': ids},
+                                    follow=True)
+        self.assertContains(response, '2 application(s) moved')
+        self.assertEqual(response.context['rows'][0]['counts'], [1, 0, 0, 0, 2])
+        # Applications to other companies' jobs are never touched.
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'applied')
+        # The applicants' read model follows along.
+        summary = ApplicationSummary.objects.get(application=self.applications[0])
+        self.assertEqual(summary.status, 'rejected')
+        counts = dict(ApplicationStatusCount.objects.filter(applicant=self.applicants[0]).values_list('status', 'count'))
+        self.assertEqual(counts, {'applied': 1, 'rejected': 1})
+
+    def test_bulk_status_change_ignores_bad_ids(self):
+        response = self.client.post(reverse('company_dashboard'), {'status': 'rejected', 'applications': ['abc']},
+                                    follow=True)
+        self.assertContains(response, 'Please select at least one application.')
+
+    def test_bulk_status_change_of_many_applications(self):
+        # Enough counters that one OR-ed condition per counter would be too deep for SQLite.
+        users = User.objects.bulk_create([User(username=f'bulk{i}', user_type='applicant') for i in range(1100)])
+        applicants = Applicant.objects.bulk_create([Applicant(user=user) for user in users])
+        Application.objects.bulk_create([Application(job=self.job, applicant=applicant) for applicant in applicants])
+        rebuild_summaries()
+        moved = bulk_change_status(Application.objects.filter(job=self.job), 'progress')
+        self.assertEqual(moved, 1103)
+        counts = ApplicationStatusCount.objects.filter(applicant__in=applicants)
+        self.assertEqual(set(counts.values_list('status', 'count')), {('applied', 0), ('progress', 1)})
+        self.assertEqual(counts.filter(status='progress').count(), 1100)
+
+    def test_job_applications_are_listed(self):
+        response = self.client.get(reverse('company_dashboard'), {'job': self.job.pk})
+        self.assertContains(response, 'applicant2')
+        self.assertEqual(self.client.get(reverse('company_dashboard'), {'job': self.other_job.pk}).status_code, 404)
+
+    def test_applicants_are_turned_away(self):
+        self.client.login(username='applicant0', password='pass12345')
+        self.assertRedirects(self.client.get(reverse('company_dashboard')), reverse('job_list'))
+
+
+class CVStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media, CV_MAX_UPLOAD_SIZE=1024)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.ada = make_applicant('ada')
+        self.bob = make_applicant('bob')
+
+    def upload(self, username, name, content):
+        self.client.login(username=username, password='pass12345')
+        return self.client.post(reverse('applicant_dashboard'), {'cv': SimpleUploadedFile(name, content)}, follow=True)
+
+    def test_identical_cvs_share_one_file(self):
+        self.upload('ada', 'ada.pdf', b'%PDF-1.4 same cv')
+        self.upload('bob', 'bob.pdf', b'%PDF-1.4 same cv')
+        self.ada.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.ada.cv.name, self.bob.cv.name)
+        self.assertRegex(self.ada.cv.name, r'^cvs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$')
+        self.assertEqual(self.ada.cv_original_name, 'ada.pdf')
+        self.assertEqual(CVBlob.objects.get().refcount, 2)
+
+    def test_replaced_cvs_are_collected(self):
+        self.upload('ada', 'old.pdf', b'%PDF-1.4 old')
+        self.ada.refresh_from_db()
+        old_name = self.ada.cv.name
+        response = self.upload('ada', 'new.pdf', b'%PDF-1.4 new')
+        self.assertContains(response, 'new.pdf')
+        self.assertEqual(CVBlob.objects.get(name=old_name).refcount, 0)
+
+        self.assertEqual(collect_garbage(timedelta(hours=1)), (0, 0))
+        CVBlob.objects.filter(name=old_name).update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('gc_cv_blobs', '--grace-hours', '1', stdout=StringIO())
+        self.assertFalse(cv_storage.exists(old_name))
+        self.assertEqual(CVBlob.objects.get().refcount, 1)
+
+    def test_cv_collected_during_an_identical_upload_is_stored_again(self):
+        self.upload('ada', 'old.pdf', b'%PDF-1.4 shared')
+        self.upload('ada', 'new.pdf', b'%PDF-1.4 other')
+        name = CVBlob.objects.get(refcount=0).name
+        CVBlob.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(days=2))
+        exists = cv_storage.exists
+
+        def collected_right_after(path):
+            # Bob's upload finds the file stored, then the collector deletes it.
+            found = exists(path)
+            if path == name:
+                self.assertEqual(collect_garbage(timedelta(hours=1))[0], 1)
+            return found
+
+        with mock.patch.object(cv_storage, 'exists', side_effect=collected_right_after):
+            self.upload('bob', 'bob.pdf', b'%PDF-1.4 shared')
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.cv.name, name)
+        self.assertTrue(cv_storage.exists(name))
+        self.assertEqual(CVBlob.objects.get(name=name).refcount, 1)
+        self.assertEqual(CVBlob.objects.get(name=name).size, len(b'%PDF-1.4 shared'))
+
+    def test_wrong_type_is_rejected(self):
+        response = self.upload('ada', 'cv.pdf', b'MZ this is an exe')
+        self.assertContains(response, "doesn&#x27;t look like a PDF")
+        response = self.upload('ada', 'cv.exe', b'%PDF-1.4')
+        self.assertContains(response, 'Please upload a PDF or Word document.')
+        self.assertFalse(CVBlob.objects.exists())
+
+        handler = CVUploadHandler()
+        handler.new_file('cv', 'cv.pdf', 'application/pdf', 8)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b'MZ exe..', 0)
+        # The rest of the request isn't taken for the CV.
+        self.assertFalse(handler.active)
+        self.assertEqual(handler.receive_data_chunk(b'more', 8), b'more')
+
+    def test_oversized_upload_is_rejected(self):
+        response = self.upload('ada', 'cv.pdf', b'%PDF' + b'x' * 4096)
+        self.assertContains(response, 'Your CV is too large.')
+        self.ada.refresh_from_db()
+        self.assertFalse(self.ada.cv)
+
+    def test_garbled_content_length_is_not_an_error(self):
+        self.client.login(username='ada', password='pass12345')
+        response = self.client.post(
+            reverse('applicant_dashboard'), {'cv': SimpleUploadedFile('cv.pdf', b'%PDF-1.4')},
+            CONTENT_LENGTH='lots', follow=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Your CV is too large.')
+
+    def test_deleting_applicant_releases_cv(self):
+        self.upload('ada', 'ada.pdf', b'%PDF-1.4 mine')
+        self.ada.user.delete()
+        self.assertEqual(CVBlob.objects.get().refcount, 0)
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_applicant('ada')
+
+    def login(self, password='pass12345', username='ada', **extra):
+        return self.client.post(reverse('login'), {'username': username, 'password': password}, **extra)
+
+    def test_login_hashes_the_password_once(self):
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=hashers.check_password) as check:
+            response = self.login()
+        self.assertRedirects(response, reverse('job_list'))
+        self.assertEqual(check.call_count, 1)
+
+    @override_settings(LOGIN_THROTTLE={'ip': (100, 0.001), 'username': (3, 0.001)})
+    def test_username_is_throttled_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, 200)
+        with mock.patch('django.contrib.auth.base_user.check_password') as check:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertContains(response, 'Too many login attempts', status_code=429)
+        check.assert_not_called()
+        # Other usernames from another address are unaffected.
+        self.assertEqual(self.login('wrong', username='bob', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    @override_settings(LOGIN_THROTTLE={'ip': (2, 0.001), 'username': (100, 0.001)})
+    def test_ip_is_throttled(self):
+        self.login('wrong', username='a')
+        self.login('wrong', username='b')
+        self.assertEqual(self.login('wrong', username='c').status_code, 429)
+        self.assertEqual(self.login('wrong', username='c', REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+
+class SignupTests(TestCase):
+    def test_user_and_profile_are_created_together(self):
+        data = {'username': 'acme', 'email': 'hr@acme.com', 'company_name': 'Acme',
+                'password': 'pass12345', 'confirm_password': 'pass12345'}
+        with mock.patch('accounts.views.Company.objects.create', side_effect=IntegrityError):
+            response = self.client.post(reverse('company_signup'), data)
+        self.assertContains(response, 'This username is already taken.')
+        self.assertFalse(User.objects.filter(username='acme').exists())
+
+
+# Write-behind needs a cache every worker shares; files will do for the tests.
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                 'LOCATION': os.path.join(tempfile.gettempdir(), 'job-board-test-sessions')},
+}
+
+
+@override_settings(CACHES=SHARED_CACHES, SESSION_CACHE_ALIAS='sessions', SESSION_WRITE_BEHIND_SECONDS=3600)
+class SessionEngineTests(TestCase):
+    def setUp(self):
+        self.clear_caches()
+        # Rows queued by a test must not be written into the next test's database.
+        self.addCleanup(sessions.pending_writes.clear)
+        make_applicant()
+
+    def clear_caches(self):
+        caches['sessions'].clear()
+        sessions.local_sessions.clear()
+
+    def session_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(path)
+        return [q['sql'] for q in queries if 'django_session' in q['sql']]
+
+    def test_sessions_are_written_behind(self):
+        self.client.login(username='ada', password='pass12345')
+        key = self.client.session.session_key
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertEqual(self.client.get(reverse('applicant_dashboard')).status_code, 200)
+
+        self.assertEqual(sessions.flush_pending_sessions(), 1)
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+        # With both faster tiers empty the session is read back from the database.
+        self.clear_caches()
+        self.assertEqual(self.client.get(reverse('applicant_dashboard')).status_code, 200)
+
+    def test_logout_deletes_everywhere_at_once(self):
+        self.client.login(username='ada', password='pass12345')
+        key = self.client.session.session_key
+        sessions.flush_pending_sessions()
+        self.client.get(reverse('logout'))
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertFalse(sessions.SessionStore().exists(key))
+
+    def test_anonymous_requests_skip_the_session(self):
+        self.assertEqual(self.session_queries(reverse('job_list')), [])
+        # A stale cookie is looked up once, then remembered as missing.
+        self.client.cookies['sessionid'] = 'x' * 32
+        self.assertEqual(len(self.session_queries(reverse('job_list'))), 1)
+        self.assertEqual(self.session_queries(reverse('job_list')), [])
+
+    def test_other_workers_changes_are_seen_at_once(self):
+        self.client.login(username='ada', password='pass12345')
+        key = self.client.session.session_key
+        self.assertEqual(sessions.SessionStore(key).load()['_auth_user_id'], str(User.objects.get().pk))
+
+        # Another worker process (with a local tier of its own) changes the
+        # session, then signs it out. This process's copy is never served.
+        with mock.patch.object(sessions, 'local_sessions', sessions.LocalSessionCache(10, 60)):
+            other = sessions.SessionStore(key)
+            other['seen'] = 'elsewhere'
+            other.save()
+        self.assertEqual(sessions.SessionStore(key).load()['seen'], 'elsewhere')
+        with mock.patch.object(sessions, 'local_sessions', sessions.LocalSessionCache(10, 60)):
+            sessions.SessionStore(key).delete()
+        self.assertEqual(sessions.SessionStore(key).load(), {})
+
+    def test_queued_rows_are_written_by_a_timer(self):
+        with override_settings(SESSION_WRITE_BEHIND_SECONDS=0.01), \
+                mock.patch.object(sessions.pending_writes, '_flush') as flush:
+            self.client.login(username='ada', password='pass12345')
+            time.sleep(0.2)
+        flush.assert_called_once_with()
+
+    @override_settings(SESSION_CACHE_ALIAS='default', SESSION_WRITE_BEHIND_SECONDS=0)
+    def test_a_per_process_cache_is_skipped(self):
+        self.client.login(username='ada', password='pass12345')
+        key = self.client.session.session_key
+        # Written straight through, and not kept where other workers wouldn't see a logout.
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+        self.assertFalse(cache.has_key(sessions.KEY_PREFIX + key))
+        # Nor in this process's memory: every request reads the row.
+        self.assertIsNone(sessions.local_sessions.get(key))
+        with override_settings(SESSION_WRITE_BEHIND_SECONDS=5), self.assertRaises(ImproperlyConfigured):
+            sessions.SessionStore()
+
+    @override_settings(SESSION_CLEAR_EXPIRED_BATCH=2)
+    def test_clear_expired_in_batches(self):
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            [Session(session_key=f'old{i}', session_data='', expire_date=past) for i in range(5)]
+            + [Session(session_key='live', session_data='', expire_date=past + timedelta(days=2))]
+        )
+        call_command('clearsessions')
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
@@ -0,0 +1,59 @@
+# Path: /accounts/throttle.py
+
+"""
+Cache-backed token buckets for throttling login attempts.
+
+Each bucket holds up to 'capacity' tokens and refills at 'rate' tokens per
+second. Every login attempt takes one token from the bucket of the client's IP
+address and one from the bucket of the username it tries. When either bucket
+is empty the attempt is refused before any password is hashed, which is what
+makes credential-stuffing bursts cheap to turn away.
+
+The buckets live in the default cache. Reads and writes aren't atomic, so under
+heavy concurrency a few extra attempts may slip through; that's fine for a
+throttle whose job is to stop bursts, not to count exactly.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class TokenBucket:
+    def __init__(self, key, capacity, rate):
+        self.key = f'throttle:{key}'
+        self.capacity = capacity
+        self.rate = rate
+
+    def _state(self, now):
+        tokens, updated = cache.get(self.key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def take(self, now=None):
+        """Takes one token. Returns 0 on success, or the seconds to wait for the next token."""
+        now = now or time.time()
+        tokens = self._state(now)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        # Keep the entry around just long enough for the bucket to fill up again.
+        cache.set(self.key, (tokens - 1, now), timeout=int(self.capacity / self.rate) + 1)
+        return 0
+
+
+def login_buckets(request, username):
+    # (capacity, refill rate per second) for each kind of bucket; see settings.py.
+    rates = getattr(settings, 'LOGIN_THROTTLE', {'ip': (30, 0.5), 'username': (10, 1 / 30)})
+    buckets = [TokenBucket(f"login:ip:{request.META.get('REMOTE_ADDR', '')}", *rates['ip'])]
+    if username:
+        buckets.append(TokenBucket(f"login:user:{username.strip().lower()}", *rates['username']))
+    return buckets
+
+
+def throttle_login(request, username):
+    """
+    Takes a token for this login attempt from every bucket it belongs to.
+    Returns 0 if the attempt may go ahead, else how many seconds to wait.
+    """
+    now = time.time()
+    return max(bucket.take(now) for bucket in login_buckets(request, username))
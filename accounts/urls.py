@@ -17,8 +17,10 @@ urlpatterns = [
 
     # The URL for the success page after registration (e.g., /accounts/register/success/)
     # path('register/success/', views.register_success, name='register_success'),
-    # path('verify/<str:uidb64>/<str:token>/', views.verify_email, name='verify_email'),
+    path('verify/<str:uidb64>/<str:token>/', views.verify_email, name='verify_email'),
     path('login/', views.login_view, name='login'),
     path('dashboard/applicant/', views.applicant_dashboard, name='applicant_dashboard'),
+    path('dashboard/applicant/archived/', views.applicant_archive, name='applicant_archive'),
+    path('dashboard/company/', views.company_dashboard, name='company_dashboard'),
     path('logout/', views.logout_view, name='logout'),
 ]
@@ -1,35 +1,50 @@
 # Path: /accounts/views.py
 
+import math
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode
+from django.utils.encoding import force_str
 from django.contrib.auth.tokens import default_token_generator
-from django.contrib.sites.shortcuts import get_current_site
-from django.db import IntegrityError # Import IntegrityError
+from django.db import IntegrityError, transaction
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
 from .models import User, Applicant, Company
-from jobs.models import Application
+from jobs.models import Job, Application, ApplicationSummary, ApplicationStatusCount, ArchivedApplication
+from jobs.pagination import keyset_page
+from jobs.status import bulk_change_status, BULK_STATUSES
+from jobs import cache as job_cache
 from .forms import ApplicantSignUpForm, CompanySignUpForm, CVUploadForm
+from .tasks import send_verification_email
+from .storage import CVUploadHandler, cv_max_size
+from .throttle import throttle_login
 
 # --- Authentication Views ---
 def login_view(request):
-    """Handles user login."""
+    """
+    Handles user login. Each attempt hashes the password at most once
+    (inside the form's validation), and attempts over the throttle limit
+    are refused before any hashing at all.
+    """
     if request.method == 'POST':
+        wait = throttle_login(request, request.POST.get('username', ''))
+        if wait:
+            context = {
+                'form': AuthenticationForm(request),
+                'throttle_error': f"Too many login attempts. Please try again in {math.ceil(wait)} seconds.",
+            }
+            return render(request, 'accounts/login.html', context, status=429)
         form = AuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(request, f"Welcome back, {user.username}!")
-                return redirect('job_list')
+            # The form already authenticated the user, so don't do it again.
+            user = form.get_user()
+            login(request, user)
+            messages.success(request, f"Welcome back, {user.username}!")
+            return redirect('job_list')
     else:
         form = AuthenticationForm()
     return render(request, 'accounts/login.html', {'form': form})
@@ -50,12 +65,16 @@ def applicant_signup(request):
         form = ApplicantSignUpForm(request.POST)
         if form.is_valid():
             try:
-                user = form.save(commit=False)
-                user.user_type = 'applicant'
-                user.is_active = True
-                user.set_password(form.cleaned_data['password'])
-                user.save()
-                Applicant.objects.create(user=user)
+                # The user and their profile are created together or not at all.
+                with transaction.atomic():
+                    user = form.save(commit=False)
+                    user.user_type = 'applicant'
+                    user.is_active = True
+                    user.set_password(form.cleaned_data['password'])
+                    user.save()
+                    Applicant.objects.create(user=user)
+                    # The email goes out from the task queue, so signup doesn't wait on the mail server.
+                    send_verification_email.enqueue(user.pk, request.build_absolute_uri('/'))
                 messages.success(request, 'Registration successful! Please log in to continue.')
                 return redirect('login')
             except IntegrityError:
@@ -71,12 +90,16 @@ def company_signup(request):
         form = CompanySignUpForm(request.POST)
         if form.is_valid():
             try:
-                user = form.save(commit=False)
-                user.user_type = 'company'
-                user.is_active = True
-                user.set_password(form.cleaned_data['password'])
-                user.save()
-                Company.objects.create(user=user, name=form.cleaned_data.get('company_name'))
+                # The user and their profile are created together or not at all.
+                with transaction.atomic():
+                    user = form.save(commit=False)
+                    user.user_type = 'company'
+                    user.is_active = True
+                    user.set_password(form.cleaned_data['password'])
+                    user.save()
+                    Company.objects.create(user=user, name=form.cleaned_data.get('company_name'))
+                    # The email goes out from the task queue, so signup doesn't wait on the mail server.
+                    send_verification_email.enqueue(user.pk, request.build_absolute_uri('/'))
                 messages.success(request, 'Registration successful! Please log in to continue.')
                 return redirect('login')
             except IntegrityError:
@@ -87,51 +110,75 @@ def company_signup(request):
         form = CompanySignUpForm()
     return render(request, 'accounts/signup.html', {'form': form, 'user_type': 'Company'})
 
+def verify_email(request, uidb64, token):
+    try:
+        uid = force_str(urlsafe_base64_decode(uidb64))
+        user = User.objects.get(pk=uid)
+    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+        user = None
+
+    if user is not None and default_token_generator.check_token(user, token):
+        user.is_active = True
+        user.email_verified = True
+        user.save()
+        login(request, user)
+        messages.success(request, 'Your email has been verified successfully. Welcome!')
+        return redirect('job_list')
+    else:
+        return render(request, 'accounts/verification_invalid.html')
+
 # The following views are temporarily unused but kept for later.
 # def register_success(request):
 #     return render(request, 'accounts/register_success.html')
 
-# def verify_email(request, uidb64, token):
-#     try:
-#         uid = force_str(urlsafe_base64_decode(uidb64))
-#         user = User.objects.get(pk=uid)
-#     except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-#         user = None
-
-#     if user is not None and default_token_generator.check_token(user, token):
-#         user.is_active = True
-#         user.email_verified = True
-#         user.save()
-#         login(request, user)
-#         messages.success(request, 'Your email has been verified successfully. Welcome!')
-#         return redirect('job_list')
-#     else:
-#         return render(request, 'accounts/verification_invalid.html')
-
-# def send_verification_email(request, user):
-#     current_site = get_current_site(request)
-#     subject = 'Activate Your JobBoard Account'
-#     verification_link = request.build_absolute_uri(
-#         f'/accounts/verify/{urlsafe_base64_encode(force_bytes(user.pk))}/{default_token_generator.make_token(user)}/'
-#     )
-#     message = render_to_string('accounts/email_verification.html', {
-#         'user': user,
-#         'verification_link': verification_link,
-#     })
-#     user.email_user(subject, message)
-
 # --- Dashboard Views ---
+# How many applications we show per page on the applicant dashboard.
+DASHBOARD_PAGE_SIZE = 25
+
 @login_required
+@csrf_exempt
 def applicant_dashboard(request):
+    """
+    Installs the streaming CV upload handler before anything reads the request
+    body. This is why CSRF is checked in _applicant_dashboard() instead of by
+    the middleware, which would read the body first.
+    """
+    if request.method == 'POST':
+        # Turn away uploads that are obviously too big before reading any of them.
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (ValueError, TypeError):
+            # A garbled header; Django reads no body for it either.
+            content_length = 0
+        if content_length > cv_max_size() + 64 * 1024:
+            messages.error(request, f'Your CV is too large. The limit is {cv_max_size() // (1024 * 1024)} MB.')
+            return redirect('applicant_dashboard')
+        request.upload_handlers.insert(0, CVUploadHandler(request))
+    return _applicant_dashboard(request)
+
+@csrf_protect
+def _applicant_dashboard(request):
     if request.user.user_type != 'applicant':
         messages.error(request, 'You are not authorized to view this page.')
         return redirect('job_list')
 
     applicant = get_object_or_404(Applicant, user=request.user)
-    applications = Application.objects.filter(applicant=applicant).order_by('-applied_at')
+    # The dashboard reads from the ApplicationSummary read model, so the whole
+    # table is one indexed query no matter how many applications there are.
+    applications, next_cursor = keyset_page(
+        ApplicationSummary.objects.filter(applicant=applicant),
+        request.GET.get('cursor'),
+        page_size=DASHBOARD_PAGE_SIZE,
+        date_field='applied_at',
+    )
+    counts = dict(ApplicationStatusCount.objects.filter(applicant=applicant).values_list('status', 'count'))
+    status_counts = [(label, counts.get(status, 0)) for status, label in Application.STATUS_CHOICES]
 
     if request.method == 'POST':
         form = CVUploadForm(request.POST, request.FILES, instance=applicant)
+        upload_error = request.upload_handlers[0].error
+        if form.is_valid() and upload_error:
+            form.add_error('cv', upload_error)
         if form.is_valid():
             form.save()
             messages.success(request, 'Your CV has been updated successfully!')
@@ -140,7 +187,96 @@ def applicant_dashboard(request):
         form = CVUploadForm(instance=applicant)
 
     context = {
+        'applicant': applicant,
         'applications': applications,
+        'next_cursor': next_cursor,
+        'status_counts': status_counts,
+        'total_applications': sum(counts.values()),
         'form': form
     }
     return render(request, 'accounts/applicant_dashboard.html', context)
+
+
+@login_required
+def applicant_archive(request):
+    """Read-only list of the applicant's applications to jobs that have been archived."""
+    if request.user.user_type != 'applicant':
+        messages.error(request, 'You are not authorized to view this page.')
+        return redirect('job_list')
+
+    applications, next_cursor = keyset_page(
+        ArchivedApplication.objects.filter(applicant_id=request.user.pk)
+        .select_related('job__company').only('status', 'applied_at', 'job__title', 'job__company__name'),
+        request.GET.get('cursor'),
+        page_size=DASHBOARD_PAGE_SIZE,
+        date_field='applied_at',
+    )
+    context = {'applications': applications, 'next_cursor': next_cursor}
+    return render(request, 'accounts/applicant_archive.html', context)
+
+
+@login_required
+def company_dashboard(request):
+    """
+    Shows a company how many applicants each of its jobs has in every status,
+    and lets it move a selection of applicants to a new status in one go.
+    """
+    if request.user.user_type != 'company':
+        messages.error(request, 'You are not authorized to view this page.')
+        return redirect('job_list')
+
+    company = get_object_or_404(Company, user=request.user)
+
+    if request.method == 'POST':
+        status = request.POST.get('status')
+        # Ticked checkboxes carry application ids; anything else is ignored.
+        ids = [value for value in request.POST.getlist('applications') if value.isdigit()]
+        if status not in BULK_STATUSES:
+            messages.error(request, 'Please choose a valid status.')
+        elif not ids:
+            messages.warning(request, 'Please select at least one application.')
+        else:
+            # Only ever touch applications to this company's own jobs.
+            applications = Application.objects.filter(pk__in=ids, job__company=company)
+            moved = bulk_change_status(applications, status)
+            label = dict(Application.STATUS_CHOICES)[status]
+            messages.success(request, f'{moved} application(s) moved to "{label}".')
+        return redirect(request.get_full_path())
+
+    # Per-job, per-status counts come from one cached grouped query.
+    stats = job_cache.get_company_stats(company.pk)
+    jobs = Job.objects.filter(company=company).only('id', 'title', 'is_active', 'created_at').order_by('-created_at', '-id')
+    rows = []
+    for job in jobs:
+        counts = stats.get(job.pk, {})
+        rows.append({
+            'job': job,
+            'counts': [counts.get(status, 0) for status, _ in Application.STATUS_CHOICES],
+            'total': sum(counts.values()),
+        })
+
+    # The applications of one job, when the company picks a job to manage.
+    selected_job = None
+    applications, next_cursor = [], None
+    job_id = request.GET.get('job')
+    if job_id and job_id.isdigit():
+        selected_job = get_object_or_404(Job, pk=job_id, company=company)
+        applications, next_cursor = keyset_page(
+            Application.objects.filter(job=selected_job)
+            .select_related('applicant__user')
+            .only('id', 'status', 'applied_at', 'applicant__user__username', 'applicant__user__email'),
+            request.GET.get('cursor'),
+            page_size=DASHBOARD_PAGE_SIZE,
+            date_field='applied_at',
+        )
+
+    context = {
+        'company': company,
+        'rows': rows,
+        'status_labels': [label for _, label in Application.STATUS_CHOICES],
+        'bulk_statuses': [(status, dict(Application.STATUS_CHOICES)[status]) for status in BULK_STATUSES],
+        'selected_job': selected_job,
+        'applications': applications,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'accounts/company_dashboard.html', context)
@@ -0,0 +1,10 @@
+"""
+Stand-alone performance benchmarks.
+
+Each module here is run from the project root, e.g.:
+
+    python -m benchmarks.search --sizes 100000 1000000
+
+They build a throw-away database (the same way the test runner does), so they
+never touch db.sqlite3.
+"""
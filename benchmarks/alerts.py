@@ -0,0 +1,199 @@
+# Path: /benchmarks/alerts.py
+
+"""
+Times the job alert matcher (jobs/alerts.py) against a large number of saved searches.
+
+    python -m benchmarks.alerts --searches 1000000 --jobs 5000
+
+It fills a scratch database with a catalog of jobs (for the search index the
+anchor terms are picked from), --searches saved searches spread over one
+applicant per ten searches, then posts --jobs new jobs and runs
+match_new_jobs() and send_digests() over them. Emails go to Django's
+in-memory backend.
+
+Real searches ask for skills ("python", "payroll") far more than for filler
+words, and a few skills are much more popular than the rest. The jobs and
+searches here draw their skills from a synthetic vocabulary of --vocabulary
+words with Zipf-distributed popularity, next to the small fixed vocabulary
+of benchmarks/common.py.
+
+'brute_force' is the cost per job of checking every saved search in turn,
+which is what the inverted index avoids.
+"""
+
+import argparse
+import bisect
+import itertools
+import random
+import time
+
+from .common import CITIES, JOB_TYPES, TITLES, WORDS, setup_django, scratch_database, create_jobs, fake_job_fields, report
+
+
+class Vocabulary:
+    """
+    Draws synthetic skill words with Zipf-Mandelbrot popularity: the word of
+    rank r is drawn in proportion to 1 / (r + offset). The offset flattens the
+    head, so the most popular skill is in a few percent of the jobs, not half.
+    """
+
+    def __init__(self, size, offset=20):
+        self.words = [f'skill{i}' for i in range(size)]
+        self.weights = list(itertools.accumulate(1 / (rank + offset) for rank in range(size)))
+
+    def sample(self, rng, k):
+        total = self.weights[-1]
+        return [self.words[bisect.bisect(self.weights, rng.random() * total)] for _ in range(k)]
+
+
+def post_jobs(count, vocabulary, rng, company_ids):
+    """Bulk-inserts 'count' jobs whose descriptions also mention a few skills."""
+    from jobs.models import Job
+
+    jobs = []
+    for _ in range(count):
+        fields = fake_job_fields(rng)
+        fields['description'] += ' ' + ' '.join(vocabulary.sample(rng, rng.randint(3, 8)))
+        jobs.append(Job(company_id=rng.choice(company_ids), **fields))
+    return Job.objects.bulk_create(jobs, batch_size=5000)
+
+
+def create_searches(count, vocabulary, rng, batch_size=20000):
+    """Bulk-inserts 'count' saved searches, ten per applicant. Returns seconds spent picking anchors."""
+    from accounts.models import Applicant, User
+    from jobs.alerts import choose_match_term
+    from jobs.models import SavedSearch
+
+    applicants = max(1, count // 10)
+    for start in range(0, applicants, batch_size):
+        users = User.objects.bulk_create([
+            User(username=f'bench-applicant-{i}', email=f'applicant{i}@example.com',
+                 user_type='applicant', email_verified=True)
+            for i in range(start, min(start + batch_size, applicants))
+        ])
+        Applicant.objects.bulk_create([Applicant(user=user) for user in users])
+    first = Applicant.objects.order_by('pk').values_list('pk', flat=True)[0]
+
+    anchor_seconds = 0.0
+    filler = WORDS + [word.lower() for title in TITLES for word in title.split()]
+    for start in range(0, count, batch_size):
+        searches = []
+        for i in range(start, min(start + batch_size, count)):
+            # One to three skills, sometimes with a common word ("senior", "python").
+            words = vocabulary.sample(rng, rng.choice((1, 2, 2, 3)))
+            if rng.random() < 0.5:
+                words.append(rng.choice(filler))
+            search = SavedSearch(
+                applicant_id=first + i // 10,
+                query=' '.join(words),
+                location=rng.choice(CITIES) if rng.random() < 0.5 else '',
+                job_type=rng.choice(JOB_TYPES) if rng.random() < 0.2 else '',
+            )
+            # bulk_create() skips save(), which picks the anchor term.
+            started = time.perf_counter()
+            search.match_term = choose_match_term(search.query, search.location, search.job_type)
+            anchor_seconds += time.perf_counter() - started
+            searches.append(search)
+        SavedSearch.objects.bulk_create(searches)
+    return anchor_seconds
+
+
+def candidates_per_job(jobs, batch_size):
+    """How many saved searches the matcher reads per job (each candidate is read once per batch)."""
+    from jobs.alerts import TERMS_PER_QUERY, job_terms
+    from jobs.models import SavedSearch
+
+    read = 0
+    for start in range(0, len(jobs), batch_size):
+        terms = sorted(set().union(*(job_terms(job)[3] for job in jobs[start:start + batch_size])))
+        for i in range(0, len(terms), TERMS_PER_QUERY):
+            read += SavedSearch.objects.filter(match_term__in=terms[i:i + TERMS_PER_QUERY]).count()
+    return round(read / max(len(jobs), 1), 1)
+
+
+def brute_force_ms(jobs):
+    """Milliseconds per job to test every saved search against it, one job at a time."""
+    from jobs.alerts import criteria, job_terms
+    from jobs.models import SavedSearch
+
+    started = time.perf_counter()
+    for job in jobs:
+        words, place, job_type, _ = job_terms(job)
+        rows = SavedSearch.objects.values_list('query', 'location', 'job_type').iterator(chunk_size=5000)
+        for query, location, search_type in rows:
+            keywords, wanted_place, wanted_type = criteria(query, location, search_type)
+            keywords <= words and wanted_place <= place and wanted_type in ('', job_type)
+    return round((time.perf_counter() - started) * 1000 / len(jobs), 1)
+
+
+def run(searches, catalog, new_jobs, vocabulary_size, batch_size, brute_force_jobs):
+    from django.conf import settings
+    from django.core import mail
+    from django.utils import timezone
+    from jobs import alerts
+    from jobs.models import SavedSearchMatch
+    from jobs.search import rebuild_search_index
+
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    mail.outbox = []
+    rng = random.Random(7)
+    vocabulary = Vocabulary(vocabulary_size)
+
+    with scratch_database(on_disk=True):
+        company_ids = [company.pk for company in create_jobs(catalog)]
+        post_jobs(catalog, vocabulary, rng, company_ids)
+        rebuild_search_index()
+
+        started = time.perf_counter()
+        anchor_seconds = create_searches(searches, vocabulary, rng)
+        result = {
+            'searches': searches,
+            'setup_seconds': round(time.perf_counter() - started, 1),
+            'anchor_us_per_search': round(anchor_seconds * 1e6 / searches, 1),
+        }
+        # The first run only sets the starting point.
+        alerts.match_new_jobs()
+
+        jobs = post_jobs(new_jobs, vocabulary, rng, company_ids)
+        now = timezone.now() + alerts.MATCH_DELAY
+        started = time.perf_counter()
+        seen, matched = alerts.match_new_jobs(batch_size=batch_size, now=now)
+        seconds = time.perf_counter() - started
+        result['match'] = {
+            'jobs': seen,
+            'seconds': round(seconds, 2),
+            'jobs_per_second': round(seen / seconds),
+            'candidates_per_job': candidates_per_job(jobs, batch_size),
+            'matches': matched,
+            'stored': SavedSearchMatch.objects.count(),
+        }
+
+        started = time.perf_counter()
+        sent = alerts.send_digests('https://jobboard.example/', now=now)
+        seconds = time.perf_counter() - started
+        result['digests'] = {'emails': sent, 'seconds': round(seconds, 2),
+                             'emails_per_second': round(sent / seconds) if seconds else None}
+        if brute_force_jobs:
+            result['brute_force_ms_per_job'] = brute_force_ms(jobs[:brute_force_jobs])
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--searches', type=int, default=1_000_000, help="How many saved searches to create.")
+    parser.add_argument('--catalog', type=int, default=20_000, help="Jobs already on the site (used to pick anchors).")
+    parser.add_argument('--jobs', type=int, default=5000, help="New jobs to match.")
+    parser.add_argument('--vocabulary', type=int, default=20_000, help="Distinct synthetic skill words.")
+    parser.add_argument('--batch-size', type=int, default=500, help="Jobs matched at once.")
+    parser.add_argument('--brute-force-jobs', type=int, default=3,
+                        help="Jobs to time the search-by-search baseline on (0 to skip).")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    report(run(args.searches, args.catalog, args.jobs, args.vocabulary, args.batch_size, args.brute_force_jobs),
+           args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# Path: /benchmarks/applications_export.py
+
+"""
+Measures the applications export (jobs/exports.py) of one job with many applicants.
+
+    python -m benchmarks.applications_export --applicants 50000 --cv-kb 16
+
+It fills a scratch database and a temporary media directory with one job,
+--applicants applications and a distinct CV of --cv-kb KB for each, then
+downloads the export through the test client and reports:
+
+* plan_seconds: the pass over the rows that runs before anything is sent;
+* first_byte_seconds: from the request to the first chunk of the response,
+  for a full download and for one resumed half way through;
+* MB/s for the whole download, and the peak memory allocated meanwhile
+  (traced in a second download, since tracing slows it down).
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import zlib
+
+from .common import setup_django, scratch_database, create_jobs, report
+
+
+def create_applicants(job, count, cv_size, rng, batch_size=5000):
+    """Bulk-inserts 'count' applicants with a CV each and their applications to 'job'."""
+    import hashlib
+    from accounts.models import Applicant, CVBlob, User
+    from accounts.storage import cv_storage
+    from jobs.models import Application
+
+    for start in range(0, count, batch_size):
+        users = User.objects.bulk_create([
+            User(username=f'bench-applicant-{i}', email=f'applicant{i}@example.com', user_type='applicant',
+                 first_name='Bench', last_name=f'Applicant {i}')
+            for i in range(start, min(start + batch_size, count))
+        ])
+        applicants, blobs = [], []
+        for user in users:
+            content = b'%PDF-1.4 ' + rng.randbytes(cv_size - 9)
+            name = cv_storage.hashed_name('cvs/cv.pdf', hashlib.sha256(content).hexdigest())
+            path = cv_storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+            blobs.append(CVBlob(name=name, size=len(content), crc32=zlib.crc32(content), refcount=1))
+            applicants.append(Applicant(user=user, cv=name, cv_original_name=f'{user.username}.pdf'))
+        CVBlob.objects.bulk_create(blobs)
+        Applicant.objects.bulk_create(applicants)
+        Application.objects.bulk_create([Application(job=job, applicant=applicant) for applicant in applicants])
+
+
+def download(client, url, traced=False, **headers):
+    """Returns (seconds to the first chunk, seconds in all, bytes, peak MB allocated or None)."""
+    import tracemalloc
+
+    if traced:
+        tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, headers=headers)
+    first_byte, size = None, 0
+    for chunk in response.streaming_content:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    seconds = time.perf_counter() - started
+    peak = None
+    if traced:
+        peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return first_byte, seconds, size, peak
+
+
+def run(applicants, cv_kb):
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import reverse
+    from jobs.exports import ApplicationExport
+    from jobs.models import Job
+
+    settings.ALLOWED_HOSTS = ['*']
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as media, scratch_database(on_disk=True):
+        settings.MEDIA_ROOT = media
+        create_jobs(1, companies=1)
+        job = Job.objects.select_related('company__user').get()
+        company = job.company
+        started = time.perf_counter()
+        create_applicants(job, applicants, cv_kb * 1024, rng)
+        result = {'applicants': applicants, 'setup_seconds': round(time.perf_counter() - started, 1)}
+
+        started = time.perf_counter()
+        export = ApplicationExport(job)
+        export.close()
+        result['plan_seconds'] = round(time.perf_counter() - started, 2)
+        result['archive_mb'] = round(export.size / 2**20, 1)
+
+        client = Client()
+        client.force_login(company.user)
+        url = reverse('export_applications', args=[job.pk])
+        first_byte, seconds, size, _ = download(client, url)
+        assert size == export.size
+        result['full'] = {'first_byte_seconds': round(first_byte, 2), 'seconds': round(seconds, 1),
+                          'mb_per_second': round(size / 2**20 / seconds, 1)}
+        first_byte, seconds, size, _ = download(client, url, Range=f'bytes={export.size // 2}-', If_Range=export.etag)
+        result['resumed_half_way'] = {'first_byte_seconds': round(first_byte, 2), 'seconds': round(seconds, 1)}
+        result['peak_mb'] = download(client, url, traced=True)[3]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--applicants', type=int, default=50_000, help="Applications to the exported job.")
+    parser.add_argument('--cv-kb', type=int, default=16, help="Size of each CV in KB.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    report(run(args.applicants, args.cv_kb), args.output)
+
+
+if __name__ == '__main__':
+    main()
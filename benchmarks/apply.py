@@ -0,0 +1,132 @@
+# Path: /benchmarks/apply.py
+
+"""
+Stress test for the apply endpoint: thousands of simultaneous applies to one job.
+
+    python -m benchmarks.apply --applicants 500 --attempts 4 --threads 32
+
+Every applicant submits the same application several times at once, as a
+double-clicking browser or a retrying API client would. Half of them reuse one
+idempotency key and the rest send a fresh key with every attempt. Afterwards
+we check that each applicant has exactly one application and that the
+dashboard counters agree. The old exists()-then-create() flow is run the same
+way for comparison, and every IntegrityError it lets through is counted.
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import setup_django, scratch_database, create_jobs, report
+
+
+def legacy_apply(job, applicant_id):
+    """What apply_for_job used to do: check, then insert."""
+    from jobs.models import Application
+    if Application.objects.filter(job=job, applicant_id=applicant_id).exists():
+        return 'duplicate'
+    Application.objects.create(job=job, applicant_id=applicant_id)
+    return 'created'
+
+
+def fire(job, applicant_ids, attempts, threads, apply):
+    """Sends every attempt through a thread pool at once and tallies the outcomes."""
+    from django.db import connection
+
+    calls = []
+    for n, applicant_id in enumerate(applicant_ids):
+        for attempt in range(attempts):
+            key = f'{applicant_id}-same' if n % 2 == 0 else f'{applicant_id}-{attempt}'
+            calls.append((applicant_id, key))
+    random.Random(7).shuffle(calls)
+
+    def call(args):
+        try:
+            return apply(job, *args)
+        except Exception as exc:
+            return type(exc).__name__
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        outcomes = Counter(pool.map(call, calls))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(calls),
+        'seconds': round(elapsed, 2),
+        'per_second': round(len(calls) / elapsed, 1),
+        'outcomes': dict(outcomes),
+    }
+
+
+def check(job):
+    """Returns the consistency checks for 'job' after a run."""
+    from django.db.models import Count
+    from jobs.models import Application, ApplicationSummary
+
+    per_applicant = Application.objects.filter(job=job).values('applicant_id').annotate(n=Count('id'))
+    return {
+        'applications': Application.objects.filter(job=job).count(),
+        'applicants_with_more_than_one': sum(1 for row in per_applicant if row['n'] > 1),
+        'summaries': ApplicationSummary.objects.filter(job=job).count(),
+    }
+
+
+def run(applicants, attempts, threads):
+    from accounts.models import User, Applicant
+    from jobs.applications import apply_to_job
+    from django.db.models import Sum
+    from jobs.models import Application, ApplicationStatusCount, Job
+
+    with scratch_database(on_disk=True):
+        companies = create_jobs(2, companies=1)
+        users = User.objects.bulk_create([
+            User(username=f'bench-applicant-{i}', user_type='applicant') for i in range(applicants)
+        ])
+        Applicant.objects.bulk_create([Applicant(user=user) for user in users])
+        applicant_ids = [user.pk for user in users]
+        new_job, old_job = Job.objects.filter(company=companies[0]).select_related('company')
+
+        results = {'applicants': applicants, 'attempts_each': attempts, 'threads': threads}
+        results['apply_to_job'] = fire(
+            new_job, applicant_ids, attempts, threads,
+            lambda job, applicant_id, key: apply_to_job(job.pk, applicant_id, key)[1],
+        )
+        results['apply_to_job']['checks'] = check(new_job)
+        results['legacy'] = fire(
+            old_job, applicant_ids, attempts, threads,
+            lambda job, applicant_id, key: legacy_apply(job, applicant_id),
+        )
+        results['legacy']['checks'] = check(old_job)
+
+        checks = results['apply_to_job']['checks']
+        counted = ApplicationStatusCount.objects.aggregate(n=Sum('count'))['n']
+        results['exactly_once'] = (
+            checks['applications'] == checks['summaries'] == applicants
+            and checks['applicants_with_more_than_one'] == 0
+            # Both jobs together: the dashboard counters must match the real rows.
+            and counted == Application.objects.count()
+        )
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--applicants', type=int, default=500, help="How many different applicants apply.")
+    parser.add_argument('--attempts', type=int, default=4, help="How many times each of them submits.")
+    parser.add_argument('--threads', type=int, default=32, help="How many requests run at the same time.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.applicants, args.attempts, args.threads)
+    report(results, args.output)
+    if not results['exactly_once']:
+        raise SystemExit("Exactly-once check failed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# Path: /benchmarks/asgi_load.py
+
+"""
+Compares the sync and async job pages under uvicorn at a fixed concurrency.
+
+Point it at a running server whose database already has jobs in it:
+
+    uvicorn job_board.asgi:application --port 8000 --workers 1
+    python -m benchmarks.asgi_load --url http://127.0.0.1:8000 --concurrency 64
+
+or let it start uvicorn itself with '--spawn'. For every page it reports
+requests per second and p50/p99 latency, for the sync and the async version.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from .common import BASE_DIR, report
+
+# (name, sync path, async path). '{pk}' is replaced by a real job id.
+PAGES = [
+    ('job_list', '/', '/async/'),
+    ('job_detail', '/job/{pk}/', '/async/job/{pk}/'),
+]
+
+
+async def _read_response(reader):
+    """Reads one HTTP/1.1 response and returns its status code."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    status = int(status_line.split()[1])
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+async def _worker(host, port, path, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.encode()
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(url, path, concurrency, duration):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(host, port, path, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'path': path,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None,
+    }
+
+
+async def _first_job_id(url):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    writer.write(f'GET /api/jobs/ HTTP/1.1\r\nHost: {parts.hostname}\r\nConnection: close\r\n\r\n'.encode())
+    body = await reader.read()
+    writer.close()
+    marker = b'"id": '
+    index = body.find(marker)
+    if index == -1:
+        raise SystemExit("The server has no jobs. Import or seed some first.")
+    return int(body[index + len(marker):].split(b',')[0])
+
+
+def _spawn(port):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='job_board.settings')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'job_board.asgi:application', '--port', str(port),
+         '--workers', '1', '--log-level', 'warning', '--no-access-log'],
+        cwd=BASE_DIR, env=env,
+    )
+    time.sleep(2)
+    return server
+
+
+async def main_async(args):
+    pk = await _first_job_id(args.url)
+    results = []
+    for name, sync_path, async_path in PAGES:
+        row = {'page': name, 'concurrency': args.concurrency}
+        for kind, path in (('sync', sync_path), ('async', async_path)):
+            path = path.format(pk=pk)
+            await load(args.url, path, args.concurrency, min(args.duration, 2))  # warm up
+            row[kind] = await load(args.url, path, args.concurrency, args.duration)
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per measurement.")
+    parser.add_argument('--spawn', action='store_true', help="Start uvicorn on the --url port first.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    server = _spawn(urlsplit(args.url).port or 80) if args.spawn else None
+    try:
+        report(asyncio.run(main_async(args)), args.output)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# Path: /benchmarks/common.py
+
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# A small vocabulary used to generate believable job postings.
+TITLES = ['Backend Engineer', 'Frontend Developer', 'Data Analyst', 'Product Manager',
+          'DevOps Engineer', 'Accountant', 'Nurse', 'Sales Representative',
+          'Graphic Designer', 'Customer Support Agent', 'Teacher', 'Electrician']
+LEVELS = ['Junior', 'Mid-level', 'Senior', 'Lead', 'Principal']
+CITIES = ['Lagos', 'Abuja', 'Nairobi', 'Accra', 'Cairo', 'Cape Town', 'London',
+          'Berlin', 'Remote', 'New York', 'Toronto', 'Kigali']
+JOB_TYPES = ['Full-Time', 'Part-Time', 'Contract', 'Internship']
+WORDS = ('python django sql postgres react kubernetes excel sales marketing design '
+         'customer support healthcare teaching finance audit cloud security mobile '
+         'android ios testing agile leadership communication analytics').split()
+
+
+def setup_django():
+    """Makes the project importable and initialises Django."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'job_board.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def scratch_database(on_disk=False):
+    """
+    Creates a fresh, migrated database for the duration of a benchmark.
+    SQLite test databases live in memory, where concurrent writers fail instead
+    of waiting for each other. Pass on_disk=True to use a temporary file instead.
+    """
+    from django.db import connection, connections
+    from job_board.routers import replica_aliases
+
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if on_disk and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = str(BASE_DIR / 'benchmark.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    # Point the read replicas at the scratch database too, like the test runner does.
+    replicas = {alias: connections[alias].settings_dict['NAME'] for alias in replica_aliases()}
+    for alias in replicas:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield connection
+    finally:
+        for alias, name in replicas.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+
+
+def fake_job_fields(rng):
+    """Returns the text fields of one random job posting."""
+    low = rng.randrange(20, 150) * 1000
+    return {
+        'title': f"{rng.choice(LEVELS)} {rng.choice(TITLES)}",
+        'description': ' '.join(rng.choices(WORDS, k=40)),
+        'location': rng.choice(CITIES),
+        'job_type': rng.choice(JOB_TYPES),
+        'salary': f"${low:,} - ${low + rng.randrange(5, 40) * 1000:,} a year",
+    }
+
+
+def create_jobs(count, companies=50, batch_size=5000, seed=42):
+    """Bulk-inserts 'count' random jobs spread over 'companies' companies."""
+    from accounts.models import User, Company
+    from jobs.models import Job
+    from jobs.normalize import normalize_job
+
+    rng = random.Random(seed)
+    users = User.objects.bulk_create([
+        User(username=f'bench-company-{i}', user_type='company') for i in range(companies)
+    ])
+    company_objs = Company.objects.bulk_create([
+        Company(user=user, name=f'Company {i}') for i, user in enumerate(users)
+    ])
+    for start in range(0, count, batch_size):
+        jobs = [
+            Job(company=rng.choice(company_objs), **fake_job_fields(rng))
+            for _ in range(min(batch_size, count - start))
+        ]
+        # bulk_create() skips save(), which fills the salary and location columns.
+        for job in jobs:
+            normalize_job(job)
+        Job.objects.bulk_create(jobs)
+    return company_objs
+
+
+def measure(fn, repeat=200, warmup=10):
+    """Calls 'fn' repeatedly and returns latency statistics in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3),
+        'p99_ms': round(samples[int(len(samples) * 0.99) - 1], 3),
+    }
+
+
+def report(results, output=None):
+    """Prints results as JSON, and also writes them to 'output' if given."""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        Path(output).write_text(text + '\n')
@@ -0,0 +1,101 @@
+# Path: /benchmarks/export.py
+
+"""
+Shows that the streamed catalog export uses the same memory at any catalog size.
+
+    python -m benchmarks.export --sizes 10000 100000 1000000
+
+For every size it downloads /api/jobs/export/ (plain and gzipped) through the
+test client and records the peak Python memory (tracemalloc) while reading
+it. 'ndjson_asgi' downloads it once more through the async test client, the
+way it is served under ASGI. For comparison it also builds the whole export as one JSON document in
+memory, the way a plain JsonResponse would, up to --naive-limit jobs.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from .common import setup_django, scratch_database, create_jobs, report
+
+
+def traced(fn):
+    """Runs fn() and returns (its result, seconds taken, peak MB allocated meanwhile)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, time.perf_counter() - started, round(peak / 2**20, 1)
+
+
+def download(client, **headers):
+    from django.urls import reverse
+
+    response = client.get(reverse('job_export'), headers=headers)
+    return sum(len(chunk) for chunk in response.streaming_content)
+
+
+def download_asgi(client, **headers):
+    from asgiref.sync import async_to_sync
+    from django.urls import reverse
+
+    async def fetch():
+        response = await client.get(reverse('job_export'), headers=headers)
+        return sum([len(chunk) async for chunk in response.streaming_content])
+
+    # async_to_sync keeps the view's database work on this thread, like an
+    # async test does, so it sees the scratch database.
+    return async_to_sync(fetch)()
+
+
+def build_in_memory():
+    import json
+    from jobs.models import Job
+    from jobs.serializers import job_to_dict
+
+    jobs = Job.objects.filter(is_active=True).select_related('company').order_by('pk')
+    return len(json.dumps([job_to_dict(job) for job in jobs]).encode())
+
+
+def run(size, naive_limit):
+    from django.test import AsyncClient, Client, override_settings
+
+    with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+        create_jobs(size)
+        client, async_client = Client(), AsyncClient()
+        result = {'jobs': size}
+        downloads = (
+            ('ndjson', lambda: download(client)),
+            ('ndjson_gzip', lambda: download(client, **{'accept-encoding': 'gzip'})),
+            ('ndjson_asgi', lambda: download_asgi(async_client)),
+        )
+        for name, fetch in downloads:
+            size_bytes, seconds, peak = traced(fetch)
+            result[name] = {
+                'peak_mb': peak,
+                'mb': round(size_bytes / 2**20, 1),
+                'jobs_per_second': round(size / seconds),
+            }
+        if size <= naive_limit:
+            size_bytes, seconds, peak = traced(build_in_memory)
+            result['in_memory_json'] = {'peak_mb': peak, 'jobs_per_second': round(size / seconds)}
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--naive-limit', type=int, default=100000,
+                        help="Largest catalog to also build fully in memory.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    report([run(size, args.naive_limit) for size in args.sizes], args.output)
+
+
+if __name__ == '__main__':
+    main()
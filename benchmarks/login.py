@@ -0,0 +1,98 @@
+# Path: /benchmarks/login.py
+
+"""
+Measures logins per second on a single core, before and after the login rework.
+
+    python -m benchmarks.login --seconds 10
+
+'double_authenticate' replays the old login_view, which validated the form
+(one password hash) and then called authenticate() again (a second hash).
+'single_authenticate' is the current view. 'throttled' measures how cheaply
+refused attempts are turned away once a bucket is empty.
+"""
+
+import argparse
+import logging
+import time
+
+from .common import setup_django, scratch_database, report
+
+PASSWORD = 'bench-password-123'
+
+
+def _rate(fn, seconds):
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fn()
+        count += 1
+    elapsed = time.perf_counter() - started
+    return {'attempts': count, 'per_second': round(count / elapsed, 1), 'ms_each': round(1000 * elapsed / count, 2)}
+
+
+def run(seconds):
+    from django.contrib.auth import authenticate
+    from django.contrib.auth.forms import AuthenticationForm
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.core.cache import cache
+    from django.test import Client, RequestFactory, override_settings
+
+    from accounts.models import User
+
+    with scratch_database():
+        User.objects.create_user('bench', password=PASSWORD, user_type='applicant')
+        factory = RequestFactory()
+        data = {'username': 'bench', 'password': PASSWORD}
+
+        def double_authenticate():
+            request = factory.post('/accounts/login/', data)
+            request.session = SessionStore()
+            form = AuthenticationForm(request, data=request.POST)
+            assert form.is_valid()
+            assert authenticate(username='bench', password=PASSWORD) is not None
+
+        def single_authenticate():
+            request = factory.post('/accounts/login/', data)
+            request.session = SessionStore()
+            form = AuthenticationForm(request, data=request.POST)
+            assert form.is_valid() and form.get_user() is not None
+
+        client = Client()
+        huge = {'ip': (10**9, 10**6), 'username': (10**9, 10**6)}
+
+        def full_view():
+            assert client.post('/accounts/login/', data).status_code == 302
+
+        def throttled():
+            assert client.post('/accounts/login/', {'username': 'bench', 'password': 'x'}).status_code == 429
+
+        results = {
+            'double_authenticate': _rate(double_authenticate, seconds),
+            'single_authenticate': _rate(single_authenticate, seconds),
+        }
+        with override_settings(LOGIN_THROTTLE=huge, ALLOWED_HOSTS=['testserver']):
+            cache.clear()
+            results['login_view'] = _rate(full_view, seconds)
+        with override_settings(LOGIN_THROTTLE={'ip': (1, 1e-9), 'username': (1, 1e-9)}, ALLOWED_HOSTS=['testserver']):
+            cache.clear()
+            # Every refusal is logged as a 4xx by django.request; keep the output readable.
+            logging.getLogger('django.request').setLevel(logging.ERROR)
+            client.post('/accounts/login/', {'username': 'bench', 'password': 'x'})
+            results['throttled'] = _rate(throttled, seconds)
+        results['speedup'] = round(
+            results['single_authenticate']['per_second'] / results['double_authenticate']['per_second'], 2
+        )
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10.0, help="How long to run each measurement.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    report(run(args.seconds), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Path: /benchmarks/provision.py
+
+"""
+Measures how 'manage.py provision_accounts' scales with the size of its hashing pool.
+
+    python -m benchmarks.provision --accounts 400 --processes 1 2 4 8
+
+For every pool size it provisions --accounts new accounts from a generated
+CSV file into a fresh database, with the project's real password hasher, and
+reports accounts per second. Hashing dominates, so the rate should grow with
+the number of processes up to the number of cores.
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from .common import setup_django, scratch_database, report
+
+
+def write_accounts(path, count):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['username', 'email', 'user_type', 'password', 'company_name'])
+        for i in range(count):
+            if i % 20 == 0:
+                writer.writerow([f'company-{i}', f'hr{i}@example.com', 'company', f'pw-{i}-x9', f'Company {i}'])
+            else:
+                writer.writerow([f'student-{i}', f'student{i}@example.com', 'applicant', f'pw-{i}-x9', ''])
+
+
+def run(count, processes, batch_size):
+    from accounts.provisioning import provision_accounts, read_accounts
+
+    with tempfile.TemporaryDirectory() as directory, scratch_database(on_disk=True):
+        path = os.path.join(directory, 'accounts.csv')
+        write_accounts(path, count)
+        started = time.perf_counter()
+        stats = provision_accounts(read_accounts(path), processes=processes, batch_size=batch_size, verified=True)
+        seconds = time.perf_counter() - started
+        return {
+            'processes': processes,
+            'accounts': stats['created'],
+            'seconds': round(seconds, 2),
+            'accounts_per_second': round(stats['created'] / seconds, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=400, help="Accounts to create per run.")
+    parser.add_argument('--processes', type=int, nargs='+', help="Pool sizes to try (default: 1, 2, 4... up to the cores).")
+    parser.add_argument('--batch-size', type=int, default=100, help="Accounts written per transaction.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    processes = args.processes or sorted({1, cores, *(2**i for i in range(1, cores.bit_length()) if 2**i < cores)})
+    setup_django()
+    results = [run(args.accounts, size, args.batch_size) for size in processes]
+    single = results[0]['accounts_per_second']
+    for result in results:
+        result['speedup'] = round(result['accounts_per_second'] / single, 2)
+    report({'cores': cores, 'runs': results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
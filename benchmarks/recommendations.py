@@ -0,0 +1,59 @@
+# Path: /benchmarks/recommendations.py
+
+"""
+Times 'build_recommendations' and records its peak memory at several catalog sizes.
+
+    python -m benchmarks.recommendations --sizes 10000 100000 --edit-share 0.01
+
+For every size it runs a full build, then edits --edit-share of the jobs and
+runs an incremental build. Peak memory is what tracemalloc saw, which
+includes NumPy's arrays. The generated jobs share a small vocabulary, so
+nearly every pair of jobs has some words in common: a worst case for the
+block products compared with real postings.
+"""
+
+import argparse
+import random
+
+from .common import setup_django, scratch_database, create_jobs, report
+from .export import traced
+
+
+def run(size, edit_share, chunk_size):
+    from jobs.models import Job
+    from jobs.recommendations import block_rows, build_recommendations
+
+    with scratch_database(on_disk=True):
+        create_jobs(size)
+        result = {'jobs': size, 'block_rows': block_rows(size, chunk_size)}
+
+        stats, seconds, peak = traced(lambda: build_recommendations(full=True, chunk_size=chunk_size))
+        result['full'] = {'seconds': round(seconds, 2), 'peak_mb': peak, 'vocabulary': stats['vocabulary']}
+
+        ids = list(Job.objects.values_list('pk', flat=True))
+        edited = random.Random(1).sample(ids, max(1, int(len(ids) * edit_share)))
+        for job in Job.objects.filter(pk__in=edited):
+            job.title = f'{job.title} (updated)'
+            job.save(update_fields=['title', 'updated_at'])
+        stats, seconds, peak = traced(lambda: build_recommendations(chunk_size=chunk_size))
+        result['incremental'] = {
+            'edited': len(edited), 'seconds': round(seconds, 2), 'peak_mb': peak,
+            'recomputed': stats['recomputed'], 'merged': stats['merged'],
+        }
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000], help="Catalog sizes to try.")
+    parser.add_argument('--edit-share', type=float, default=0.01, help="Share of jobs edited before the incremental run.")
+    parser.add_argument('--chunk-size', type=int, help="Rows per block. By default it is picked from the catalog size.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    report([run(size, args.edit_share, args.chunk_size) for size in args.sizes], args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Path: /benchmarks/search.py
+
+"""
+Measures full-text job search latency at different catalog sizes.
+
+    python -m benchmarks.search --sizes 100000 1000000
+"""
+
+import argparse
+import time
+
+from .common import setup_django, scratch_database, create_jobs, measure, report
+
+QUERIES = {
+    'single_term': {'query': 'django'},
+    'two_terms': {'query': 'senior python'},
+    'title_phrase': {'query': 'backend engineer'},
+    'filtered': {'query': 'python', 'job_type': 'Contract', 'location': 'Lagos'},
+    'rare_term': {'query': 'electrician audit'},
+}
+
+
+def run(size, repeat):
+    from jobs.search import rebuild_search_index, search_jobs
+
+    with scratch_database():
+        started = time.perf_counter()
+        create_jobs(size)
+        seeded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rebuild_search_index()
+        indexed = time.perf_counter() - started
+
+        result = {'jobs': size, 'seed_s': round(seeded, 1), 'index_s': round(indexed, 1)}
+        for name, params in QUERIES.items():
+            params = dict(params)
+            query = params.pop('query')
+            result[name] = measure(lambda: search_jobs(query, **params), repeat=repeat)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    report([run(size, args.repeat) for size in args.sizes], args.output)
+
+
+if __name__ == '__main__':
+    main()
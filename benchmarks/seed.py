@@ -0,0 +1,74 @@
+# Path: /benchmarks/seed.py
+
+"""
+Fills a database with a large, realistic and reproducible data set.
+
+Used by the benchmark suite and by 'manage.py seed_benchmark'. Everything is
+written with bulk inserts. The same seed always produces the same data.
+"""
+
+import random
+import time
+
+from .common import create_jobs
+
+# Every seeded applicant can log in with this password.
+BENCH_PASSWORD = 'bench-password-123'
+
+
+def applicant_username(i):
+    return f'bench-applicant-{i}'
+
+
+def seed_database(jobs, applicants, companies=None, applications_per_applicant=5, seed=42, batch_size=5000):
+    """
+    Creates 'jobs' jobs, 'applicants' applicants and a few applications each,
+    then rebuilds the search index and dashboard read model.
+    Returns a dict with the number of rows created and the time it took.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+
+    from accounts.models import User, Applicant
+    from jobs.models import Job, Application
+    from jobs.search import fts_available, rebuild_search_index
+    from jobs.summaries import rebuild_summaries
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    companies = companies or max(1, jobs // 200)
+    with transaction.atomic():
+        create_jobs(jobs, companies=companies, batch_size=batch_size, seed=seed)
+        job_ids = list(Job.objects.order_by('pk').values_list('pk', flat=True))
+
+        # Hashing a password is slow on purpose, so every applicant shares one hash.
+        password = make_password(BENCH_PASSWORD)
+        applications = 0
+        for start in range(0, applicants, batch_size):
+            users = User.objects.bulk_create([
+                User(username=applicant_username(i), password=password, user_type='applicant', email_verified=True)
+                for i in range(start, min(start + batch_size, applicants))
+            ])
+            Applicant.objects.bulk_create([Applicant(user=user) for user in users])
+            per_applicant = min(applications_per_applicant, len(job_ids))
+            batch = Application.objects.bulk_create([
+                Application(job_id=job_id, applicant_id=user.pk,
+                            status=rng.choice(Application.STATUS_CHOICES)[0])
+                for user in users
+                for job_id in rng.sample(job_ids, per_applicant)
+            ], batch_size=batch_size)
+            applications += len(batch)
+
+    # bulk_create skipped Application.save() and the search signals, so build
+    # the derived tables in one go now.
+    rebuild_summaries(batch_size=batch_size)
+    if fts_available():
+        with transaction.atomic():
+            rebuild_search_index(batch_size=batch_size)
+    return {
+        'jobs': jobs,
+        'companies': companies,
+        'applicants': applicants,
+        'applications': applications,
+        'seed_s': round(time.perf_counter() - started, 1),
+    }
@@ -0,0 +1,124 @@
+# Path: /benchmarks/sessions.py
+
+"""
+Compares the session engines at the board's request mix.
+
+    python -m benchmarks.sessions --users 2000 --requests 20000 --write-ratio 0.05
+
+Each simulated request loads the session of a random signed-in user, the way
+AuthenticationMiddleware does, and a 'write-ratio' share of them also change it
+(a flash message, a login). For every engine we report the latency of one such
+request and how many database queries it cost on average:
+
+    db         django.contrib.sessions.backends.db (Django's default)
+    cache      django.contrib.sessions.backends.cache (nothing reaches the database)
+    cached_db  django.contrib.sessions.backends.cached_db (write-through)
+    hybrid     job_board.sessions as configured by default (local LRU +
+               write-through database; the local memory cache is skipped)
+    hybrid_write_behind
+               job_board.sessions with a shared (file) cache and rows
+               written behind to the database
+
+Queued rows are normally written by a timer thread. Here they are only
+written when a batch fills up or at the end, in the measured thread, so their
+queries are counted.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from importlib import import_module
+
+from .common import setup_django, scratch_database, measure, report
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'hybrid': 'job_board.sessions',
+    'hybrid_write_behind': 'job_board.sessions',
+}
+
+
+def write_behind_settings(directory):
+    """Settings for 'hybrid_write_behind': a file cache for sessions, and a timer that never fires here."""
+    from django.conf import settings
+
+    caches = dict(settings.CACHES)
+    caches['sessions'] = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                          'LOCATION': os.path.join(directory, 'sessions')}
+    return {'CACHES': caches, 'SESSION_CACHE_ALIAS': 'sessions', 'SESSION_WRITE_BEHIND_SECONDS': 3600}
+
+
+def run_engine(engine, users, requests, write_ratio, seed=7):
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.db import connection
+    from job_board import sessions
+
+    caches['default'].clear()
+    caches[settings.SESSION_CACHE_ALIAS].clear()
+    sessions.local_sessions.clear()
+    SessionStore = import_module(engine).SessionStore
+    keys = []
+    for i in range(users):
+        session = SessionStore()
+        session['_auth_user_id'] = str(i)
+        session.create()
+        keys.append(session.session_key)
+    sessions.flush_pending_sessions()
+
+    rng = random.Random(seed)
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def one_request():
+        session = SessionStore(rng.choice(keys))
+        assert session.get('_auth_user_id') is not None
+        if rng.random() < write_ratio:
+            session['_messages'] = 'saved'
+            session.save()
+
+    started = time.perf_counter()
+    with connection.execute_wrapper(count):
+        stats = measure(one_request, repeat=requests, warmup=0)
+        # Writes still queued at the end are part of the cost too.
+        sessions.flush_pending_sessions()
+    elapsed = time.perf_counter() - started
+    stats['requests_per_second'] = round(requests / elapsed, 1)
+    stats['queries_per_request'] = round(len(queries) / requests, 4)
+    return stats
+
+
+def run(users, requests, write_ratio, on_disk):
+    from django.test import override_settings
+
+    results = {'users': users, 'requests': requests, 'write_ratio': write_ratio, 'engines': {}}
+    with scratch_database(on_disk=on_disk), tempfile.TemporaryDirectory() as directory:
+        for name, engine in ENGINES.items():
+            overrides = write_behind_settings(directory) if name == 'hybrid_write_behind' else {}
+            with override_settings(**overrides):
+                results['engines'][name] = run_engine(engine, users, requests, write_ratio)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000, help="How many signed-in sessions exist.")
+    parser.add_argument('--requests', type=int, default=20000, help="How many requests to simulate per engine.")
+    parser.add_argument('--write-ratio', type=float, default=0.05, help="Share of requests that change the session.")
+    parser.add_argument('--in-memory', action='store_true', help="Use an in-memory database instead of a file.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    report(run(args.users, args.requests, args.write_ratio, on_disk=not args.in_memory), args.output)
+
+
+if __name__ == '__main__':
+    main()
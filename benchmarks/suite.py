@@ -0,0 +1,214 @@
+# Path: /benchmarks/suite.py
+
+"""
+The main benchmark suite: latency, throughput and query counts of the hot pages.
+
+    python -m benchmarks.suite --scales 10000 100000 1000000 --output results.json
+    python -m benchmarks.suite --baseline results.json
+
+For every scale (number of jobs) it seeds a fresh database with
+benchmarks/seed.py and then requests each page through Django's test client.
+Every page has a query budget. A page that runs more queries than its
+budget makes the suite exit with an error, so it can guard against N+1
+regressions in CI. With --baseline, the p50 of each page is also compared
+with an earlier run.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from .common import BASE_DIR, setup_django, scratch_database, measure, report
+from .seed import BENCH_PASSWORD, applicant_username, seed_database
+
+# The most queries each page may run. Anonymous pages read nothing but the
+# data they show. Logged-in pages also load the session and the user (2 queries),
+# and logging in creates a session and then rotates its key.
+QUERY_BUDGETS = {
+    'job_list': 1,
+    'job_list_cached': 0,
+    'job_list_filtered': 1,
+    'job_detail': 2,
+    'job_detail_cached': 0,
+    'apply_for_job': 7,
+    'applicant_dashboard': 5,
+    'login': 5,
+}
+
+# A radius and salary search on the listing (see jobs/filters.py).
+FILTERED_LISTING = {'near': 'Lagos', 'radius': 100, 'salary_min': 90000}
+
+# Hashing passwords is slow on purpose, so login is sampled less often.
+SLOW_PAGES = {'login': 10}
+
+
+# BEGIN/COMMIT/SAVEPOINT and friends don't count against a budget.
+TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+def count_queries(fn):
+    """Runs fn() once and returns how many queries it sent to any database."""
+    from django.db import connections
+    from job_board.sessions import flush_pending_sessions
+
+    # Write queued sessions now, so a write-behind flush isn't charged to this page.
+    flush_pending_sessions()
+
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        statements.append(sql)
+        return execute(sql, params, many, context)
+
+    # Execute wrappers see every query without opening unused connections.
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(record))
+        fn()
+    return sum(1 for sql in statements if not sql.lstrip().upper().startswith(TRANSACTION_CONTROL))
+
+
+def build_pages(applicant_index=0):
+    """
+    Returns {page name: function that requests it once}. Must run inside a
+    seeded database.
+    """
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+
+    from accounts.models import User
+    from jobs.models import Job
+
+    anonymous = Client()
+    applicant = Client()
+    applicant.force_login(User.objects.get(username=applicant_username(applicant_index)))
+    job_ids = list(Job.objects.order_by('-pk').values_list('pk', flat=True)[:5000])
+    detail_url = reverse('job_detail', args=[job_ids[0]])
+    apply_targets = itertools.cycle(job_ids)
+
+    def expect(response, status):
+        assert response.status_code == status, (response.status_code, status)
+
+    def job_list():
+        cache.clear()
+        expect(anonymous.get(reverse('job_list')), 200)
+
+    def job_list_filtered():
+        cache.clear()
+        expect(anonymous.get(reverse('job_list'), FILTERED_LISTING), 200)
+
+    def job_detail():
+        cache.clear()
+        expect(anonymous.get(detail_url), 200)
+
+    def apply_for_job():
+        url = reverse('apply_for_job', args=[next(apply_targets)])
+        expect(applicant.post(url, {'idempotency_key': uuid.uuid4().hex}), 302)
+
+    def login():
+        data = {'username': applicant_username(applicant_index + 1), 'password': BENCH_PASSWORD}
+        expect(Client().post(reverse('login'), data), 302)
+
+    return {
+        'job_list': job_list,
+        'job_list_cached': lambda: expect(anonymous.get(reverse('job_list')), 200),
+        'job_list_filtered': job_list_filtered,
+        'job_detail': job_detail,
+        'job_detail_cached': lambda: expect(anonymous.get(detail_url), 200),
+        'apply_for_job': apply_for_job,
+        'applicant_dashboard': lambda: expect(applicant.get(reverse('applicant_dashboard')), 200),
+        'login': login,
+    }
+
+
+def run_scale(jobs, applicants, repeat):
+    from django.test import override_settings
+
+    settings = {
+        'ALLOWED_HOSTS': ['testserver'],
+        # The suite logs in far more often than a real user would.
+        'LOGIN_THROTTLE': {'ip': (10**9, 10**6), 'username': (10**9, 10**6)},
+    }
+    with scratch_database(on_disk=True), override_settings(**settings):
+        result = {'seed': seed_database(jobs, applicants), 'pages': {}}
+        for name, fn in build_pages().items():
+            queries = count_queries(fn)
+            stats = measure(fn, repeat=SLOW_PAGES.get(name, repeat), warmup=2)
+            stats['per_second'] = round(1000 / stats['mean_ms'], 1) if stats['mean_ms'] else None
+            stats['queries'] = queries
+            stats['query_budget'] = QUERY_BUDGETS[name]
+            result['pages'][name] = stats
+        return result
+
+
+def environment():
+    """Describes where the numbers came from, so runs can be compared fairly."""
+    import django
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+    }
+
+
+def over_budget(results):
+    """Returns a list of 'scale/page' entries that ran more queries than allowed."""
+    return [
+        f"{scale}/{name}: {stats['queries']} queries > {stats['query_budget']}"
+        for scale, scale_result in results['scales'].items()
+        for name, stats in scale_result['pages'].items()
+        if stats['queries'] > stats['query_budget']
+    ]
+
+
+def compare(results, baseline):
+    """Returns {'scale/page': current p50 / baseline p50} for pages present in both runs."""
+    ratios = {}
+    for scale, scale_result in results['scales'].items():
+        old_pages = baseline.get('scales', {}).get(scale, {}).get('pages', {})
+        for name, stats in scale_result['pages'].items():
+            old = old_pages.get(name)
+            if old and old['p50_ms']:
+                ratios[f"{scale}/{name}"] = round(stats['p50_ms'] / old['p50_ms'], 2)
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000], help="Numbers of jobs to test with.")
+    parser.add_argument('--applicants-ratio', type=float, default=0.1,
+                        help="Applicants to seed per job (at least 10).")
+    parser.add_argument('--repeat', type=int, default=100, help="How many timed requests per page.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    parser.add_argument('--baseline', help="An earlier --output file to compare against.")
+    args = parser.parse_args()
+
+    setup_django()
+    results = {'environment': environment(), 'scales': {}}
+    for jobs in args.scales:
+        applicants = max(10, int(jobs * args.applicants_ratio))
+        results['scales'][str(jobs)] = run_scale(jobs, applicants, args.repeat)
+    if args.baseline:
+        results['p50_vs_baseline'] = compare(results, json.loads(Path(args.baseline).read_text()))
+    results['over_budget'] = over_budget(results)
+    report(results, args.output)
+    if results['over_budget']:
+        sys.exit("Query budget exceeded:\n  " + "\n  ".join(results['over_budget']))
+
+
+if __name__ == '__main__':
+    main()
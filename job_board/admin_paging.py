@@ -0,0 +1,83 @@
+# Path: /job_board/admin_paging.py
+
+"""
+Admin changelists for tables with millions of rows.
+
+Django's changelist counts the rows it pages through with an exact COUNT(*),
+twice when a filter is active (once for the filtered rows and once for the
+whole table). On a big table each of those is a full scan. LargeTableAdmin
+swaps them for:
+
+* an estimate from the database's own statistics when nothing is filtered
+  (PostgreSQL's pg_class.reltuples, MySQL's information_schema, SQLite's
+  sqlite_stat1 after ANALYZE), and
+* a count that stops at FILTERED_COUNT_LIMIT rows when something is, or
+  when the database has no statistics for the table yet.
+
+The page itself is still one indexed "ORDER BY pk DESC LIMIT n" query, so it
+stays fast however many rows match.
+"""
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Below this many rows an exact count is cheap enough.
+ESTIMATE_ABOVE = 10_000
+
+# Filtered changelists count at most this many matches (then show "10,001").
+FILTERED_COUNT_LIMIT = 10_000
+
+
+def estimated_row_count(model, using):
+    """Returns the database's estimate of how many rows 'model' has, or None if it has none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # ANALYZE stores the row count as the first number of each index's
+            # stats. Partial indexes hold fewer rows, so take the largest.
+            # Without them the largest rowid would be a guess that grows with
+            # every row ever deleted (archive_jobs deletes a lot), so the
+            # capped count is used instead.
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if not cursor.fetchone():
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+            return max(counts) if counts else None
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for tables that were never analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """A Paginator whose count is estimated or capped instead of exact (see the module docstring)."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ESTIMATE_ABOVE:
+                return estimate
+        # COUNT(*) over a LIMIT subquery stops reading once it has enough rows.
+        return queryset.order_by()[:FILTERED_COUNT_LIMIT + 1].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """A ModelAdmin for big tables: no exact counts, no facet counts, newest rows first."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    ordering = ('-pk',)
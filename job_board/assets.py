@@ -0,0 +1,247 @@
+# Path: /job_board/assets.py
+
+"""
+Builds the site's stylesheet from the utility classes used in the templates.
+
+The pages used to load the Tailwind "Play CDN" script, which downloads a
+compiler and generates the CSS in every visitor's browser before the page can
+be painted. Instead, 'manage.py build_css' reads every template, collects the
+class names it finds in class="..." attributes, and writes a small, minified
+static/css/site.css containing a rule for exactly those classes and nothing
+else. The rules follow Tailwind's naming and values, so the markup didn't have
+to change.
+
+Only the utilities this site uses are known here. Using a new class in a
+template that build_css doesn't know about makes it warn; add a rule for it to
+UTILITIES below (or to COMPONENT_CSS for a hand-written one) and rebuild.
+"""
+
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.template.utils import get_app_template_dirs
+
+# Where 'manage.py build_css' writes the bundle (a STATICFILES_DIRS directory).
+CSS_PATH = Path('css') / 'site.css'
+
+# class="..." attributes, which may span lines and contain template tags.
+CLASS_ATTR = re.compile(r'class="([^"]*)"', re.DOTALL)
+TEMPLATE_TAG = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.DOTALL)
+
+BREAKPOINTS = {'sm': '640px', 'md': '768px', 'lg': '1024px', 'xl': '1280px'}
+PSEUDO_CLASSES = {'hover': ':hover', 'focus': ':focus'}
+
+COLORS = {
+    'white': '#fff',
+    'black': '#000',
+    'transparent': 'transparent',
+}
+PALETTE = {
+    'gray': ['#f9fafb', '#f3f4f6', '#e5e7eb', '#d1d5db', '#9ca3af', '#6b7280', '#4b5563', '#374151', '#1f2937', '#111827'],
+    'blue': ['#eff6ff', '#dbeafe', '#bfdbfe', '#93c5fd', '#60a5fa', '#3b82f6', '#2563eb', '#1d4ed8', '#1e40af', '#1e3a8a'],
+    'red': ['#fef2f2', '#fee2e2', '#fecaca', '#fca5a5', '#f87171', '#ef4444', '#dc2626', '#b91c1c', '#991b1b', '#7f1d1d'],
+    'green': ['#f0fdf4', '#dcfce7', '#bbf7d0', '#86efac', '#4ade80', '#22c55e', '#16a34a', '#15803d', '#166534', '#14532d'],
+    'yellow': ['#fefce8', '#fef9c3', '#fef08a', '#fde047', '#facc15', '#eab308', '#ca8a04', '#a16207', '#854d0e', '#713f12'],
+}
+for _name, _shades in PALETTE.items():
+    for _shade, _value in zip([50, 100, 200, 300, 400, 500, 600, 700, 800, 900], _shades):
+        COLORS[f'{_name}-{_shade}'] = _value
+
+FONT_SIZES = {
+    'xs': ('.75rem', '1rem'), 'sm': ('.875rem', '1.25rem'), 'base': ('1rem', '1.5rem'),
+    'lg': ('1.125rem', '1.75rem'), 'xl': ('1.25rem', '1.75rem'), '2xl': ('1.5rem', '2rem'),
+    '3xl': ('1.875rem', '2.25rem'), '4xl': ('2.25rem', '2.5rem'), '5xl': ('3rem', '1'),
+}
+FONT_WEIGHTS = {'normal': '400', 'medium': '500', 'semibold': '600', 'bold': '700'}
+MAX_WIDTHS = {'none': 'none', 'md': '28rem', 'lg': '32rem', 'xl': '36rem', '2xl': '42rem', '7xl': '80rem'}
+RADII = {'': '.25rem', '-md': '.375rem', '-lg': '.5rem', '-xl': '.75rem', '-full': '9999px'}
+
+NO_SHADOW = '0 0 #0000'
+SHADOW = f'var(--tw-ring-offset-shadow,{NO_SHADOW}),var(--tw-ring-shadow,{NO_SHADOW}),var(--tw-shadow)'
+SHADOWS = {
+    '-sm': '0 1px 2px 0 rgb(0 0 0/.05)',
+    '': '0 1px 3px 0 rgb(0 0 0/.1),0 1px 2px -1px rgb(0 0 0/.1)',
+    '-md': '0 4px 6px -1px rgb(0 0 0/.1),0 2px 4px -2px rgb(0 0 0/.1)',
+    '-lg': '0 10px 15px -3px rgb(0 0 0/.1),0 4px 6px -4px rgb(0 0 0/.1)',
+}
+
+SIDES = {
+    '': ('',), 'x': ('-left', '-right'), 'y': ('-top', '-bottom'),
+    't': ('-top',), 'b': ('-bottom',), 'l': ('-left',), 'r': ('-right',),
+}
+
+
+def spacing(value):
+    """Tailwind's spacing scale: 1 unit is .25rem. Returns None for unknown values."""
+    if value == 'px':
+        return '1px'
+    if value == 'auto':
+        return 'auto'
+    if re.fullmatch(r'\d+(\.5)?', value):
+        return '0' if value == '0' else f'{float(value) / 4:g}rem'
+    return None
+
+
+# Fixed utilities: class name -> declarations.
+STATIC_UTILITIES = {
+    'block': 'display:block', 'inline-block': 'display:inline-block', 'inline': 'display:inline',
+    'flex': 'display:flex', 'grid': 'display:grid', 'hidden': 'display:none',
+    'flex-1': 'flex:1 1 0%', 'flex-wrap': 'flex-wrap:wrap',
+    'items-start': 'align-items:flex-start', 'items-center': 'align-items:center',
+    'justify-center': 'justify-content:center', 'justify-between': 'justify-content:space-between',
+    'relative': 'position:relative', 'sticky': 'position:sticky',
+    'overflow-hidden': 'overflow:hidden', 'overflow-x-auto': 'overflow-x:auto',
+    'w-full': 'width:100%', 'h-full': 'height:100%', 'h-screen': 'height:100vh',
+    'min-w-full': 'min-width:100%', 'min-h-screen': 'min-height:100vh',
+    'text-left': 'text-align:left', 'text-center': 'text-align:center', 'text-right': 'text-align:right',
+    'leading-tight': 'line-height:1.25', 'underline': 'text-decoration-line:underline',
+    'border': 'border-width:1px', 'border-b': 'border-bottom-width:1px',
+    'outline-none': 'outline:2px solid transparent;outline-offset:2px',
+    'transition-colors': 'transition-property:color,background-color,border-color,text-decoration-color,fill,stroke;'
+                         'transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms',
+    'transition-all': 'transition-property:all;transition-timing-function:cubic-bezier(.4,0,.2,1);'
+                      'transition-duration:150ms',
+}
+
+
+def _padding_margin(match):
+    prop = {'p': 'padding', 'm': 'margin'}[match['kind']]
+    value = spacing(match['value'])
+    if value is None or (prop == 'padding' and value == 'auto'):
+        return None
+    return ';'.join(f'{prop}{side}:{value}' for side in SIDES[match['side']])
+
+
+def _space_between(match):
+    value = spacing(match['value'])
+    side = 'left' if match['axis'] == 'x' else 'top'
+    return value and (f'margin-{side}:{value}', ' > :not([hidden]) ~ :not([hidden])')
+
+
+def _color(prop, suffix=''):
+    def rule(match):
+        value = COLORS.get(match['color'])
+        return value and (f'{prop}:{value}', suffix)
+    return rule
+
+
+# Pattern utilities, tried in order: (regex, function(match) -> declarations or
+# (declarations, selector suffix) or None).
+UTILITIES = [
+    (r'(?P<kind>[pm])(?P<side>[xytblr]?)-(?P<value>[\w.]+)', _padding_margin),
+    (r'space-(?P<axis>[xy])-(?P<value>[\w.]+)', _space_between),
+    (r'gap-(?P<value>[\w.]+)', lambda m: spacing(m['value']) and f"gap:{spacing(m['value'])}"),
+    (r'grid-cols-(?P<n>\d+)', lambda m: f"grid-template-columns:repeat({m['n']},minmax(0,1fr))"),
+    (r'col-span-(?P<n>\d+)', lambda m: f"grid-column:span {m['n']}/span {m['n']}"),
+    (r'[wh]-(?P<value>[\w.]+)', lambda m: spacing(m['value']) and (
+        f"{'width' if m[0][0] == 'w' else 'height'}:{spacing(m['value'])}")),
+    (r'max-w-(?P<size>\w+)', lambda m: m['size'] in MAX_WIDTHS and f"max-width:{MAX_WIDTHS[m['size']]}"),
+    (r'top-(?P<value>[\w.]+)', lambda m: spacing(m['value']) and f"top:{spacing(m['value'])}"),
+    (r'z-(?P<n>\d+)', lambda m: f"z-index:{m['n']}"),
+    (r'text-(?P<size>xs|sm|base|lg|\d?xl)', lambda m: 'font-size:%s;line-height:%s' % FONT_SIZES[m['size']]),
+    (r'font-(?P<weight>\w+)', lambda m: m['weight'] in FONT_WEIGHTS and f"font-weight:{FONT_WEIGHTS[m['weight']]}"),
+    (r'rounded(?P<size>-\w+)?', lambda m: (m['size'] or '') in RADII and f"border-radius:{RADII[m['size'] or '']}"),
+    (r'shadow(?P<size>-\w+)?', lambda m: (m['size'] or '') in SHADOWS and (
+        f"--tw-shadow:{SHADOWS[m['size'] or '']};box-shadow:{SHADOW}")),
+    (r'duration-(?P<ms>\d+)', lambda m: f"transition-duration:{m['ms']}ms"),
+    (r'ring-offset-(?P<px>\d+)', lambda m: f"--tw-ring-offset-width:{m['px']}px"),
+    (r'ring-(?P<px>\d+)', lambda m: (
+        f'--tw-ring-offset-shadow:0 0 0 var(--tw-ring-offset-width,0px) var(--tw-ring-offset-color,#fff);'
+        f"--tw-ring-shadow:0 0 0 calc({m['px']}px + var(--tw-ring-offset-width,0px)) "
+        f'var(--tw-ring-color,rgb(59 130 246/.5));'
+        f'box-shadow:var(--tw-ring-offset-shadow),var(--tw-ring-shadow),var(--tw-shadow,{NO_SHADOW})')),
+    (r'ring-(?P<color>[\w-]+)', _color('--tw-ring-color')),
+    (r'text-(?P<color>[\w-]+)', _color('color')),
+    (r'bg-(?P<color>[\w-]+)', _color('background-color')),
+    (r'border-(?P<color>[\w-]+)', _color('border-color')),
+    (r'placeholder-(?P<color>[\w-]+)', _color('color', '::placeholder')),
+]
+UTILITIES = [(re.compile(pattern), rule) for pattern, rule in UTILITIES]
+
+# A small reset (the parts of Tailwind's "preflight" these pages rely on), the
+# font stack and the few hand-written component styles.
+COMPONENT_CSS = """
+*,::before,::after{box-sizing:border-box;border:0 solid #e5e7eb}
+html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4}
+body{margin:0;line-height:inherit;font-family:ui-sans-serif,system-ui,-apple-system,"Segoe UI",Roboto,
+"Helvetica Neue",Arial,sans-serif}
+h1,h2,h3,p{margin:0}
+h1,h2,h3{font-size:inherit;font-weight:inherit}
+a{color:inherit;text-decoration:inherit}
+table{border-collapse:collapse;text-indent:0;border-color:inherit}
+button,input,select{font-family:inherit;font-size:100%;line-height:inherit;color:inherit;margin:0;padding:0}
+button{background-color:transparent;background-image:none;cursor:pointer}
+input::placeholder{color:#9ca3af}
+.job-card:hover{transform:translateY(-5px);box-shadow:0 10px 15px -3px rgba(0,0,0,.1),0 4px 6px -2px rgba(0,0,0,.05)}
+"""
+# Classes styled by COMPONENT_CSS rather than by a utility rule.
+COMPONENT_CLASSES = {'job-card'}
+
+
+def template_dirs():
+    """The project's own template directories (not those of Django's admin etc.)."""
+    base = Path(settings.BASE_DIR).resolve()
+    dirs = [Path(d) for engine in settings.TEMPLATES for d in engine.get('DIRS', [])]
+    dirs += [Path(d) for d in get_app_template_dirs('templates')]
+    return [d for d in dirs if d.resolve().is_relative_to(base)]
+
+
+def template_classes(dirs=None):
+    """The class names used in class="..." attributes of every .html template."""
+    classes = set()
+    for directory in dirs if dirs is not None else template_dirs():
+        for path in sorted(Path(directory).rglob('*.html')):
+            for attr in CLASS_ATTR.findall(path.read_text(encoding='utf-8')):
+                classes.update(TEMPLATE_TAG.sub(' ', attr).split())
+    return classes
+
+
+def escape(class_name):
+    """Escapes a class name for use in a CSS selector (sm:px-6 -> sm\\:px-6)."""
+    return re.sub(r'([:./])', r'\\\1', class_name)
+
+
+def utility_rule(base):
+    """Returns (declarations, selector suffix, order) for a utility, or None if unknown."""
+    if base in STATIC_UTILITIES:
+        return STATIC_UTILITIES[base], '', 0
+    for order, (pattern, rule) in enumerate(UTILITIES, start=1):
+        match = pattern.fullmatch(base)
+        result = match and rule(match)
+        if result:
+            declarations, suffix = result if isinstance(result, tuple) else (result, '')
+            return declarations, suffix, order
+    return None
+
+
+def build_css(classes):
+    """
+    Returns (css, unknown): the minified stylesheet for 'classes' and the set
+    of class names no rule was found for.
+    """
+    # Plain rules first, then hover/focus ones, then each breakpoint in turn,
+    # so a variant always wins over the plain utility, like in Tailwind.
+    groups = {None: [], **{bp: [] for bp in BREAKPOINTS}}
+    unknown = set()
+    for name in classes:
+        if name in COMPONENT_CLASSES:
+            continue
+        *variants, base = name.split(':')
+        rule = utility_rule(base)
+        media = [v for v in variants if v in BREAKPOINTS]
+        pseudo = [v for v in variants if v in PSEUDO_CLASSES]
+        if rule is None or len(media) > 1 or len(media) + len(pseudo) != len(variants):
+            unknown.add(name)
+            continue
+        declarations, suffix, order = rule
+        selector = '.' + escape(name) + ''.join(PSEUDO_CLASSES[v] for v in pseudo) + suffix
+        groups[media[0] if media else None].append((bool(pseudo), order, name, f'{selector}{{{declarations}}}'))
+
+    css = [COMPONENT_CSS.strip().replace('\n', '')]
+    for breakpoint, rules in groups.items():
+        if not rules:
+            continue
+        body = ''.join(rule for *_, rule in sorted(rules))
+        css.append(f'@media (min-width:{BREAKPOINTS[breakpoint]}){{{body}}}' if breakpoint else body)
+    return ''.join(css) + '\n', unknown
@@ -0,0 +1,148 @@
+# Path: /job_board/middleware.py
+
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import perf, routers
+
+perf_logger = logging.getLogger('job_board.perf')
+
+# After a request writes, the browser gets this cookie for a few seconds and
+# its next requests read from the primary, so a redirect after a POST never
+# shows a replica that hasn't caught up yet.
+PIN_COOKIE = 'db_primary'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets GET and HEAD requests read from a replica, unless the same browser
+    wrote something within the last REPLICA_PIN_SECONDS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        use_replica = request.method in ('GET', 'HEAD') and PIN_COOKIE not in request.COOKIES
+        return routers.start_request(use_replica)
+
+    def _finish(self, request, response, token):
+        if routers.end_request(token) or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._start(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            routers.end_request(token)
+            raise
+        return self._finish(request, response, token)
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            routers.end_request(token)
+            raise
+        return self._finish(request, response, token)
+
+
+class PerformanceMiddleware:
+    """
+    Measures SQL, session and template time for a sample of requests.
+
+    Sampled responses to staff (or to anyone, with DEBUG on) get a
+    Server-Timing header, slow requests and likely N+1 query patterns are
+    logged to 'job_board.perf', and every sampled request feeds the
+    percentiles shown at /perf/. With PERF_ENABLED off the
+    middleware removes itself, and unsampled requests only cost a random().
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        perf.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        token = perf.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = perf.finish(token)
+        user = getattr(request, 'user', None)
+        return self._report(request, response, profile, show_timing=bool(user and user.is_staff))
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        token = perf.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile = perf.finish(token)
+        user = await request.auser() if hasattr(request, 'auser') else None
+        return self._report(request, response, profile, show_timing=bool(user and user.is_staff))
+
+    def _report(self, request, response, profile, show_timing):
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        duplicates = profile.duplicates(settings.PERF_DUPLICATE_QUERY_THRESHOLD)
+        # The timings tell how the site is built and how busy it is, so
+        # visitors don't get them.
+        if show_timing or settings.DEBUG:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={profile.sql_ms:.1f};desc="{profile.sql_count} queries"',
+                f'session;dur={profile.session_ms:.1f}',
+                f'tpl;dur={profile.template_ms:.1f}',
+                f'total;dur={total_ms:.1f}',
+            ])
+
+        match = request.resolver_match
+        name = (match.view_name if match else None) or 'unresolved'
+        perf.record_duration(name, total_ms, settings.PERF_STATS_WINDOW)
+
+        if total_ms >= settings.PERF_SLOW_REQUEST_MS or duplicates:
+            # One JSON object per line, so log tooling can parse it.
+            record = {
+                'event': 'slow_request' if total_ms >= settings.PERF_SLOW_REQUEST_MS else 'repeated_queries',
+                'method': request.method,
+                'path': request.path,
+                'view': name,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'sql_ms': round(profile.sql_ms, 1),
+                'sql_count': profile.sql_count,
+                'template_ms': round(profile.template_ms, 1),
+                'repeated_queries': [
+                    {'sql': sql, 'count': count}
+                    for sql, count in sorted(duplicates.items(), key=lambda item: -item[1])
+                ],
+            }
+            perf_logger.warning(json.dumps(record))
+        return response
@@ -0,0 +1,175 @@
+# Path: /job_board/perf.py
+
+"""
+Per-request performance measurements, collected by PerformanceMiddleware.
+
+While a sampled request runs, a RequestProfile is kept in a context variable.
+A database execute wrapper and the TimedDjangoTemplates template backend (set
+as the BACKEND in TEMPLATES) add their timings to it. Both look the profile
+up through the context variable, so they also see the queries of async views,
+which run in other threads. Without a profile they just call through.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.template.backends import django as django_backend
+
+_current = ContextVar('perf_profile', default=None)
+
+# These repeat in any request with several transactions, they're not N+1s.
+TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+# Recent request durations per URL name, for perf_stats().
+_durations = defaultdict(deque)
+_durations_lock = threading.Lock()
+
+# The table the session engine keeps its rows in, set by install().
+_session_table = None
+
+
+class RequestProfile:
+    """Where the time of one request went."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.session_ms = 0.0
+        self.template_ms = 0.0
+        self.statements = Counter()
+
+    def add_query(self, sql, ms, session=False):
+        """Counts one query. 'session' says it read or wrote the session table."""
+        self.sql_count += 1
+        self.sql_ms += ms
+        if not sql.startswith(TRANSACTION_CONTROL):
+            self.statements[sql] += 1
+        if session:
+            self.session_ms += ms
+
+    def duplicates(self, threshold):
+        """Queries run 'threshold' or more times with different parameters: usually an N+1."""
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+def start():
+    """Starts profiling the current request. Returns a token for finish()."""
+    return _current.set(RequestProfile())
+
+
+def finish(token):
+    """Stops profiling and returns the request's RequestProfile."""
+    profile = _current.get()
+    _current.reset(token)
+    return profile
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        session = _session_table is not None and context['connection'].ops.quote_name(_session_table) in sql
+        profile.add_query(sql, (time.perf_counter() - started) * 1000, session)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedTemplate(django_backend.Template):
+    """A template of TimedDjangoTemplates: its render() time goes to the request's profile."""
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedDjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The Django template backend, timing each render for PerformanceMiddleware.
+    Only the template a view renders is timed, not its includes and
+    {% extends %} parents, so nothing is counted twice.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def _session_model_table():
+    """The session engine's table, or None if it doesn't keep sessions in the database."""
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not hasattr(store, 'get_model_class'):
+        return None
+    return store.get_model_class()._meta.db_table
+
+
+def install():
+    """Hooks the database layer. Safe to call more than once."""
+    global _session_table
+    from django.db import connections
+
+    _session_table = _session_model_table()
+    connection_created.connect(_instrument_connection, dispatch_uid='perf_instrument_connection')
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(None, connection)
+
+
+def record_duration(name, ms, window):
+    """Remembers the last 'window' durations of each URL name."""
+    with _durations_lock:
+        durations = _durations[name]
+        durations.append(ms)
+        while len(durations) > window:
+            durations.popleft()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def duration_stats():
+    """Returns {url name: {'count', 'p50_ms', 'p95_ms', 'p99_ms'}} over the recent window."""
+    with _durations_lock:
+        snapshot = {name: sorted(durations) for name, durations in _durations.items() if durations}
+    return {
+        name: {
+            'count': len(ordered),
+            'p50_ms': round(_percentile(ordered, 0.50), 1),
+            'p95_ms': round(_percentile(ordered, 0.95), 1),
+            'p99_ms': round(_percentile(ordered, 0.99), 1),
+        }
+        for name, ordered in sorted(snapshot.items())
+    }
+
+
+def reset_stats():
+    with _durations_lock:
+        _durations.clear()
+
+
+@staff_member_required
+def perf_stats(request):
+    """Response time percentiles per URL name for this process, as JSON."""
+    return JsonResponse({'urls': duration_stats()})
@@ -0,0 +1,80 @@
+# Path: /job_board/routers.py
+
+"""
+Sends reads to a replica database and writes to the primary.
+
+Reads only go to a replica while a request that allows it is being handled
+(see job_board/middleware.py), and only until that request writes something.
+Management commands, background tasks and anything inside a transaction keep
+reading from the primary, so they always see their own changes.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Holds a RoutingState while a request is being handled, else None.
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """Whether the current request may read from a replica."""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def replica_aliases():
+    """The configured replica aliases that actually exist in DATABASES."""
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', ()) if alias in settings.DATABASES]
+
+
+def start_request(use_replica):
+    """Called by the middleware when a request starts. Returns a token for end_request()."""
+    return _state.set(RoutingState(use_replica))
+
+
+def end_request(token):
+    """Called by the middleware when a request ends. Returns True if the request wrote anything."""
+    state = _state.get()
+    _state.reset(token)
+    return state is not None and state.wrote
+
+
+def pin_to_primary():
+    """Makes the rest of the current request read from the primary."""
+    state = _state.get()
+    if state is not None:
+        state.use_replica = False
+
+
+class PrimaryReplicaRouter:
+    """Database router for one primary ('default') and any number of read replicas."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        # A transaction on the primary must see its own uncommitted rows.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # From now on this request reads its own writes from the primary.
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data, so objects from any of them may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their tables from the primary, never from migrate.
+        return db not in replica_aliases()
@@ -0,0 +1,415 @@
+# Path: /job_board/sessions.py
+
+"""
+A session engine with three tiers, selected with
+SESSION_ENGINE = 'job_board.sessions'.
+
+1. A small in-process LRU of recently used sessions, in front of a shared
+   cache only. Each save stamps the session with a random token, kept in
+   the shared cache next to it under a key of its own. A process serves its
+   local copy only while the shared cache still holds the same stamp. That
+   costs one small cache read instead of reading, and unpickling, the whole
+   session. A session changed or deleted by another worker is therefore
+   never served from here. Entries also expire after SESSION_LOCAL_TTL
+   seconds, so idle ones don't stay in memory.
+2. The Django cache (SESSION_CACHE_ALIAS), when it is shared between
+   processes (Redis, Memcached, files, the database). A per-process cache
+   (local memory) is skipped, and tier 1 with it: there would be nothing to
+   check local copies against, and another worker's copy of a session
+   would outlive a logout for as long as the session lasts. Every request
+   then reads the database, like Django's own 'db' engine.
+3. The django_session table. By default every save() is written straight
+   through. With SESSION_WRITE_BEHIND_SECONDS > 0 rows are written behind
+   instead: save() updates the two tiers above straight away and queues the
+   row, and queued rows are upserted in one statement per batch by a
+   background timer SESSION_WRITE_BEHIND_SECONDS later (or straight away when
+   SESSION_WRITE_BEHIND_BATCH rows are waiting). Until then the shared cache
+   is the only place other workers can find the session, so write-behind
+   needs a shared cache and raises ImproperlyConfigured without one. Rows
+   still queued when a worker exits are lost from the database (the cache
+   keeps them until evicted); call flush_pending_sessions() from the
+   server's worker exit hook to keep them.
+
+Deleting a session (logout, flush) removes it from the shared cache and the
+database straight away, so no worker serves it after that. Two requests
+that save the same session at once still race, and the last save wins, as
+with Django's own engines.
+
+Requests without a session cookie never read a session at all: Django only
+loads a session when it has a key, and the auth and message middleware only
+look inside the session once it's loaded. Keys that turn out not to exist are
+remembered in the local tier too, so a stale cookie costs a cache read
+rather than a database query per request.
+"""
+
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections, router
+from django.utils import timezone
+
+KEY_PREFIX = 'job_board.sessions'
+
+# Stored in the local tier for session keys that don't exist.
+MISSING = object()
+# Added to a session's cache key for the key of its stamp (see above).
+STAMP_SUFFIX = ':stamp'
+
+# Cache backends that every process keeps to itself.
+PER_PROCESS_CACHES = (LocMemCache, DummyCache)
+# Stands in for the shared tier when there is none: stores nothing.
+NO_CACHE = DummyCache('job_board.sessions', {})
+
+logger = logging.getLogger('job_board.sessions')
+
+
+class LocalSessionCache:
+    """A thread-safe LRU of session data that forgets entries after 'ttl' seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the stored value, MISSING for a known-bad key, or None when unknown."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class WriteBehindQueue:
+    """
+    Session rows waiting to be written to the database, keyed by session key so
+    a session saved several times between flushes is only written once. The
+    first row queued after a flush starts a timer that calls 'flush'
+    SESSION_WRITE_BEHIND_SECONDS later, so a worker that goes idle still
+    writes its rows.
+    """
+
+    def __init__(self, flush):
+        self._flush = flush
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def put(self, session_key, session_data, expire_date):
+        with self._lock:
+            self._rows[session_key] = (session_data, expire_date)
+            if self._timer is None:
+                self._timer = threading.Timer(getattr(settings, 'SESSION_WRITE_BEHIND_SECONDS', 0), self._flush)
+                # Don't keep a worker that's shutting down waiting for it.
+                self._timer.daemon = True
+                self._timer.start()
+            return len(self._rows)
+
+    def get(self, session_key):
+        """The queued (session_data, expire_date) for a key, or None."""
+        with self._lock:
+            return self._rows.get(session_key)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._rows.pop(session_key, None)
+
+    def take(self):
+        """Empties the queue, stops its timer and returns what was in it."""
+        with self._lock:
+            rows, self._rows = self._rows, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return rows
+
+    def clear(self):
+        """Drops every queued row, e.g. between tests."""
+        self.take()
+
+    def __len__(self):
+        return len(self._rows)
+
+
+local_sessions = LocalSessionCache(
+    getattr(settings, 'SESSION_LOCAL_CACHE_SIZE', 10000),
+    getattr(settings, 'SESSION_LOCAL_TTL', 5),
+)
+
+
+def flush_pending_sessions():
+    """
+    Writes every queued session row to the database with one upsert per batch.
+    Returns the number of rows written. Rows that already expired are dropped.
+    """
+    rows = pending_writes.take()
+    if not rows:
+        return 0
+    model = SessionStore.get_model_class()
+    now = timezone.now()
+    objs = [
+        model(session_key=key, session_data=data, expire_date=expire_date)
+        for key, (data, expire_date) in rows.items()
+        if expire_date > now
+    ]
+    using = router.db_for_write(model)
+    batch_size = getattr(settings, 'SESSION_WRITE_BEHIND_BATCH', 500)
+    try:
+        model.objects.using(using).bulk_create(
+            objs,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['session_key'],
+            update_fields=['session_data', 'expire_date'],
+        )
+    except Exception:
+        # Put the rows back (unless they were saved again meanwhile) so the
+        # next flush retries them, then let the error be reported.
+        for key, (data, expire_date) in rows.items():
+            if pending_writes.get(key) is None:
+                pending_writes.put(key, data, expire_date)
+        raise
+    return len(objs)
+
+
+def _flush_in_background():
+    """
+    What the queue's timer runs. A database error doesn't go anywhere from a
+    timer thread, so it is logged; the rows are queued again (which starts a
+    new timer) and retried then.
+    """
+    try:
+        flush_pending_sessions()
+    except DatabaseError:
+        logger.warning("Couldn't write %d queued sessions, will retry", len(pending_writes), exc_info=True)
+    finally:
+        # Each thread has its own connections; don't leave this one's open.
+        connections.close_all()
+
+
+pending_writes = WriteBehindQueue(_flush_in_background)
+
+
+def write_behind_seconds():
+    return getattr(settings, 'SESSION_WRITE_BEHIND_SECONDS', 0)
+
+
+class SessionStore(DBStore):
+    """Sessions kept in process memory and the cache, written behind to the database."""
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._local = local_sessions
+        if isinstance(self._cache, PER_PROCESS_CACHES):
+            if write_behind_seconds() > 0:
+                raise ImproperlyConfigured(
+                    "SESSION_WRITE_BEHIND_SECONDS needs a cache shared by every worker process "
+                    f"(SESSION_CACHE_ALIAS = {settings.SESSION_CACHE_ALIAS!r} is "
+                    f"{type(self._cache).__name__}). Use Redis, Memcached, files or the database, "
+                    "or set SESSION_WRITE_BEHIND_SECONDS = 0."
+                )
+            self._cache = NO_CACHE
+            self._local = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def _stamp_key(self, session_key):
+        return self.cache_key_prefix + session_key + STAMP_SUFFIX
+
+    def _shared_stamp(self, session_key):
+        try:
+            return self._cache.get(self._stamp_key(session_key))
+        except Exception:
+            # Some backends reject odd keys (see Django ticket #17810).
+            return None
+
+    def _local_get(self, session_key):
+        """
+        The local (stamp, data) of a session, or MISSING for a key known not
+        to exist, as long as the shared cache agrees. None otherwise.
+        """
+        if self._local is None:
+            return None
+        entry = self._local.get(session_key)
+        if entry is None:
+            return None
+        stamp = self._shared_stamp(session_key)
+        if entry is MISSING:
+            return MISSING if stamp is None else None
+        return entry if entry[0] == stamp else None
+
+    def _local_set(self, session_key, entry):
+        if self._local is not None:
+            self._local.set(session_key, entry)
+
+    def load(self):
+        key = self.session_key
+        entry = self._local_get(key)
+        if entry is MISSING:
+            self._session_key = None
+            return {}
+        if entry is None:
+            entry = self._load_shared(key)
+            if entry is None:
+                self._local_set(key, MISSING)
+                self._session_key = None
+                return {}
+            self._local_set(key, entry)
+        # Hand out a copy: the local tier must not change when the view does.
+        return dict(entry[1])
+
+    def _load_shared(self, key):
+        """
+        Looks a session up in the cache, then the write-behind queue, then the
+        database. Returns its (stamp, data), or None.
+        """
+        try:
+            entry = self._cache.get(self.cache_key_prefix + key)
+        except Exception:
+            entry = None
+        if entry is not None:
+            # The stamp may have been evicted on its own; put it back.
+            expiry = self.get_expiry_age(expiry=entry[1].get('_session_expiry'))
+            self._cache.add(self._stamp_key(key), entry[0], expiry)
+            return entry
+        queued = pending_writes.get(key)
+        if queued is not None and queued[1] > timezone.now():
+            data = self.decode(queued[0])
+            expiry = self.get_expiry_age(expiry=queued[1])
+        else:
+            s = self._get_session_from_db()
+            if s is None:
+                return None
+            data = self.decode(s.session_data)
+            expiry = self.get_expiry_age(expiry=s.expire_date)
+        entry = (secrets.token_hex(8), data)
+        self._cache.set_many({self.cache_key_prefix + key: entry, self._stamp_key(key): entry[0]}, expiry)
+        return entry
+
+    def exists(self, session_key):
+        if not session_key:
+            return False
+        found = self._local_get(session_key)
+        if found is MISSING:
+            return False
+        return (
+            found is not None
+            or (self.cache_key_prefix + session_key) in self._cache
+            or pending_writes.get(session_key) is not None
+            or super().exists(session_key)
+        )
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        key = self.cache_key
+        timeout = self.get_expiry_age()
+        write_behind = write_behind_seconds() > 0
+        entry = (secrets.token_hex(8), dict(data))
+        if must_create:
+            # cache.add() is atomic, so two processes can't claim the same key.
+            # A row written behind isn't in the table yet to clash with, so
+            # look for an older one now; written through, the INSERT checks.
+            if not self._cache.add(key, entry, timeout) or (write_behind and super().exists(self.session_key)):
+                raise CreateError
+            self._cache.set(self._stamp_key(self.session_key), entry[0], timeout)
+        else:
+            self._cache.set_many({key: entry, self._stamp_key(self.session_key): entry[0]}, timeout)
+        self._local_set(self.session_key, entry)
+
+        if not write_behind:
+            super().save(must_create=must_create)
+            return
+        waiting = pending_writes.put(self.session_key, self.encode(data), self.get_expiry_date())
+        if waiting >= getattr(settings, 'SESSION_WRITE_BEHIND_BATCH', 500):
+            flush_pending_sessions()
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        pending_writes.discard(session_key)
+        self._local_set(session_key, MISSING)
+        self._cache.delete_many([self.cache_key_prefix + session_key, self._stamp_key(session_key)])
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        """
+        Deletes expired rows a batch at a time, so 'manage.py clearsessions'
+        never holds the write lock for long on a big table.
+        """
+        model = cls.get_model_class()
+        batch_size = getattr(settings, 'SESSION_CLEAR_EXPIRED_BATCH', 1000)
+        now = timezone.now()
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return
+            model.objects.filter(session_key__in=keys).delete()
+
+    # The tiers above are synchronous, so the async API simply runs them in a thread.
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def acreate(self):
+        return await sync_to_async(self.create)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    async def aclear_expired(cls):
+        return await sync_to_async(cls.clear_expired)()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,10 +41,13 @@ INSTALLED_APPS = [
 
     'accounts',  # Custom user app
     'jobs',     # Job postings app
+    'tasks',    # Background task queue
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'job_board.middleware.PerformanceMiddleware',
+    'job_board.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,7 +60,8 @@ ROOT_URLCONF = 'job_board.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's own backend, which also times rendering for PerformanceMiddleware.
+        'BACKEND': 'job_board.perf.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,13 +80,93 @@ WSGI_APPLICATION = 'job_board.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite is tuned for many readers and one writer at a time:
+# - WAL lets reads carry on while a write is in progress.
+# - synchronous=NORMAL is safe with WAL and avoids an fsync on every commit.
+# - busy_timeout makes a blocked writer wait (in ms) instead of failing with
+#   "database is locked", and IMMEDIATE transactions take the write lock up
+#   front so two transactions can't deadlock while upgrading their locks.
+# - mmap lets reads come straight from the page cache.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA busy_timeout=20000;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA temp_store=MEMORY'
+)
+
+# How long (in seconds) to keep a database connection open between requests.
+# 0 closes it after every request, None keeps it forever.
+CONN_MAX_AGE = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_PRAGMAS,
+        },
+    },
+    # Read replica. Locally it is a second, read-only connection to the same
+    # file unless DJANGO_REPLICA_DB names another file, which
+    # 'manage.py sync_replica' then fills with a copy of the primary.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DJANGO_REPLICA_DB', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': SQLITE_PRAGMAS + ';PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Reads during GET requests go to these aliases (see job_board/routers.py).
+DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['job_board.routers.PrimaryReplicaRouter']
+# After a browser writes something, its reads stay on the primary this long.
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory works out of the box. To share the cache between worker processes
+# switch to 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'job-board',
+        # Sessions live here too (see SESSION_ENGINE below); the default of 300
+        # entries would keep pushing them out.
+        'OPTIONS': {'MAX_ENTRIES': 20000},
     }
 }
 
+# How long (in seconds) a cached job listing page or job row may be served.
+JOB_CACHE_TIMEOUT = 300
+
+# Sessions (see job_board/sessions.py): an in-process LRU and the cache, both
+# only when the cache is shared between processes, in front of the database.
+SESSION_ENGINE = 'job_board.sessions'
+# How many sessions each process keeps in memory, and for how many seconds at
+# most. They are checked against the shared cache before every use.
+SESSION_LOCAL_CACHE_SIZE = 10000
+SESSION_LOCAL_TTL = 5
+# 0 writes every save straight to the database. With a shared cache (not the
+# local memory one above) set it to e.g. 5: session rows are then queued and
+# written at most this many seconds later, or as soon as this many are waiting.
+SESSION_WRITE_BEHIND_SECONDS = 0
+SESSION_WRITE_BEHIND_BATCH = 500
+# 'manage.py clearsessions' deletes expired rows this many at a time.
+SESSION_CLEAR_EXPIRED_BATCH = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,6 +203,26 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# static/css/site.css is generated by 'manage.py build_css' (see job_board/assets.py).
+STATICFILES_DIRS = [BASE_DIR / 'static']
+# 'manage.py collectstatic' copies hashed, pre-compressed files here.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'job_board.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Uploaded files (CVs)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# The largest CV an applicant may upload, in bytes.
+CV_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -131,5 +236,39 @@ AUTH_USER_MODEL = 'accounts.User'
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'support@jobboard.com'
-
-LOGIN_REDIRECT_URL = '/'
\ No newline at end of file
+# The site's root URL, for links in emails sent outside a request (job alerts).
+SITE_URL = os.environ.get('DJANGO_SITE_URL', 'http://localhost:8000/')
+
+# Background tasks (see tasks/registry.py and 'manage.py run_worker')
+# Set TASKS_EAGER = True to run tasks immediately instead of queuing them.
+TASKS_EAGER = False
+TASKS_WORKER_CONCURRENCY = 4
+# A task still 'running' after this many seconds is assumed lost and queued again.
+TASKS_LEASE_SECONDS = 300
+# Done and failed tasks are deleted this many days after they finished.
+TASKS_KEEP_FINISHED_DAYS = 7
+
+LOGIN_REDIRECT_URL = '/'
+
+# Jobs inactive for longer than this are moved to the archive tables by
+# 'manage.py archive_jobs' (see jobs/archive.py).
+JOB_ARCHIVE_AFTER_DAYS = 90
+
+# Login throttling (see accounts/throttle.py): (burst size, refills per second).
+LOGIN_THROTTLE = {
+    # 30 attempts in a burst from one address, then one every 2 seconds.
+    'ip': (30, 0.5),
+    # 10 attempts in a burst at one username, then one every 30 seconds.
+    'username': (10, 1 / 30),
+}
+# Request instrumentation (see job_board/middleware.py PerformanceMiddleware).
+# SAMPLE_RATE is the fraction of requests measured, 1.0 measures all of them.
+# Measuring costs a little on every query, so only one request in a hundred is.
+PERF_ENABLED = True
+PERF_SAMPLE_RATE = 0.01
+# Requests slower than this (ms) are logged to 'job_board.perf'.
+PERF_SLOW_REQUEST_MS = 500
+# The same query shape this many times in one request is logged as a likely N+1.
+PERF_DUPLICATE_QUERY_THRESHOLD = 5
+# How many recent requests per URL name the /perf/ percentiles are based on.
+PERF_STATS_WINDOW = 1000
@@ -0,0 +1,116 @@
+# Path: /job_board/staticfiles.py
+
+"""
+Static file storage and serving for the precompiled assets.
+
+'manage.py collectstatic' copies every file to STATIC_ROOT under a name that
+contains a hash of its content (site.css -> site.3f2a9c0d1b7e.css) and records
+the mapping in staticfiles.json, which {% static %} reads. Because a changed
+file always gets a new name, browsers may cache these files forever.
+CompressedManifestStaticFilesStorage also writes a gzip (.gz) and, when the
+optional 'brotli' package is installed, a brotli (.br) copy next to each text
+file, so nothing is compressed per request.
+
+serve_static() hands those files out with far-future cache headers, picking a
+pre-compressed copy when the browser accepts one. It is meant for when Django
+serves the files itself. Behind nginx, serve STATIC_ROOT directly instead
+(gzip_static / brotli_static on, 'expires max' for hashed names).
+"""
+
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip copies are written.
+    brotli = None
+
+# Hashed names never change content, so they may be cached for a year.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Encodings we pre-compress for, best first: (Content-Encoding, file suffix).
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def accepts_encoding(request, coding):
+    """Whether the Accept-Encoding header allows 'coding' (and doesn't refuse it with q=0)."""
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() == coding:
+            return not re.fullmatch(r'\s*q=0(\.0*)?\s*', params)
+    return False
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Only text compresses well; images and fonts are already compressed.
+    compress_extensions = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html')
+    # Smaller files aren't worth a second request-time lookup.
+    min_compress_size = 256
+
+    def stored_name(self, name):
+        # Before the first collectstatic there is no manifest (while developing,
+        # or in tests); use the plain name instead of failing to render.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            self.compress(hashed_name)
+
+    def compress(self, name):
+        """Writes name.gz (and name.br) next to 'name' if that makes it smaller."""
+        if not name.endswith(self.compress_extensions):
+            return
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < self.min_compress_size:
+            return
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+
+@require_safe
+def serve_static(request, path):
+    """Serves a collected static file, pre-compressed when possible."""
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    encoding = None
+    for coding, suffix in ENCODINGS:
+        if accepts_encoding(request, coding) and os.path.isfile(full_path + suffix):
+            full_path, encoding = full_path + suffix, coding
+            break
+
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    hashed = path in getattr(staticfiles_storage, 'hashed_files', {}).values()
+    # Unhashed names can change under the same URL, so make browsers revalidate.
+    response['Cache-Control'] = IMMUTABLE if hashed else 'no-cache'
+    return response
@@ -0,0 +1,42 @@
+# Path: /job_board/streaming.py
+
+"""
+Streamed responses that stay streamed under both WSGI and ASGI.
+
+StreamingHttpResponse sends a plain iterator a chunk at a time under WSGI.
+Under ASGI it wants an async iterator: handed a plain one, Django reads the
+whole of it into a list first (with a warning), so a large download would sit
+in memory before its first byte went out. streaming_content() gives each
+server the kind of iterator it can stream.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+_DONE = object()
+
+
+async def _async_chunks(chunks):
+    """
+    Yields the chunks of the plain iterable 'chunks' one at a time. Each
+    next() runs in the request's sync thread, like a sync view would, so a
+    database cursor the iterator holds stays on the thread that opened it.
+    """
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(iterator, _DONE)) is not _DONE:
+            yield chunk
+    finally:
+        # Also runs when the client goes away half way. Like Django does for
+        # a plain iterator, close it (and what it came from) if it can be.
+        for source in {id(iterator): iterator, id(chunks): chunks}.values():
+            if hasattr(source, 'close'):
+                await sync_to_async(source.close, thread_sensitive=True)()
+
+
+def streaming_content(request, chunks):
+    """'chunks' (any iterable of bytes), ready to hand to StreamingHttpResponse for this request."""
+    if isinstance(request, ASGIRequest):
+        return _async_chunks(chunks)
+    return chunks
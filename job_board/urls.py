@@ -14,12 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from django.urls import include
 
+from .perf import perf_stats
+from .staticfiles import serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
+    path('tasks/', include('tasks.urls')),
+    path('perf/', perf_stats, name='perf_stats'),
+    # Collected static files; 'runserver' serves them itself while DEBUG is on.
+    path(f"{settings.STATIC_URL.strip('/')}/<path:path>", serve_static, name='static'),
     path('', include('jobs.urls')),
 ]
@@ -1,6 +1,109 @@
 # In jobs/admin.py
-from django.contrib import admin
-from .models import Job, Application
+from django.contrib import admin, messages
+from django.db import router
 
-admin.site.register(Job)
-admin.site.register(Application)
\ No newline at end of file
+from job_board.admin_paging import LargeTableAdmin
+from .models import Job, Application, ApplicationStatusChange, ArchivedJob, ArchivedApplication, SavedSearch
+from .status import bulk_change_status
+from . import bulk
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ('title', 'company', 'location', 'job_type', 'is_active', 'created_at')
+    # One JOIN instead of one query per row for the company name.
+    list_select_related = ('company',)
+    # is_active is the condition of the partial indexes on Job. Other filters
+    # still only read until a page is full, since the pages come in pk order.
+    list_filter = ('is_active', 'job_type')
+    search_fields = ('title', '=external_id')
+    # A search box instead of a <select> with every company in it.
+    autocomplete_fields = ('company',)
+    actions = ('close_jobs', 'reopen_jobs')
+
+    @admin.action(description="Close selected jobs", permissions=['change'])
+    def close_jobs(self, request, queryset):
+        count = bulk.set_jobs_active(queryset, False, using=router.db_for_write(Job))
+        self.message_user(request, f"Closed {count} jobs.", messages.SUCCESS)
+
+    @admin.action(description="Reopen selected jobs", permissions=['change'])
+    def reopen_jobs(self, request, queryset):
+        count = bulk.set_jobs_active(queryset, True, using=router.db_for_write(Job))
+        self.message_user(request, f"Reopened {count} jobs.", messages.SUCCESS)
+
+
+def status_action(status, label):
+    """Builds an admin action that moves the selected applications to 'status'."""
+    @admin.action(description=f"Mark selected applications as {label}", permissions=['change'])
+    def action(modeladmin, request, queryset):
+        count = bulk_change_status(queryset, status, using=router.db_for_write(Application))
+        modeladmin.message_user(request, f"Marked {count} applications as {label}.", messages.SUCCESS)
+
+    action.__name__ = f'mark_{status}'
+    return action
+
+
+class StatusHistoryInline(admin.TabularInline):
+    """An application's status history, oldest first. It is append-only, so it can't be edited here."""
+    model = ApplicationStatusChange
+    fields = readonly_fields = ('from_status', 'to_status', 'changed_at')
+    ordering = ('id',)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Application)
+class ApplicationAdmin(LargeTableAdmin):
+    list_display = ('id', 'applicant', 'job', 'status', 'applied_at')
+    # Application.__str__ and these columns read the applicant's user and the job.
+    list_select_related = ('job', 'applicant__user')
+    list_filter = ('status',)
+    search_fields = ('=applicant__user__username', '=job__id')
+    # Plain id inputs instead of a <select> with every applicant and job.
+    raw_id_fields = ('job', 'applicant')
+    actions = [status_action(status, label) for status, label in Application.STATUS_CHOICES]
+    inlines = (StatusHistoryInline,)
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(LargeTableAdmin):
+    list_display = ('applicant', 'query', 'location', 'job_type', 'match_term', 'created_at')
+    list_select_related = ('applicant__user',)
+    raw_id_fields = ('applicant',)
+    # Exact lookups only: they use the match_term index and the applicant's pk.
+    search_fields = ('=match_term', '=applicant__user__username')
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Archived records can be looked at, but never added, changed or deleted."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedJob)
+class ArchivedJobAdmin(ReadOnlyAdmin):
+    list_display = ('title', 'company', 'location', 'created_at', 'archived_at')
+    list_select_related = ('company',)
+    search_fields = ('title',)
+    date_hierarchy = 'archived_at'
+
+
+@admin.register(ArchivedApplication)
+class ArchivedApplicationAdmin(ReadOnlyAdmin):
+    list_display = ('job', 'applicant', 'status', 'applied_at', 'archived_at')
+    list_select_related = ('job', 'applicant__user')
+    list_filter = ('status',)
+    raw_id_fields = ('job', 'applicant')
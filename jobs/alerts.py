@@ -0,0 +1,306 @@
+# Path: /jobs/alerts.py
+
+"""
+Job alerts: matching new and updated jobs against every saved search, and
+emailing each applicant a digest of what matched.
+
+Testing every saved search against every new job would cost one check per
+search per job, which with a million searches is far too slow. Instead each
+search is filed under one "anchor" term (SavedSearch.match_term): its rarest
+keyword, else its rarest location word, else its job type. A search can only
+match a job that contains its anchor, so for a batch of jobs we collect every
+word they contain, fetch just the searches anchored on one of those words
+with the indexed 'match_term IN (...)' lookup, and check the full criteria
+of those few candidates in Python. This is how "percolator" search engines
+work too. Rare anchors keep the candidate lists short; "rare" is measured by
+how many jobs in the search index contain the word.
+
+'manage.py send_job_alerts' (run it from cron every few minutes) does both
+steps:
+
+* match_new_jobs() walks the jobs in (updated_at, id) order from where it
+  stopped last time (JobAlertCursor) and stores a SavedSearchMatch per hit.
+  The (search, job) unique constraint means an edited job alerts nobody twice.
+* send_digests() sends one email per applicant with everything matched since
+  their last one, a batch of applicants per connection to the mail server.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import urljoin
+
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import Count, F, Max, Window
+from django.db.models.constants import OnConflict
+from django.db.models.functions import DenseRank
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Job, JobAlertCursor, SavedSearch, SavedSearchMatch
+from .pagination import encode_cursor, keyset_page
+from .recommendations import tokenize
+from . import search
+
+# How many saved searches an applicant may have.
+MAX_SAVED_SEARCHES = 20
+
+# How many jobs are matched at once, and how many anchor terms go in one IN (...).
+MATCH_BATCH_SIZE = 500
+TERMS_PER_QUERY = 500
+
+# Jobs edited in the last few seconds are left for the next run: a transaction
+# that is still open could yet commit a job with an older updated_at, which
+# the cursor would already have passed.
+MATCH_DELAY = timedelta(seconds=30)
+
+# How many applicants are emailed per connection, and how many jobs one digest lists.
+DIGEST_BATCH_SIZE = 200
+DIGEST_MAX_JOBS = 20
+
+# Emailed matches are kept this long, so a job edited later doesn't alert again.
+KEEP_MATCHES = timedelta(days=90)
+
+# Anchors of searches without keywords or a location.
+TYPE_PREFIX = 'type:'
+ANY_TERM = '*'
+
+# How long a word's document frequency is cached.
+FREQUENCY_TIMEOUT = 24 * 60 * 60
+
+
+@lru_cache(maxsize=100_000)
+def criteria(query, location, job_type):
+    """A search's criteria as (keywords, location words, job type), ready to compare."""
+    return frozenset(tokenize(query)), frozenset(tokenize(location)), job_type.strip().lower()
+
+
+def document_frequencies(terms, using=DEFAULT_DB_ALIAS):
+    """
+    Returns {term: how many active jobs contain it} from the search index,
+    cached for a day. Empty where the database has no FTS5 index.
+    """
+    if not terms or not search.fts_available(using):
+        return {}
+    keys = {f'jobs:df:{term}': term for term in terms}
+    found = {keys[key]: count for key, count in cache.get_many(list(keys)).items()}
+    missing = [term for term in terms if term not in found]
+    if missing:
+        try:
+            with connections[using].cursor() as cursor:
+                for term in missing:
+                    cursor.execute(
+                        f"SELECT count(*) FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH %s",
+                        ['"' + term.replace('"', '') + '"'],
+                    )
+                    found[term] = cursor.fetchone()[0]
+        except OperationalError:
+            # The index hasn't been created on this database.
+            return {}
+        cache.set_many({f'jobs:df:{term}': found[term] for term in missing}, FREQUENCY_TIMEOUT)
+    return found
+
+
+def choose_match_term(query, location, job_type, using=DEFAULT_DB_ALIAS):
+    """Picks the anchor term a search is filed under (see the module docstring)."""
+    keywords, place, job_type = criteria(query, location, job_type)
+    candidates = sorted(keywords or place)
+    if not candidates:
+        return TYPE_PREFIX + job_type if job_type else ANY_TERM
+    if len(candidates) == 1:
+        return candidates[0]
+    frequencies = document_frequencies(candidates, using)
+    # The rarest word; without an index, the longest word is usually rare too.
+    return min(candidates, key=lambda term: (frequencies.get(term, 0), -len(term)))
+
+
+def job_terms(job):
+    """Every term a search matching 'job' could be anchored on, plus the job's words to check against."""
+    words = frozenset(tokenize(f'{job.title} {job.description} {job.location}'))
+    place = frozenset(tokenize(job.location))
+    job_type = job.job_type.strip().lower()
+    return words, place, job_type, words | {TYPE_PREFIX + job_type, ANY_TERM}
+
+
+def match_jobs(jobs, using=DEFAULT_DB_ALIAS):
+    """
+    Returns a (search id, applicant id, job id) for every saved search that
+    matches one of 'jobs'. Only searches anchored on a term of these jobs are read.
+    """
+    prepared = []
+    jobs_by_term = defaultdict(list)
+    for job in jobs:
+        words, place, job_type, terms = job_terms(job)
+        prepared.append((job.pk, words, place, job_type))
+        for term in terms:
+            jobs_by_term[term].append(len(prepared) - 1)
+
+    found = []
+    terms = list(jobs_by_term)
+    for start in range(0, len(terms), TERMS_PER_QUERY):
+        candidates = (
+            SavedSearch.objects.using(using)
+            .filter(match_term__in=terms[start:start + TERMS_PER_QUERY])
+            .values_list('pk', 'applicant_id', 'query', 'location', 'job_type', 'match_term')
+            .iterator(chunk_size=5000)
+        )
+        for pk, applicant_id, query, location, job_type, term in candidates:
+            keywords, wanted_place, wanted_type = criteria(query, location, job_type)
+            for i in jobs_by_term[term]:
+                job_pk, words, place, actual_type = prepared[i]
+                if keywords <= words and wanted_place <= place and wanted_type in ('', actual_type):
+                    found.append((pk, applicant_id, job_pk))
+    return found
+
+
+def store_matches(found, now, using=DEFAULT_DB_ALIAS):
+    """
+    Inserts (search id, applicant id, job id) matches, skipping ones already
+    stored. A prepared INSERT run once per row is several times faster than
+    bulk_create() building model instances, and there can be many matches.
+    """
+    if not found:
+        return
+    connection = connections[using]
+    ops, quote = connection.ops, connection.ops.quote_name
+    columns = [SavedSearchMatch._meta.get_field(name) for name in ('search', 'applicant', 'job', 'matched_at')]
+    unique = [SavedSearchMatch._meta.get_field(name) for name in ('search', 'job')]
+    # "INSERT OR IGNORE" on SQLite, "INSERT IGNORE" on MySQL, "ON CONFLICT DO NOTHING" on PostgreSQL.
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        quote(SavedSearchMatch._meta.db_table),
+        ', '.join(quote(field.column) for field in columns),
+        ', '.join(['%s'] * len(columns)),
+        ops.on_conflict_suffix_sql(unique, OnConflict.IGNORE, None, None),
+    )
+    matched_at = ops.adapt_datetimefield_value(now)
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(search_id, applicant_id, job_id, matched_at) for search_id, applicant_id, job_id in found])
+
+
+def match_new_jobs(batch_size=MATCH_BATCH_SIZE, using=DEFAULT_DB_ALIAS, now=None, on_batch=None):
+    """
+    Matches every job posted or edited since the last run against the saved
+    searches and stores the hits. The first run starts from the newest job.
+    'on_batch(jobs seen, matches)' is called after each batch. Returns
+    (jobs seen, matches).
+    """
+    now = now or timezone.now()
+    jobs = Job.objects.using(using).filter(updated_at__lte=now - MATCH_DELAY).only(
+        'pk', 'title', 'description', 'location', 'job_type', 'is_active', 'updated_at',
+    )
+    state, created = JobAlertCursor.objects.using(using).get_or_create(pk=1)
+    if created:
+        # Don't alert anyone about the jobs that were already on the site.
+        newest = Job.objects.using(using).order_by('-updated_at', '-pk').only('pk', 'updated_at').first()
+        state.position = encode_cursor(newest, 'updated_at') if newest else ''
+        state.save(update_fields=['position'])
+
+    seen = matched = 0
+    position = state.position or None
+    while True:
+        page, _ = keyset_page(jobs, position, page_size=batch_size, date_field='updated_at', ascending=True)
+        if not page:
+            break
+        found = match_jobs([job for job in page if job.is_active], using)
+        position = encode_cursor(page[-1], 'updated_at')
+        with transaction.atomic(using=using):
+            store_matches(found, now, using)
+            JobAlertCursor.objects.using(using).filter(pk=1).update(position=position)
+        seen += len(page)
+        matched += len(found)
+        if on_batch:
+            on_batch(seen, matched)
+        if len(page) < batch_size:
+            break
+    return seen, matched
+
+
+def _digest(user, jobs, total, base_url):
+    """One applicant's digest email. 'jobs' holds (job, link) pairs, 'total' counts every job matched."""
+    body = render_to_string('jobs/alert_digest.txt', {
+        'user': user,
+        'jobs': jobs,
+        'more': max(total - len(jobs), 0),
+        'manage_link': urljoin(base_url, reverse('saved_searches')),
+    })
+    subject = f"{total} new job{'s' if total != 1 else ''} matching your saved searches"
+    return EmailMessage(subject, body, to=[user.email])
+
+
+def send_digests(base_url, batch_size=DIGEST_BATCH_SIZE, using=DEFAULT_DB_ALIAS, now=None):
+    """
+    Emails every applicant with new matches one digest of the jobs (still
+    open) that matched, and marks the matches as sent. 'base_url' is the
+    site's root URL, e.g. 'https://jobboard.com/'. Returns the number of emails sent.
+    """
+    now = now or timezone.now()
+    pending = SavedSearchMatch.objects.using(using).filter(notified_at__isnull=True)
+    # Matches added while this runs are left for the next run: marking them
+    # sent below would drop them without an email. New matches only ever get
+    # higher pks, so the highest one now marks where this run stops.
+    last_match = pending.aggregate(last=Max('pk'))['last']
+    if last_match is None:
+        return 0
+    pending = pending.filter(pk__lte=last_match)
+    sent = 0
+    last_applicant = 0
+    while True:
+        applicant_ids = list(
+            pending.filter(applicant_id__gt=last_applicant).order_by('applicant_id')
+            .values_list('applicant_id', flat=True).distinct()[:batch_size]
+        )
+        if not applicant_ids:
+            break
+        last_applicant = applicant_ids[-1]
+
+        # Only verified addresses get alerts (the applicant's pk is their user's pk).
+        users = list(User.objects.using(using).filter(pk__in=applicant_ids, email_verified=True).exclude(email=''))
+        open_matches = pending.filter(applicant_id__in=[user.pk for user in users], job__is_active=True)
+        totals = dict(
+            open_matches.order_by().values('applicant_id')
+            .annotate(jobs=Count('job_id', distinct=True)).values_list('applicant_id', 'jobs')
+        )
+        # Only the newest jobs of each applicant are loaded, however many
+        # matched. DENSE_RANK gives a job matched by two searches one rank.
+        newest = (
+            open_matches.annotate(rank=Window(
+                DenseRank(), partition_by=[F('applicant_id')], order_by=[F('job__created_at').desc(), F('job_id').desc()],
+            ))
+            .filter(rank__lte=DIGEST_MAX_JOBS).select_related('job__company')
+        )
+        jobs = defaultdict(dict)
+        links = {}
+        for match in newest:
+            # A job matching two of someone's searches is listed once.
+            jobs[match.applicant_id].setdefault(match.job_id, match.job)
+            if match.job_id not in links:
+                links[match.job_id] = urljoin(base_url, reverse('job_detail', args=[match.job_id]))
+        messages = [
+            _digest(user, [
+                (job, links[job.pk])
+                for job in sorted(jobs[user.pk].values(), key=lambda job: (job.created_at, job.pk), reverse=True)
+            ], totals[user.pk], base_url)
+            for user in users if user.pk in totals
+        ]
+
+        if messages:
+            # One connection (one SMTP login) for the whole batch. If sending
+            # fails, nothing is marked and the next run tries again.
+            with get_connection() as connection:
+                sent += connection.send_messages(messages) or 0
+        # Matches of closed jobs and unverified addresses are marked too, so they aren't read again.
+        pending.filter(applicant_id__in=applicant_ids).update(notified_at=now)
+    return sent
+
+
+def prune_matches(now=None, using=DEFAULT_DB_ALIAS):
+    """Deletes matches emailed more than KEEP_MATCHES ago. Returns how many."""
+    now = now or timezone.now()
+    deleted, _ = SavedSearchMatch.objects.using(using).filter(notified_at__lt=now - KEEP_MATCHES).delete()
+    return deleted
+
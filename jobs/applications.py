@@ -0,0 +1,77 @@
+# Path: /jobs/applications.py
+
+"""
+Applying to a job in one round trip, safely under concurrent and repeated requests.
+
+apply_to_job() always tries the INSERT first and lets the database's unique
+constraints decide whether it is new. A losing double-submit therefore costs
+one failed insert and one lookup, and can never create a second application.
+Clients may send an idempotency key with each attempt. A retry that reuses the
+key is told about the original application instead of being turned away as a
+duplicate.
+
+Whether the job still takes applications is checked in the same transaction
+as the insert, on the primary, and never from the cache: a job closed or
+archived by another process a moment ago must not get new applications.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from accounts.models import Applicant
+from .models import Job, Application
+
+# The possible outcomes of apply_to_job().
+CREATED = 'created'        # A new application was saved.
+REPLAYED = 'replayed'      # A retry of an earlier request with the same idempotency key.
+DUPLICATE = 'duplicate'    # The applicant had already applied to this job.
+KEY_REUSED = 'key_reused'  # The idempotency key belongs to an application for another job.
+CLOSED = 'closed'          # There is no active job with that id (closed or archived).
+NO_PROFILE = 'no_profile'  # The user has no applicant profile to apply with.
+
+MAX_IDEMPOTENCY_KEY_LENGTH = Application._meta.get_field('idempotency_key').max_length
+
+
+def apply_to_job(job_id, applicant_id, idempotency_key=None):
+    """
+    Creates an application of 'applicant_id' to the job 'job_id' unless one
+    already exists. Returns (application, outcome), where outcome is one of
+    the constants above. For KEY_REUSED, the application returned is the one
+    the key belongs to; for CLOSED and NO_PROFILE it is None.
+    """
+    idempotency_key = idempotency_key or None
+    try:
+        with transaction.atomic():
+            # A primary-key lookup that also locks the job's row (where the
+            # database can), so it can't be closed or archived before we commit.
+            # Only what the read model copies (see record_application()) is read.
+            job = (
+                Job.objects.select_for_update(of=('self',)).select_related('company')
+                .only('title', 'company__name').filter(pk=job_id, is_active=True).first()
+            )
+            if job is None:
+                return None, CLOSED
+            application = Application(job=job, applicant_id=applicant_id, idempotency_key=idempotency_key)
+            # Application.save() runs in a savepoint of its own, so a failed
+            # insert rolls back cleanly, including the read model updates.
+            application.save()
+        return application, CREATED
+    except IntegrityError:
+        # Another request got there first. Find out which constraint it was.
+        matches = Q(job_id=job_id)
+        if idempotency_key:
+            matches |= Q(idempotency_key=idempotency_key)
+        existing = list(Application.objects.filter(matches, applicant_id=applicant_id))
+        if not existing:
+            if not Applicant.objects.filter(pk=applicant_id).exists():
+                # The foreign key to the applicant failed: a user of the
+                # applicant type without the profile row (e.g. made in the admin).
+                return None, NO_PROFILE
+            # The conflicting row is gone again (deleted in the meantime).
+            raise
+
+    for other in existing:
+        if other.job_id == job_id:
+            same_key = idempotency_key is not None and other.idempotency_key == idempotency_key
+            return other, REPLAYED if same_key else DUPLICATE
+    return existing[0], KEY_REUSED
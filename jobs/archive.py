@@ -0,0 +1,139 @@
+# Path: /jobs/archive.py
+
+"""
+Moves closed jobs and their applications out of the live tables.
+
+Jobs whose expires_at has passed are first deactivated like any other job.
+Once a job has been inactive for JOB_ARCHIVE_AFTER_DAYS, archive_jobs() copies
+it and its applications into ArchivedJob/ArchivedApplication and deletes the
+originals, a batch at a time, each batch in its own transaction. The listing,
+the dashboards and their indexes then only deal with jobs that are still
+open, however much history builds up.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Job, Application, ApplicationSummary, ArchivedJob, ArchivedApplication, SavedSearchMatch, SimilarJob,
+)
+from .summaries import shift_status_counts
+from . import search
+from . import cache as job_cache
+
+ARCHIVE_BATCH_SIZE = 500
+
+# Every relation to Job or Application, and what archive_batch() does with
+# its rows. The jobs and applications are deleted without Django's cascade
+# (see below), so a new relation must be handled there and listed here. A
+# test checks this list against the models.
+ARCHIVED_RELATIONS = {
+    'jobs.Application.job': "moved to ArchivedApplication",
+    'jobs.ApplicationSummary.job': "deleted",
+    'jobs.ApplicationSummary.application': "deleted",
+    'jobs.SimilarJob.job': "deleted",
+    'jobs.SimilarJob.similar': "deleted",
+    'jobs.SavedSearchMatch.job': "deleted",
+    'jobs.ApplicationStatusChange.application': "kept: no constraint, and the id lives on in ArchivedApplication",
+    'jobs.ApplicationOutbox.application': "kept: no constraint, the dispatcher skips missing applications",
+}
+
+# The Job columns copied into ArchivedJob.
+ARCHIVED_JOB_FIELDS = (
+    'id', 'company_id', 'title', 'description', 'location', 'job_type', 'salary',
+    'external_id', 'created_at', 'updated_at', 'expires_at',
+)
+
+
+def archive_after():
+    """How long a job stays inactive in the live tables before it is archived."""
+    return timedelta(days=getattr(settings, 'JOB_ARCHIVE_AFTER_DAYS', 90))
+
+
+def expire_jobs(now=None, using=DEFAULT_DB_ALIAS):
+    """Deactivates every active job whose expiry date has passed. Returns how many."""
+    now = now or timezone.now()
+    expired = Job.objects.using(using).filter(is_active=True, expires_at__lte=now)
+    count = 0
+    # Saving each job runs the usual signals, which take it out of the search
+    # index and the caches. Few jobs expire at once, so this stays cheap.
+    for job in expired.iterator():
+        job.is_active = False
+        job.save(using=using, update_fields=['is_active', 'updated_at'])
+        count += 1
+    return count
+
+
+def archive_batch(job_ids, now=None, using=DEFAULT_DB_ALIAS):
+    """
+    Archives the given inactive jobs with all their applications in one
+    transaction. Returns (jobs archived, applications archived).
+    """
+    now = now or timezone.now()
+    with transaction.atomic(using=using):
+        jobs = list(Job.objects.using(using).filter(pk__in=job_ids, is_active=False).values(*ARCHIVED_JOB_FIELDS))
+        if not jobs:
+            return 0, 0
+        job_ids = [job['id'] for job in jobs]
+        ArchivedJob.objects.using(using).bulk_create([ArchivedJob(archived_at=now, **job) for job in jobs])
+
+        applications = list(
+            Application.objects.using(using).filter(job_id__in=job_ids)
+            .values_list('pk', 'job_id', 'applicant_id', 'status', 'applied_at')
+        )
+        ArchivedApplication.objects.using(using).bulk_create([
+            ArchivedApplication(
+                id=pk, job_id=job_id, applicant_id=applicant_id, status=status,
+                applied_at=applied_at, archived_at=now,
+            )
+            for pk, job_id, applicant_id, status, applied_at in applications
+        ], batch_size=ARCHIVE_BATCH_SIZE)
+
+        # Archived applications no longer count on the dashboards.
+        deltas = Counter()
+        for _, _, applicant_id, status, _ in applications:
+            deltas[(applicant_id, status)] -= 1
+        shift_status_counts(dict(deltas), using)
+
+        # Delete without loading the rows. The per-row delete signals would
+        # adjust the same counters again, one application at a time.
+        # _raw_delete() skips the cascade too: every relation in
+        # ARCHIVED_RELATIONS has been dealt with above.
+        ApplicationSummary.objects.using(using).filter(job_id__in=job_ids).delete()
+        SimilarJob.objects.using(using).filter(Q(job_id__in=job_ids) | Q(similar_id__in=job_ids)).delete()
+        SavedSearchMatch.objects.using(using).filter(job_id__in=job_ids).delete()
+        Application.objects.using(using).filter(job_id__in=job_ids)._raw_delete(using)
+        Job.objects.using(using).filter(pk__in=job_ids)._raw_delete(using)
+        search.remove_jobs(job_ids, using=using)
+
+    job_cache.forget_jobs(*job_ids)
+    job_cache.forget_company_stats(*{job['company_id'] for job in jobs})
+    return len(jobs), len(applications)
+
+
+def archive_jobs(now=None, older_than=None, batch_size=ARCHIVE_BATCH_SIZE, using=DEFAULT_DB_ALIAS):
+    """
+    Archives every job that has been inactive for longer than 'older_than'
+    (JOB_ARCHIVE_AFTER_DAYS by default), one batch per transaction.
+    Returns (jobs archived, applications archived).
+    """
+    now = now or timezone.now()
+    cutoff = now - (older_than if older_than is not None else archive_after())
+    candidates = Job.objects.using(using).filter(is_active=False, updated_at__lt=cutoff).order_by('pk')
+    total_jobs = total_applications = 0
+    last_pk = 0
+    while True:
+        # Walk the ids in order so a batch that finds nothing to do can't loop forever.
+        ids = list(candidates.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_pk = ids[-1]
+        jobs, applications = archive_batch(ids, now=now, using=using)
+        total_jobs += jobs
+        total_applications += applications
+    return total_jobs, total_applications
@@ -0,0 +1,176 @@
+# Path: /jobs/async_views.py
+
+"""
+Async versions of the public job pages, for running under ASGI.
+
+They read the database with Django's async ORM and the cache with its async
+API, so a slow query only suspends one coroutine instead of holding a whole
+worker. They also work under WSGI, where Django runs each one in its own event
+loop. Apart from that they behave exactly like the views in jobs/views.py and
+share their caches and ETags.
+"""
+
+import uuid
+from datetime import timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+from .models import Job, ArchivedJob
+from .pagination import akeyset_page, decode_cursor, encode_cursor
+from .serializers import job_to_dict, removed_job_to_dict
+from .filters import filter_jobs, filters_key, parse_job_filters
+from .recommendations import similar_jobs
+from .views import JOB_CARD_FIELDS, job_list_context
+from . import cache as job_cache
+
+# How many jobs the JSON listing returns per page.
+API_PAGE_SIZE = 50
+
+
+async def _load_user(request):
+    # Templates and the ETag helpers read request.user synchronously. Loading it
+    # here first means they never touch the database from the event loop.
+    request.user = await request.auser()
+
+
+def _check_conditions(request, etag, last_modified):
+    """Returns a 304 response if the client's copy is still fresh, else None."""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def _add_validators(response, etag, last_modified):
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def _active_jobs():
+    return Job.objects.filter(is_active=True).select_related('company')
+
+
+async def job_list(request):
+    await _load_user(request)
+    version = await job_cache.aget_catalog_version()
+    etag, last_modified = job_cache.job_list_validators(request, version)
+    not_modified = _check_conditions(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    cursor = request.GET.get('cursor')
+    filters = parse_job_filters(request.GET)
+    key = job_cache.job_list_key(cursor, version, filters_key(filters))
+    page = await cache.aget(key)
+    if page is None:
+        page = await akeyset_page(filter_jobs(_active_jobs().only(*JOB_CARD_FIELDS), filters), cursor)
+        await cache.aset(key, page, job_cache.cache_timeout())
+    jobs, next_cursor = page
+    response = render(request, 'jobs/job_list.html', job_list_context(jobs, next_cursor, filters))
+    return _add_validators(response, etag, last_modified)
+
+
+async def job_detail(request, pk):
+    await _load_user(request)
+    job = await job_cache.aget_job(pk)
+    if job is None:
+        raise Http404("No active job found.")
+    versions = await job_cache.asimilar_versions()
+    etag, last_modified = job_cache.job_detail_validators(request, job, versions)
+    not_modified = _check_conditions(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    context = {
+        'job': job,
+        'idempotency_key': uuid.uuid4().hex,
+        'similar_jobs': await sync_to_async(similar_jobs)(job.pk),
+    }
+    response = render(request, 'jobs/job_detail.html', context)
+    return _add_validators(response, etag, last_modified)
+
+
+def _filter_jobs(queryset, params):
+    """
+    Applies the API's optional ?job_type=, ?location= and ?company= (id)
+    filters, and the listing's salary and distance ones (see jobs/filters.py).
+    """
+    if params.get('job_type'):
+        queryset = queryset.filter(job_type=params['job_type'])
+    if params.get('location'):
+        queryset = queryset.filter(location__iexact=params['location'])
+    if params.get('company', '').isdigit():
+        queryset = queryset.filter(company_id=int(params['company']))
+    return filter_jobs(queryset, parse_job_filters(params))
+
+
+async def job_api_list(request):
+    """
+    Returns active jobs as JSON, newest first, 'API_PAGE_SIZE' at a time.
+    Follow the 'next' cursor to get the following page.
+
+    With '?since=<ISO date>' it returns every job changed after that time
+    instead, oldest change first and including jobs that were deactivated, so
+    aggregators can keep a copy in sync. Each page's 'next' can be passed
+    back as '?since=' to continue. An empty page means the copy is up to date,
+    and its 'next' is where the following sync should start.
+
+    Jobs archived since (see jobs/archive.py) are no longer in the Job table.
+    They show up in their place as {"id", "is_active": false, "removed": true,
+    "updated_at"}, whatever the filters, so a copy can drop them.
+    """
+    since = request.GET.get('since')
+    if since is None:
+        jobs, next_cursor = await akeyset_page(
+            _filter_jobs(_active_jobs(), request.GET), request.GET.get('cursor'), page_size=API_PAGE_SIZE,
+        )
+        return JsonResponse({'results': [job_to_dict(job) for job in jobs], 'next': next_cursor})
+
+    changed = _filter_jobs(Job.objects.select_related('company'), request.GET)
+    removed = ArchivedJob.objects.only('id', 'updated_at')
+    cursor = None
+    since_date = parse_datetime(since)
+    if since_date is not None:
+        if timezone.is_naive(since_date):
+            since_date = timezone.make_aware(since_date, dt_timezone.utc)
+        changed = changed.filter(updated_at__gt=since_date)
+        removed = removed.filter(updated_at__gt=since_date)
+    elif decode_cursor(since) is not None:
+        cursor = since
+    else:
+        return JsonResponse({'error': "'since' must be an ISO 8601 date and time or a 'next' value."}, status=400)
+    jobs, _ = await akeyset_page(changed, cursor, page_size=API_PAGE_SIZE, date_field='updated_at', ascending=True)
+    gone, _ = await akeyset_page(removed, cursor, page_size=API_PAGE_SIZE, date_field='updated_at', ascending=True)
+    # Both are in (updated_at, id) order and an id is only ever in one of the
+    # tables, so merging them and keeping the first page is the same as paging
+    # through both together.
+    entries = sorted(jobs + gone, key=lambda job: (job.updated_at, job.pk))[:API_PAGE_SIZE]
+    # Unlike the listing, the feed always hands back a position: the end of
+    # the feed today is where the next sync starts.
+    next_position = encode_cursor(entries[-1], 'updated_at') if entries else since
+    results = [job_to_dict(job) if isinstance(job, Job) else removed_job_to_dict(job) for job in entries]
+    return JsonResponse({'results': results, 'next': next_position})
+
+
+async def job_api_detail(request, pk):
+    """Returns one active job as JSON, with the same ETag handling as the job page."""
+    await _load_user(request)
+    job = await job_cache.aget_job(pk)
+    if job is None:
+        return JsonResponse({'error': 'No active job found.'}, status=404)
+    etag, last_modified = job_cache.job_detail_validators(request, job)
+    not_modified = _check_conditions(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return _add_validators(JsonResponse(job_to_dict(job)), etag, last_modified)
@@ -0,0 +1,45 @@
+# Path: /jobs/bulk.py
+
+"""
+Bulk changes to many jobs at once, used by the admin actions.
+
+Saving rows one by one would run a few queries per row through save() and the
+signals. These functions change every row in a few UPDATEs instead, then do
+by hand what those signals would have done (search index, caches), also in
+bulk. Applications are moved in bulk by jobs/status.py.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import Job
+from . import search
+from . import cache as job_cache
+
+# How many jobs each UPDATE of set_jobs_active() changes.
+BATCH_SIZE = 500
+
+
+def set_jobs_active(queryset, active, using=DEFAULT_DB_ALIAS):
+    """Opens (active=True) or closes every job in 'queryset'. Returns how many changed."""
+    with transaction.atomic(using=using):
+        changed = queryset.using(using).exclude(is_active=active)
+        jobs = list(changed.select_related(None).select_for_update().only('pk', *Job.HASHED_FIELDS))
+        if not jobs:
+            return 0
+        # 'is_active' is part of the content hash, so the hash changes with it
+        # (or the importer would take a reopened job for an unchanged one).
+        # bulk_update writes each batch of rows in one UPDATE.
+        now = timezone.now()
+        for job in jobs:
+            job.is_active = active
+            job.updated_at = now
+            job.content_hash = job.compute_content_hash()
+        Job.objects.using(using).bulk_update(jobs, ['is_active', 'updated_at', 'content_hash'], batch_size=BATCH_SIZE)
+        if active:
+            search.index_jobs(jobs, using=using)
+        else:
+            search.remove_jobs([job.pk for job in jobs], using=using)
+    job_cache.forget_jobs(*(job.pk for job in jobs))
+    job_cache.bump_catalog_version()
+    return len(jobs)
@@ -0,0 +1,251 @@
+# Path: /jobs/cache.py
+
+"""
+Caching helpers for the public job pages.
+
+Everything here is keyed by a *version* rather than deleted on change:
+
+* The catalog version is the time (in nanoseconds) of the last change to any
+  job or company. It is stored in the cache and bumped from the signal
+  handlers in jobs/signals.py. Cached listing pages include it in their key,
+  so a single write makes all of them stale at once without having to find
+  and delete them.
+* Each job's own version is its 'updated_at' column. The job cards and the
+  job description are cached as template fragments keyed by it (see the
+  '{% cache %}' tags in the templates), so editing one job only re-renders
+  that job's fragments.
+* The similar jobs panel also has a version of its own, bumped by
+  jobs/recommendations.py when it stores new lists. That way rebuilding the
+  recommendations doesn't make the listing pages stale too.
+
+Both work with any cache backend, including local-memory and file-based ones.
+With local-memory caches each process keeps its own versions, so cached pages
+are also given a timeout (JOB_CACHE_TIMEOUT) to bound how stale they can get.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count
+
+CATALOG_VERSION_KEY = 'jobs:catalog-version'
+SIMILAR_VERSION_KEY = 'jobs:similar-version'
+
+
+def cache_timeout():
+    return getattr(settings, 'JOB_CACHE_TIMEOUT', 300)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_catalog_version():
+    """Returns the current catalog version, creating one if the cache is empty."""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Marks every cached listing page as stale."""
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_similar_version():
+    """Marks every cached similar jobs panel as stale."""
+    cache.set(SIMILAR_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def job_list_key(cursor, version=None, filters=''):
+    # 'filters' is jobs.filters.filters_key() of the page's filters, if any.
+    version = version or get_catalog_version()
+    return f'jobs:list:{version}:{filters}:{cursor or ""}'
+
+
+def job_detail_key(pk):
+    return f'jobs:detail:{pk}'
+
+
+def similar_versions():
+    """
+    The (catalog, similar jobs) versions the similar jobs panel depends on.
+    The panel shows other jobs, which may change or close, so it follows the
+    catalog version too, not just its own.
+    """
+    return get_catalog_version(), _get_version(SIMILAR_VERSION_KEY)
+
+
+def similar_jobs_key(pk):
+    catalog, similar = similar_versions()
+    return f'jobs:similar:{catalog}:{similar}:{pk}'
+
+
+def forget_jobs(*pks):
+    """Drops the cached rows for the given jobs (their fragments expire on their own)."""
+    cache.delete_many([job_detail_key(pk) for pk in pks])
+
+
+def company_stats_key(company_id):
+    return f'jobs:company-stats:{company_id}'
+
+
+def forget_company_stats(*company_ids):
+    """Drops the cached applicant pipeline counts of the given companies."""
+    cache.delete_many([company_stats_key(company_id) for company_id in company_ids])
+
+
+def get_company_stats(company_id):
+    """
+    Returns {job_id: {status: count}} for all of a company's jobs, computed with
+    a single grouped query over the (job, status) index and cached until an
+    application of the company changes status.
+    """
+    from .models import Application
+
+    key = company_stats_key(company_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = {}
+        rows = (
+            Application.objects.filter(job__company_id=company_id)
+            .values_list('job_id', 'status')
+            .annotate(total=Count('pk'))
+            .order_by()
+        )
+        for job_id, status, total in rows:
+            stats.setdefault(job_id, {})[status] = total
+        cache.set(key, stats, cache_timeout())
+    return stats
+
+
+# --- Conditional GET support ---
+# These are passed to Django's @condition decorator. Pages show the logged-in
+# user's name in the header, so the ETag includes the user id. When there are
+# flash messages waiting to be shown we don't send validators at all, otherwise
+# the browser would keep showing its old copy and the message would never appear.
+# The *_validators() helpers do the actual work and are shared with the async views.
+
+def _has_pending_messages(request):
+    # len() doesn't mark the messages as read, unlike iterating over them.
+    return bool(len(messages.get_messages(request)))
+
+
+def _etag(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def job_list_validators(request, version):
+    """Returns the (etag, last_modified) pair for a listing page."""
+    if _has_pending_messages(request):
+        return None, None
+    etag = _etag('list', version, request.GET.urlencode(), request.user.pk)
+    # Last-Modified can't tell users apart, so only anonymous visitors get it.
+    last_modified = None
+    if not request.user.is_authenticated:
+        last_modified = datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+    return etag, last_modified
+
+
+def job_detail_validators(request, job, versions=()):
+    """
+    Returns the (etag, last_modified) pair for a job page. The HTML page also
+    shows the similar jobs panel, so it passes similar_versions() as
+    'versions': both validators change when the job or either version does.
+    """
+    if job is None or _has_pending_messages(request):
+        return None, None
+    etag = _etag('detail', job.pk, job.updated_at.timestamp(), *versions, request.user.pk)
+    last_modified = None
+    if not request.user.is_authenticated:
+        # The versions are times too (in nanoseconds), so the latest change wins.
+        last_modified = max([job.updated_at, *(datetime.fromtimestamp(v / 1e9, tz=timezone.utc) for v in versions)])
+    return etag, last_modified
+
+
+def job_list_etag(request):
+    return job_list_validators(request, get_catalog_version())[0]
+
+
+def job_list_last_modified(request):
+    return job_list_validators(request, get_catalog_version())[1]
+
+
+def job_export_validators(request, version):
+    """
+    Returns the (etag, last_modified) pair for the catalog export. It only
+    depends on the catalog version and on what the client asked for.
+    """
+    etag = _etag('export', version, request.GET.get('format', 'ndjson'), accepts_gzip(request))
+    return etag, datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
+def job_export_etag(request):
+    return job_export_validators(request, get_catalog_version())[0]
+
+
+def job_export_last_modified(request):
+    return job_export_validators(request, get_catalog_version())[1]
+
+
+def _job_queryset():
+    from .models import Job
+    return Job.objects.select_related('company')
+
+
+def get_job(pk):
+    """Returns an active job with its company loaded, from the cache when possible."""
+    key = job_detail_key(pk)
+    job = cache.get(key)
+    if job is None:
+        job = _job_queryset().filter(pk=pk, is_active=True).first()
+        if job is not None:
+            cache.set(key, job, cache_timeout())
+    return job
+
+
+def job_detail_etag(request, pk):
+    return job_detail_validators(request, get_job(pk), similar_versions())[0]
+
+
+def job_detail_last_modified(request, pk):
+    return job_detail_validators(request, get_job(pk), similar_versions())[1]
+
+
+# --- Async versions, used by jobs/async_views.py ---
+
+async def _aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+async def aget_catalog_version():
+    return await _aget_version(CATALOG_VERSION_KEY)
+
+
+async def asimilar_versions():
+    return await aget_catalog_version(), await _aget_version(SIMILAR_VERSION_KEY)
+
+
+async def aget_job(pk):
+    key = job_detail_key(pk)
+    job = await cache.aget(key)
+    if job is None:
+        job = await _job_queryset().filter(pk=pk, is_active=True).afirst()
+        if job is not None:
+            await cache.aset(key, job, cache_timeout())
+    return job
@@ -0,0 +1,302 @@
+# Path: /jobs/exports.py
+
+"""
+The applications export: one ZIP file per job with every application and CV,
+for the company that posted the job.
+
+The archive holds 'cvs/<application id>-<username>.<ext>' for every applicant
+with a CV, then 'applications.csv'. That manifest has one row per application
+with its status, date, the applicant's details and the name of their CV in
+the archive. The ZIP is streamed with jobs/zipstream.py, so memory use stays
+the same for ten applicants or fifty thousand, and nothing is written to disk.
+
+Before the first byte goes out, one pass over the applications works out the
+archive's size, the manifest's checksum and an ETag. This pass reads rows
+only. It opens no files, because each CV's size and CRC-32 are kept on its
+CVBlob row. Knowing the size up front lets the response announce a
+Content-Length and answer Range requests, so an interrupted download resumes
+where it stopped instead of starting over. The ETag hashes the manifest and
+the stored CV names. Those names are hashes of the CVs' content, so the ETag
+changes whenever any byte of the archive would.
+
+The planning pass also keeps what it read: the list of CVs and the manifest
+bytes go to a temporary file (in memory while small). Streaming reads that
+copy instead of the database, so an application or status change in the
+middle of a download can't make the archive disagree with the size and
+checksums already sent. The next download plans again and gets a new ETag.
+
+Under ASGI the archive is handed over as an async iterator (see
+job_board/streaming.py), so it is streamed there too rather than buffered.
+"""
+
+import csv
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import zlib
+
+from django.contrib.auth.decorators import login_required
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import OuterRef, Subquery
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+from accounts.models import CVBlob
+from accounts.storage import cv_storage, file_crc32
+from job_board.streaming import streaming_content
+from .models import Job, Application
+from .zipstream import CHUNK_SIZE, ZipLayout, ZipMember, iter_zip
+
+# How many rows each database round trip fetches.
+EXPORT_CHUNK_SIZE = 2000
+# How many manifest rows go into each piece of the stream.
+MANIFEST_BATCH_SIZE = 500
+# The planned archive is kept in memory up to this size, then on disk.
+SPOOL_MAX_SIZE = 1024 * 1024
+
+MANIFEST_NAME = 'applications.csv'
+MANIFEST_COLUMNS = [
+    'application_id', 'status', 'applied_at', 'username', 'first_name', 'last_name', 'email',
+    'cv_file', 'cv_original_name',
+]
+
+
+class RangeNotSatisfiable(ValueError):
+    """A Range header that asks for bytes past the end of the file."""
+
+
+def _file_reader(storage, name):
+    def read(offset):
+        with storage.open(name, 'rb') as f:
+            f.seek(offset)
+            yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+    return read
+
+
+def _csv_chunks(rows):
+    """Yields the manifest for 'rows' as UTF-8 CSV, MANIFEST_BATCH_SIZE rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(MANIFEST_COLUMNS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % MANIFEST_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+class ApplicationExport:
+    """
+    The applications export of one job. Creating it runs the planning pass;
+    'size', 'etag', 'applications' and 'cvs' describe the archive and
+    iter_bytes() streams it, or any part of it.
+    """
+
+    def __init__(self, job, using=DEFAULT_DB_ALIAS, storage=cv_storage):
+        self.job = job
+        self.using = using
+        self.storage = storage
+        # CVs whose CVBlob row had no checksum: name -> (size, CRC-32), or None
+        # if the file is missing. Kept so a CV shared by applicants is read once.
+        self._measured = {}
+        self._plan()
+
+    def _rows(self):
+        blobs = CVBlob.objects.using(self.using).filter(name=OuterRef('applicant__cv'))
+        return (
+            Application.objects.using(self.using)
+            .filter(job=self.job)
+            .annotate(cv_size=Subquery(blobs.values('size')), cv_crc32=Subquery(blobs.values('crc32')))
+            .order_by('pk')
+            .values_list(
+                'pk', 'status', 'applied_at', 'applicant__user__username', 'applicant__user__first_name',
+                'applicant__user__last_name', 'applicant__user__email', 'applicant__cv',
+                'applicant__cv_original_name', 'cv_size', 'cv_crc32',
+            )
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+    def _checksum(self, name, size, crc):
+        """(size, CRC-32) of the stored CV 'name', or None if it is missing."""
+        if crc is not None:
+            return size, crc
+        if name not in self._measured:
+            # Only CVs stored before CVBlob kept checksums get here, and only once.
+            measured = self._measured[name] = file_crc32(name, self.storage)
+            if measured:
+                CVBlob.objects.using(self.using).filter(name=name).update(size=measured[0], crc32=measured[1])
+        return self._measured[name]
+
+    def _entries(self):
+        """Yields (manifest row, CV member or None, stored CV name) for every application."""
+        for pk, status, applied_at, username, first, last, email, cv, original, size, crc in self._rows():
+            member = None
+            checksum = self._checksum(cv, size, crc) if cv else None
+            if checksum:
+                member = ZipMember(
+                    f'cvs/{pk}-{username}{os.path.splitext(cv)[1]}', checksum[0], checksum[1], applied_at,
+                    _file_reader(self.storage, cv),
+                )
+            row = [pk, status, applied_at.isoformat(), username, first, last, email,
+                   member.name if member else '', original if member else '']
+            yield row, member, cv if member else ''
+
+    def _plan(self):
+        layout = ZipLayout()
+        digest = hashlib.sha256()
+        self.applications = self.cvs = 0
+        # The manifest is dated like the newest CV in the archive, so it stays
+        # the same in every download until something changes.
+        self.modified = self.job.created_at
+        # What streaming reads later, instead of the database (see above).
+        # close() deletes them.
+        self._members = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self._manifest = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+        def rows():
+            for row, member, cv in self._entries():
+                self.applications += 1
+                if member:
+                    self.cvs += 1
+                    layout.add(member.name, member.size)
+                    digest.update(cv.encode() + b'\0')
+                    self.modified = max(self.modified, member.modified)
+                    pickle.dump((member.name, member.size, member.crc32, member.modified, cv), self._members)
+                yield row
+
+        crc, size = 0, 0
+        for chunk in _csv_chunks(rows()):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            digest.update(chunk)
+            self._manifest.write(chunk)
+        layout.add(MANIFEST_NAME, size)
+        self.manifest_size, self.manifest_crc32 = size, crc
+        self.size = layout.size
+        self.etag = f'"{digest.hexdigest()[:32]}"'
+
+    def _read_manifest(self, offset):
+        self._manifest.seek(offset)
+        yield from iter(lambda: self._manifest.read(CHUNK_SIZE), b'')
+
+    def members(self):
+        """Yields the ZipMembers of the archive, as planned: the CVs, then the manifest."""
+        self._members.seek(0)
+        while True:
+            try:
+                name, size, crc, modified, cv = pickle.load(self._members)
+            except EOFError:
+                break
+            yield ZipMember(name, size, crc, modified, _file_reader(self.storage, cv))
+        yield ZipMember(MANIFEST_NAME, self.manifest_size, self.manifest_crc32, self.modified, self._read_manifest)
+
+    def iter_bytes(self, start=0, stop=None):
+        """Yields bytes 'start' to 'stop' (exclusive; None for the end) of the archive."""
+        return iter_zip(self.members, start, stop)
+
+    def close(self):
+        """Deletes the planned copy. The export can't be streamed after this."""
+        self._members.close()
+        self._manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Download:
+    """
+    Part of an export, as the content of a response. The response closes it
+    when it is done with it, sent or not, which closes the export.
+    """
+
+    def __init__(self, export, start, stop):
+        self.export, self.start, self.stop = export, start, stop
+
+    def __iter__(self):
+        return self.export.iter_bytes(self.start, self.stop)
+
+    def close(self):
+        self.export.close()
+
+
+def parse_range(header, size):
+    """
+    Returns the (first, last) byte positions a 'Range: bytes=...' header asks
+    for in a file of 'size' bytes, or None to send the whole file (for a
+    header we don't understand or several ranges, which we don't serve).
+    Raises RangeNotSatisfiable if the range starts past the end.
+    """
+    unit, _, spec = header.partition('=')
+    first, dash, last = spec.strip().partition('-')
+    if unit.strip().lower() != 'bytes' or not dash or not (first + last).isdigit():
+        return None
+    if not first:
+        # 'bytes=-500' is the last 500 bytes.
+        if int(last) == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - int(last), 0), size - 1
+    first, last = int(first), int(last) if last else size - 1
+    if first >= size:
+        raise RangeNotSatisfiable(header)
+    if first > last:
+        return None
+    return first, min(last, size - 1)
+
+
+def export_response(request, export, filename):
+    """
+    A download of 'export', or of the part of it the request's Range header
+    asks for. The response takes care of closing the export.
+    """
+    byte_range = None
+    # 'If-Range' only lets the range through if the archive hasn't changed.
+    if 'HTTP_RANGE' in request.META and request.META.get('HTTP_IF_RANGE', export.etag) == export.etag:
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], export.size)
+        except RangeNotSatisfiable:
+            export.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{export.size}'
+            return response
+
+    first, last = byte_range or (0, export.size - 1)
+    if request.method == 'HEAD':
+        export.close()
+        content = ()
+    else:
+        content = _Download(export, first, last + 1)
+    response = StreamingHttpResponse(streaming_content(request, content), content_type='application/zip', status=206 if byte_range else 200)
+    response['Content-Length'] = last - first + 1
+    if byte_range:
+        response['Content-Range'] = f'bytes {first}-{last}/{export.size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = export.etag
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Applicants' details: never keep a copy in a shared cache.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+@require_safe
+def export_applications(request, pk):
+    """Streams the applications export of one of the company's own jobs (staff can export any job)."""
+    jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(company__user=request.user)
+    job = get_object_or_404(jobs.only('pk', 'created_at'), pk=pk)
+    # The export reads the primary, so every download of the same archive
+    # (and every resumed part of it) sees the same rows.
+    export = ApplicationExport(job)
+    response = get_conditional_response(request, etag=export.etag)
+    if response is not None:
+        export.close()
+        return response
+    return export_response(request, export, f'job-{job.pk}-applications.zip')
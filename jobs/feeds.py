@@ -0,0 +1,105 @@
+# Path: /jobs/feeds.py
+
+"""
+The full-catalog export for aggregator partners.
+
+The export streams every active job as NDJSON (one JSON object per line) or
+as a single JSON array. Rows are read with .iterator() in chunks and written
+out in batches, so memory use stays the same whether the catalog holds a
+thousand jobs or a million. Clients that accept gzip get it compressed on the
+fly. The ETag follows the catalog version, so re-downloading an unchanged
+catalog costs a single 304.
+
+Under ASGI the same generator is handed over through
+job_board.streaming.streaming_content(), so it streams there too.
+"""
+
+import json
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from django.views.decorators.http import condition, require_GET
+
+from job_board.streaming import streaming_content
+from .models import Job
+from .serializers import JOB_ROW_FIELDS, job_row_to_dict
+from . import cache as job_cache
+
+# How many rows each database round trip fetches.
+EXPORT_CHUNK_SIZE = 2000
+# How many jobs go into each piece of the streamed response.
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def _export_rows():
+    return Job.objects.filter(is_active=True).order_by('pk').values_list(*JOB_ROW_FIELDS)
+
+
+def _encode(row):
+    return json.dumps(job_row_to_dict(row), separators=(',', ':'))
+
+
+def _batches(rows, size=EXPORT_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(_encode(row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ndjson_piece(batch, first):
+    return '\n'.join(batch) + '\n'
+
+
+def _json_array_piece(batch, first):
+    return ('' if first else ',') + ','.join(batch)
+
+
+# For each format: what goes before the rows, how a batch of rows is
+# written, and what goes after them.
+EXPORT_WRITERS = {
+    'ndjson': ('', _ndjson_piece, ''),
+    'json': ('[', _json_array_piece, ']\n'),
+}
+
+
+def stream_export(rows, export_format):
+    """Yields the rows in 'export_format' as bytes, EXPORT_BATCH_SIZE rows at a time."""
+    head, piece, tail = EXPORT_WRITERS[export_format]
+    if head:
+        yield head.encode()
+    for number, batch in enumerate(_batches(rows)):
+        yield piece(batch, number == 0).encode()
+    if tail:
+        yield tail.encode()
+
+
+@require_GET
+@condition(etag_func=job_cache.job_export_etag, last_modified_func=job_cache.job_export_last_modified)
+def job_export(request):
+    """Streams every active job. '?format=ndjson' (the default) or '?format=json'."""
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"'format' must be one of: {', '.join(EXPORT_FORMATS)}."}, status=400)
+
+    gzipped = job_cache.accepts_gzip(request)
+    content = stream_export(_export_rows().iterator(chunk_size=EXPORT_CHUNK_SIZE), export_format)
+    if gzipped:
+        content = compress_sequence(content)
+
+    response = StreamingHttpResponse(streaming_content(request, content), content_type=EXPORT_FORMATS[export_format])
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    extension = 'ndjson' if export_format == 'ndjson' else 'json'
+    response['Content-Disposition'] = f'attachment; filename="jobs.{extension}"'
+    return response
@@ -0,0 +1,134 @@
+# Path: /jobs/filters.py
+
+"""
+The salary and distance filters of the job listing.
+
+They read the columns jobs/normalize.py fills in, never the free text:
+
+* '?salary_min=' / '?salary_max=' keep jobs whose pay range overlaps the one
+  asked for, in one '?period=' ('year' by default) and, with '?currency=',
+  one currency. Jobs whose salary couldn't be read are left out.
+* '?near=' (a place in the gazetteer) or '?lat=&lng=', with '?radius=' in
+  km, keep jobs within that distance. The database first narrows the rows
+  down to the radius's bounding box with the (latitude, longitude) index,
+  then checks the exact great-circle distance of what's left.
+
+Parameters that can't be read are ignored, like a bad '?page=' is.
+"""
+
+import hashlib
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from django.utils.http import urlencode
+
+from .normalize import (
+    CURRENCY_CODES, EARTH_RADIUS_KM, MAX_SALARY, SALARY_PERIODS, bounding_box, resolve_location,
+)
+
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 500
+RADIUS_CHOICES = (10, 25, 50, 100, 250, 500)
+# The periods offered in the filter form, most common first.
+PERIOD_CHOICES = ('year', 'month', 'week', 'day', 'hour')
+
+
+def _int(value):
+    value = (value or '').replace(',', '').strip()
+    return min(int(value), MAX_SALARY) if value.isdigit() else None
+
+
+def _float(value, limit):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) and -limit <= number <= limit else None
+
+
+def parse_job_filters(params):
+    """
+    Returns the filters found in a QueryDict as a plain dict. 'near_unknown'
+    is set when '?near=' names a place we can't find, so the page can say so;
+    no distance filter is applied then.
+    """
+    filters = {}
+    for name in ('salary_min', 'salary_max'):
+        value = _int(params.get(name))
+        if value is not None:
+            filters[name] = value
+    if filters:
+        period = params.get('period')
+        filters['period'] = period if period in SALARY_PERIODS else 'year'
+        currency = (params.get('currency') or '').strip().upper()
+        if currency in CURRENCY_CODES:
+            filters['currency'] = currency
+
+    near = (params.get('near') or '').strip()[:100]
+    point = None
+    if near:
+        filters['near'] = near
+        place = resolve_location(near)
+        if place is None:
+            filters['near_unknown'] = True
+        else:
+            point = place[2], place[3]
+    else:
+        latitude, longitude = _float(params.get('lat'), 90), _float(params.get('lng'), 180)
+        if latitude is not None and longitude is not None:
+            filters['lat'], filters['lng'] = latitude, longitude
+            point = latitude, longitude
+    if point is not None:
+        radius = _float(params.get('radius'), MAX_RADIUS_KM)
+        radius = radius if radius and radius > 0 else DEFAULT_RADIUS_KM
+        filters['radius'] = int(radius) if float(radius).is_integer() else radius
+        filters['point'] = point
+    return filters
+
+
+def filter_query(filters):
+    """The filters as a query string, for 'next page' links and cache keys."""
+    names = ('salary_min', 'salary_max', 'period', 'currency', 'near', 'lat', 'lng', 'radius')
+    return urlencode([(name, filters[name]) for name in names if name in filters])
+
+
+def filters_key(filters):
+    """A short, fixed-length stand-in for filter_query(), for cache keys."""
+    query = filter_query(filters)
+    return hashlib.md5(query.encode()).hexdigest() if query else ''
+
+
+def distance_km(latitude, longitude):
+    """An expression for the great-circle (haversine) distance from a point to each job, in km."""
+    lat = math.radians(latitude)
+    half_dlat = (Radians(F('latitude')) - Value(lat)) / 2
+    half_dlon = (Radians(F('longitude')) - Value(math.radians(longitude))) / 2
+    a = Power(Sin(half_dlat), 2) + Value(math.cos(lat)) * Cos(Radians(F('latitude'))) * Power(Sin(half_dlon), 2)
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a), output_field=FloatField())
+
+
+def filter_jobs(queryset, filters):
+    """Applies parse_job_filters() results to a Job queryset."""
+    if 'salary_min' in filters or 'salary_max' in filters:
+        queryset = queryset.filter(salary_period=filters['period'])
+        if 'currency' in filters:
+            queryset = queryset.filter(salary_currency=filters['currency'])
+        # Two ranges overlap when each one starts before the other ends.
+        if 'salary_min' in filters:
+            queryset = queryset.filter(salary_max__gte=filters['salary_min'])
+        if 'salary_max' in filters:
+            queryset = queryset.filter(salary_min__lte=filters['salary_max'])
+
+    if 'point' in filters:
+        latitude, longitude = filters['point']
+        min_lat, max_lat, lon_ranges = bounding_box(latitude, longitude, filters['radius'])
+        in_lon = Q()
+        for west, east in lon_ranges:
+            in_lon |= Q(longitude__gte=west, longitude__lte=east)
+        queryset = (
+            queryset.filter(in_lon, latitude__gte=min_lat, latitude__lte=max_lat)
+            .annotate(distance_km=distance_km(latitude, longitude))
+            .filter(distance_km__lte=filters['radius'])
+        )
+    return queryset
@@ -0,0 +1,18 @@
+# Path: /jobs/forms.py
+
+from django import forms
+from .models import SavedSearch
+
+
+# This form is used to save a search as a job alert.
+class SavedSearchForm(forms.ModelForm):
+    class Meta:
+        model = SavedSearch
+        fields = ['query', 'location', 'job_type']
+
+    def clean(self):
+        """A search needs at least one criterion, or it would match every job."""
+        cleaned_data = super().clean()
+        if not any((cleaned_data.get(name) or '').strip() for name in self.Meta.fields):
+            raise forms.ValidationError("Enter keywords, a location or a job type.")
+        return cleaned_data
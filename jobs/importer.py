@@ -0,0 +1,228 @@
+# Path: /jobs/importer.py
+
+"""
+Bulk job import from partner feeds (CSV or JSON Lines).
+
+Feeds are read one row at a time and written in batches, each batch in its own
+transaction, so a feed with millions of rows never has to fit in memory. A row
+is matched to an existing job by (company, external_id), or by its content
+hash when it has no external id, and only new or changed rows are written.
+This makes re-running the same feed cheap.
+
+Every feed row needs 'title', 'description' and 'location'. Optional columns
+are 'external_id', 'company' (the company account's username), 'job_type',
+'salary' and 'is_active'. Use the 'default_company' argument for feeds that
+come from a single partner and have no 'company' column.
+"""
+
+import csv
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from accounts.models import Company
+from .models import Job
+from . import search, summaries
+from .normalize import NORMALIZED_FIELDS, normalize_job
+from . import cache as job_cache
+
+IMPORT_BATCH_SIZE = 1000
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class ImportRowError(ValueError):
+    """A feed row that can't be turned into a job."""
+
+
+def read_feed(path, fmt=None):
+    """
+    Yields (row, error) pairs from a CSV or JSONL file, streaming it. 'error'
+    is an ImportRowError for lines that can't be parsed, otherwise None.
+    The format is taken from the file extension unless 'fmt' is given.
+    """
+    path = Path(path)
+    fmt = fmt or ('jsonl' if path.suffix.lower() in ('.jsonl', '.ndjson') else 'csv')
+    with path.open(newline='', encoding='utf-8') as feed:
+        if fmt == 'csv':
+            for row in csv.DictReader(feed):
+                yield row, None
+        else:
+            for line_number, line in enumerate(feed, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line), None
+                except json.JSONDecodeError as error:
+                    yield None, ImportRowError(f"line {line_number}: invalid JSON ({error.msg})")
+
+
+class CompanyLookup:
+    """
+    Maps company usernames to Company primary keys. Every username is looked up
+    at most once per import, and a whole batch of unknown ones in a single query.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.ids = {}
+
+    def load(self, usernames):
+        missing = {name for name in usernames if name and name not in self.ids}
+        if not missing:
+            return
+        found = dict(
+            Company.objects.using(self.using)
+            .filter(user__username__in=missing)
+            .values_list('user__username', 'pk')
+        )
+        for name in missing:
+            self.ids[name] = found.get(name)
+
+    def get(self, username):
+        return self.ids.get(username)
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def build_job(row, company_id):
+    """Turns one feed row into an unsaved Job, or raises ImportRowError."""
+    if company_id is None:
+        raise ImportRowError(f"unknown company {_clean(row.get('company'))!r}")
+    job = Job(
+        company_id=company_id,
+        external_id=_clean(row.get('external_id')) or None,
+        title=_clean(row.get('title')),
+        description=_clean(row.get('description')),
+        location=_clean(row.get('location')),
+        job_type=_clean(row.get('job_type')) or 'Full-Time',
+        salary=_clean(row.get('salary')) or None,
+    )
+    is_active = row.get('is_active', True)
+    job.is_active = is_active if isinstance(is_active, bool) else _clean(is_active).lower() in TRUE_VALUES
+    for field in ('title', 'description', 'location'):
+        if not getattr(job, field):
+            raise ImportRowError(f"missing {field}")
+    job.content_hash = job.compute_content_hash()
+    # bulk_create() doesn't call save(), so the salary and location columns are filled here.
+    normalize_job(job)
+    return job
+
+
+def _write_batch(jobs, stats, using):
+    """Splits a batch into new/changed/unchanged jobs and writes it in one transaction."""
+    # If the same job appears twice in one batch, the later row wins.
+    by_key = {}
+    for job in jobs:
+        key = (job.company_id, job.external_id or f'#{job.content_hash}')
+        if key in by_key:
+            stats['duplicate'] += 1
+        by_key[key] = job
+    jobs = list(by_key.values())
+
+    keyed = [job for job in jobs if job.external_id]
+    unkeyed = [job for job in jobs if not job.external_id]
+    company_ids = {job.company_id for job in jobs}
+
+    existing = {}
+    if keyed:
+        rows = (
+            Job.objects.using(using)
+            .filter(company_id__in=company_ids, external_id__in={job.external_id for job in keyed})
+            .values_list('company_id', 'external_id', 'pk', 'content_hash')
+        )
+        existing = {(company_id, external_id): (pk, content_hash) for company_id, external_id, pk, content_hash in rows}
+    known_hashes = set()
+    if unkeyed:
+        known_hashes = set(
+            Job.objects.using(using)
+            .filter(company_id__in=company_ids, content_hash__in={job.content_hash for job in unkeyed})
+            .values_list('company_id', 'content_hash')
+        )
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for job in keyed:
+        match = existing.get((job.company_id, job.external_id))
+        if match is None:
+            to_create.append(job)
+        elif match[1] == job.content_hash:
+            stats['unchanged'] += 1
+        else:
+            job.pk = match[0]
+            job.updated_at = now
+            to_update.append(job)
+    for job in unkeyed:
+        if (job.company_id, job.content_hash) in known_hashes:
+            stats['unchanged'] += 1
+        else:
+            to_create.append(job)
+
+    with transaction.atomic(using=using):
+        # bulk_create/bulk_update skip the Job signals, so we keep the search
+        # index and the dashboard read model in step by hand.
+        Job.objects.using(using).bulk_create(to_create)
+        Job.objects.using(using).bulk_update(
+            to_update, fields=[*Job.HASHED_FIELDS, 'content_hash', *NORMALIZED_FIELDS, 'updated_at'],
+        )
+        search.index_jobs(to_create + to_update, using=using)
+        if to_update:
+            summaries.refresh_job_titles([job.pk for job in to_update], using=using)
+
+    if to_update:
+        job_cache.forget_jobs(*(job.pk for job in to_update))
+    if to_create or to_update:
+        job_cache.bump_catalog_version()
+    stats['created'] += len(to_create)
+    stats['updated'] += len(to_update)
+
+
+def import_jobs(rows, default_company=None, batch_size=IMPORT_BATCH_SIZE, using=DEFAULT_DB_ALIAS,
+                on_batch=None, on_error=None):
+    """
+    Imports an iterable of (row, error) pairs as produced by read_feed().
+
+    'on_batch(stats)' is called after every batch is written and
+    'on_error(position, message)' for every row that is skipped.
+    Returns a Counter with 'rows', 'created', 'updated', 'unchanged',
+    'duplicate' and 'failed' totals.
+    """
+    stats = Counter()
+    companies = CompanyLookup(using)
+    batch = []
+
+    def flush():
+        companies.load({_clean(row.get('company')) or default_company for _, row in batch})
+        jobs = []
+        for position, row in batch:
+            try:
+                jobs.append(build_job(row, companies.get(_clean(row.get('company')) or default_company)))
+            except ImportRowError as error:
+                stats['failed'] += 1
+                if on_error:
+                    on_error(position, str(error))
+        _write_batch(jobs, stats, using)
+        batch.clear()
+        if on_batch:
+            on_batch(stats)
+
+    for position, (row, error) in enumerate(rows, start=1):
+        stats['rows'] += 1
+        if error is not None or not isinstance(row, dict):
+            stats['failed'] += 1
+            if on_error:
+                on_error(position, str(error or "row is not an object"))
+            continue
+        batch.append((position, row))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
@@ -0,0 +1,38 @@
+# Path: /jobs/management/commands/archive_jobs.py
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Deactivates expired jobs and moves jobs that have been inactive for a while, "
+        "with their applications, into the archive tables. Meant to run from cron, e.g. nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Archive jobs inactive for more than this many days "
+                                 "(default: the JOB_ARCHIVE_AFTER_DAYS setting).")
+        parser.add_argument('--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE,
+                            help="How many jobs to archive per transaction.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        started = time.perf_counter()
+        expired = archive.expire_jobs(using=using)
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+        jobs, applications = archive.archive_jobs(
+            older_than=older_than, batch_size=options['batch_size'], using=using,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Deactivated {expired} expired jobs and archived {jobs} jobs "
+            f"with {applications} applications in {elapsed:.1f}s."
+        ))
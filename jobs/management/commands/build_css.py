@@ -0,0 +1,47 @@
+# Path: /jobs/management/commands/build_css.py
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from job_board.assets import CSS_PATH, build_css, template_classes
+
+
+class Command(BaseCommand):
+    help = "Builds static/css/site.css from the classes used in the templates (see job_board/assets.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Where to write the CSS. Defaults to css/site.css in the first STATICFILES_DIRS.")
+        parser.add_argument('--check', action='store_true',
+                            help="Don't write anything, fail if the file is out of date instead.")
+
+    def handle(self, *args, **options):
+        if options['output']:
+            output = Path(options['output'])
+        elif settings.STATICFILES_DIRS:
+            output = Path(settings.STATICFILES_DIRS[0]) / CSS_PATH
+        else:
+            raise CommandError("Set STATICFILES_DIRS or pass --output.")
+
+        classes = template_classes()
+        css, unknown = build_css(classes)
+        if unknown:
+            self.stderr.write(self.style.WARNING(
+                "No rule for these classes, they were left out: " + ', '.join(sorted(unknown))
+            ))
+
+        current = output.read_text(encoding='utf-8') if output.exists() else None
+        if options['check']:
+            if current != css:
+                raise CommandError(f"{output} is out of date, run 'manage.py build_css'.")
+            self.stdout.write(f"{output} is up to date.")
+            return
+        if current == css:
+            self.stdout.write(f"{output} is already up to date.")
+            return
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(css, encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({len(classes) - len(unknown)} classes, {len(css.encode()):,} bytes)."
+        ))
@@ -0,0 +1,30 @@
+# Path: /jobs/management/commands/build_recommendations.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs import recommendations
+
+
+class Command(BaseCommand):
+    help = "Precomputes the 'similar jobs' shown on each job page (see jobs/recommendations.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recompute every active job, not just the ones changed since the last run.")
+        parser.add_argument('--top-k', type=int, default=recommendations.SIMILAR_JOBS_PER_JOB,
+                            help="How many similar jobs to store per job.")
+        parser.add_argument('--chunk-size', type=int,
+                            help="Rows multiplied at once. By default it is picked to bound memory use.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if not recommendations.available():
+            raise CommandError("build_recommendations needs NumPy and SciPy: pip install numpy scipy")
+        result = recommendations.build_recommendations(
+            full=options['full'], k=options['top_k'], chunk_size=options['chunk_size'], using=options['database'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['mode'].capitalize()} build: recomputed {result['recomputed']} jobs and updated "
+            f"{result['merged']} others in {result['seconds']}s."
+        ))
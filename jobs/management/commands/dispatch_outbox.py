@@ -0,0 +1,43 @@
+# Path: /jobs/management/commands/dispatch_outbox.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Handles the events in the application status outbox: emails applicants about their "
+        "new status and drops cached counts (see jobs/outbox.py). Runs once, from cron, or keeps "
+        "running with --poll-interval. Run only one at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.OUTBOX_BATCH_SIZE,
+                            help="How many events to handle at once.")
+        parser.add_argument('--poll-interval', type=float,
+                            help="Keep running, looking for new events this many seconds apart.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def report(self, totals, elapsed):
+        self.stdout.write(
+            f"Handled {totals['done']} of {totals['events']} events in {elapsed:.1f}s: "
+            f"{totals['sent']} emails sent, {totals['failed']} to retry, {totals['dropped']} dropped."
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval']
+        try:
+            while True:
+                started = time.perf_counter()
+                totals = outbox.dispatch_outbox(batch_size=options['batch_size'], using=options['database'])
+                if totals['done'] or totals['failed'] or not poll_interval:
+                    self.report(totals, time.perf_counter() - started)
+                if not poll_interval:
+                    return
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Dispatcher stopped.")
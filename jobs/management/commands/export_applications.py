@@ -0,0 +1,60 @@
+# Path: /jobs/management/commands/export_applications.py
+
+import glob
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs.exports import ApplicationExport
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes every application and CV of a job to a ZIP file (see jobs/exports.py). "
+        "The file is written as '<output>.<etag>.part' and renamed when complete; running "
+        "the command again after an interruption carries on where it stopped, as long as "
+        "the applications haven't changed meanwhile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_id', type=int)
+        parser.add_argument('output', help="Where to write the ZIP file.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using, output = options['database'], options['output']
+        job = Job.objects.using(using).filter(pk=options['job_id']).first()
+        if job is None:
+            raise CommandError(f"There is no job {options['job_id']}.")
+
+        started = time.perf_counter()
+        with ApplicationExport(job, using=using) as export:
+            self.write(export, output)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {export.applications} applications and {export.cvs} CVs "
+            f"({export.size / 2**20:,.1f} MB) to {output} in {elapsed:.1f}s."
+        ))
+
+    def write(self, export, output):
+        # The partial file is named after the archive's ETag, so we only ever
+        # resume the same archive. Parts of older versions are of no use.
+        tag = export.etag.strip('"')
+        partial = f"{output}.{tag}.part"
+        for stale in glob.glob(f"{glob.escape(output)}.*.part"):
+            if stale != partial:
+                os.remove(stale)
+
+        with open(partial, 'ab') as f:
+            start = f.tell()
+            if start > export.size:
+                f.truncate(0)
+                start = 0
+            if start:
+                self.stdout.write(f"Resuming at byte {start:,} of {export.size:,}.")
+            for chunk in export.iter_bytes(start):
+                f.write(chunk)
+        os.replace(partial, output)
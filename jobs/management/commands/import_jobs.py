@@ -0,0 +1,62 @@
+# Path: /jobs/management/commands/import_jobs.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs import importer
+
+
+class Command(BaseCommand):
+    help = "Imports jobs from a partner CSV or JSONL feed. Re-running a feed only writes changed rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The feed file to import.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="Feed format. Defaults to guessing from the file extension.")
+        parser.add_argument('--company',
+                            help="Username of the company to use for rows without a 'company' column.")
+        parser.add_argument('--batch-size', type=int, default=importer.IMPORT_BATCH_SIZE)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--max-errors', type=int, default=20,
+                            help="How many skipped rows to print before going quiet.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        errors_shown = 0
+
+        def on_error(position, message):
+            nonlocal errors_shown
+            if errors_shown < options['max_errors']:
+                self.stderr.write(f"Row {position}: {message}")
+            errors_shown += 1
+
+        def on_batch(stats):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{stats['rows']} rows ({stats['rows'] / elapsed:,.0f} rows/s): "
+                f"{stats['created']} created, {stats['updated']} updated, "
+                f"{stats['unchanged']} unchanged, {stats['failed']} failed"
+            )
+
+        try:
+            rows = importer.read_feed(options['path'], options['format'])
+            stats = importer.import_jobs(
+                rows,
+                default_company=options['company'],
+                batch_size=options['batch_size'],
+                using=options['database'],
+                on_batch=on_batch,
+                on_error=on_error,
+            )
+        except FileNotFoundError:
+            raise CommandError(f"No such file: {options['path']}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['rows']} rows in {elapsed:.1f}s "
+            f"({stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s): {stats['created']} created, "
+            f"{stats['updated']} updated, {stats['unchanged']} unchanged, "
+            f"{stats['duplicate']} duplicates, {stats['failed']} failed."
+        ))
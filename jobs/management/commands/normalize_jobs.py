@@ -0,0 +1,33 @@
+# Path: /jobs/management/commands/normalize_jobs.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs import normalize
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the parsed salary and location columns of existing jobs (see jobs/normalize.py). "
+        "Safe to re-run, e.g. after editing the gazetteer: only changed rows are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=normalize.BACKFILL_BATCH_SIZE,
+                            help="How many jobs to read and write per transaction.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(seen, changed):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{seen} jobs ({seen / max(elapsed, 1e-9):,.0f} jobs/s): {changed} updated")
+
+        seen, changed = normalize.backfill(
+            batch_size=options['batch_size'], using=options['database'], on_batch=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Normalized {seen} jobs ({changed} updated) in {elapsed:.1f}s."))
@@ -0,0 +1,18 @@
+# Path: /jobs/management/commands/rebuild_application_summaries.py
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs import summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the applicant dashboard read model (summaries and status counters)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=summaries.REBUILD_BATCH_SIZE)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        total = summaries.rebuild_summaries(using=options['database'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} application summaries."))
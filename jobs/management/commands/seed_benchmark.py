@@ -0,0 +1,32 @@
+# Path: /jobs/management/commands/seed_benchmark.py
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import BENCH_PASSWORD, seed_database
+
+
+class Command(BaseCommand):
+    help = "Fills the database with generated companies, jobs, applicants and applications for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=10000, help="How many jobs to create.")
+        parser.add_argument('--applicants', type=int, default=1000, help="How many applicants to create.")
+        parser.add_argument('--companies', type=int, default=None,
+                            help="How many companies post the jobs (default: one per 200 jobs).")
+        parser.add_argument('--applications-per-applicant', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42, help="Random seed, the same seed gives the same data.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="How many rows to write per INSERT.")
+
+    def handle(self, *args, **options):
+        result = seed_database(
+            options['jobs'], options['applicants'],
+            companies=options['companies'],
+            applications_per_applicant=options['applications_per_applicant'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['jobs']} jobs from {result['companies']} companies, "
+            f"{result['applicants']} applicants and {result['applications']} applications "
+            f"in {result['seed_s']}s. Applicants log in as 'bench-applicant-N' with password '{BENCH_PASSWORD}'."
+        ))
@@ -0,0 +1,45 @@
+# Path: /jobs/management/commands/send_job_alerts.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs import alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Matches jobs posted or edited since the last run against the saved searches, "
+        "then emails each applicant a digest of their new matches (see jobs/alerts.py). "
+        "Run it from cron every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=alerts.MATCH_BATCH_SIZE,
+                            help="How many jobs to match at once.")
+        parser.add_argument('--base-url', default=settings.SITE_URL,
+                            help="The site's root URL, for the links in the emails.")
+        parser.add_argument('--no-email', action='store_true',
+                            help="Only store the matches; send them with the next run.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        started = time.perf_counter()
+
+        def progress(seen, matched):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{seen} jobs ({seen / max(elapsed, 1e-9):,.0f} jobs/s): {matched} matches")
+
+        seen, matched = alerts.match_new_jobs(batch_size=options['batch_size'], using=using, on_batch=progress)
+        sent = pruned = 0
+        if not options['no_email']:
+            sent = alerts.send_digests(options['base_url'], using=using)
+            pruned = alerts.prune_matches(using=using)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Matched {seen} jobs ({matched} matches), sent {sent} digests and pruned {pruned} old matches "
+            f"in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,39 @@
+# Path: /jobs/management/commands/sync_replica.py
+
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = "Copies the primary SQLite database into a local replica file (see DJANGO_REPLICA_DB)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='replica', help="The replica alias to refresh.")
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in settings.DATABASES:
+            raise CommandError(f"There is no database called '{alias}'.")
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("Only SQLite replicas can be copied. Real replicas are kept up to date by the database server.")
+        if str(primary.settings_dict['NAME']) == str(replica.settings_dict['NAME']):
+            self.stdout.write(f"'{alias}' reads the primary's own file, there is nothing to copy.")
+            return
+
+        started = time.perf_counter()
+        primary.ensure_connection()
+        # Close our own connection to the replica so the copy can replace it.
+        replica.close()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            # The backup API copies a consistent snapshot while others keep writing.
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Copied the primary into '{alias}' in {elapsed:.1f}s."))
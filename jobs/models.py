@@ -1,7 +1,11 @@
 # Path: /apps/jobs/models.py
 
-from django.db import models
+import hashlib
+
+from django.db import models, router, transaction
+from django.utils import timezone
 from accounts.models import Company, Applicant
+from .normalize import NORMALIZED_FIELDS, SALARY_PERIODS, normalize_job
 
 # This model stores all the information for a single job posting.
 class Job(models.Model):
@@ -16,11 +20,86 @@ class Job(models.Model):
     job_type = models.CharField(max_length=50, default='Full-Time')
     salary = models.CharField(max_length=100, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Changes on every save. Used as the job's cache version and for Last-Modified headers.
+    updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # When the posting closes. 'manage.py archive_jobs' deactivates jobs past
+    # this date and later moves them to the archive tables.
+    expires_at = models.DateTimeField(blank=True, null=True)
+    # The partner's own id for this job, when it came in through 'manage.py import_jobs'.
+    external_id = models.CharField(max_length=255, blank=True, null=True)
+    # A fingerprint of the fields above, used by the importer to skip unchanged rows.
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Parsed from 'salary' and 'location' on save (see jobs/normalize.py), so
+    # the listing can filter by pay and distance with an index. Empty/None
+    # when the text couldn't be read.
+    salary_min = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    salary_max = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    salary_currency = models.CharField(max_length=3, blank=True, editable=False)
+    salary_period = models.CharField(
+        max_length=5, blank=True, editable=False, choices=[(period, period) for period in SALARY_PERIODS],
+    )
+    latitude = models.FloatField(blank=True, null=True, editable=False)
+    longitude = models.FloatField(blank=True, null=True, editable=False)
+
+    # The fields that make up a job's content_hash, in a fixed order.
+    HASHED_FIELDS = ('title', 'description', 'location', 'job_type', 'salary', 'is_active')
+
+    class Meta:
+        indexes = [
+            # Backs the keyset pagination on the job listing (see jobs/pagination.py).
+            # It only covers active jobs: Django writes the filter as a bare
+            # 'WHERE is_active', which SQLite can match to this condition but
+            # can't use to seek into an index that starts with is_active.
+            models.Index(
+                fields=['created_at', 'id'], condition=models.Q(is_active=True), name='job_active_created_idx',
+            ),
+            # The other indexes on live jobs are partial too, so they only
+            # grow with the open postings, not with years of history.
+            models.Index(
+                fields=['company', 'created_at'], condition=models.Q(is_active=True), name='job_active_company_idx',
+            ),
+            models.Index(fields=['expires_at'], condition=models.Q(is_active=True), name='job_active_expiry_idx'),
+            # Backs the '?since=' changes feed of the job API.
+            models.Index(fields=['updated_at', 'id'], name='job_updated_idx'),
+            # Lets the importer find jobs without an external id by their content.
+            models.Index(fields=['company', 'content_hash'], name='job_company_hash_idx'),
+            # Back the salary and radius filters of the listing (see jobs/filters.py).
+            # A radius search reads the latitude range of its bounding box.
+            models.Index(
+                fields=['salary_period', 'salary_max'], condition=models.Q(is_active=True), name='job_active_salary_idx',
+            ),
+            models.Index(
+                fields=['latitude', 'longitude'], condition=models.Q(is_active=True), name='job_active_latlng_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'external_id'],
+                condition=models.Q(external_id__isnull=False),
+                name='job_unique_external_id',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def compute_content_hash(self):
+        """Returns a SHA-256 fingerprint of the job's content."""
+        values = ['' if getattr(self, name) is None else str(getattr(self, name)) for name in self.HASHED_FIELDS]
+        return hashlib.sha256('\x1f'.join(values).encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash()
+        normalize_job(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = ['content_hash']
+            if {'salary', 'location'} & set(update_fields):
+                extra += NORMALIZED_FIELDS
+            kwargs['update_fields'] = [*update_fields, *(name for name in extra if name not in update_fields)]
+        super().save(*args, **kwargs)
+
 
 # This model represents a single application from an Applicant to a Job.
 class Application(models.Model):
@@ -41,10 +120,293 @@ class Application(models.Model):
     applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='applications')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="applied")
     applied_at = models.DateTimeField(auto_now_add=True)
+    # An optional client-chosen key that identifies one apply request, so a
+    # retried request can be recognised and answered like the original one.
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         # Ensures an applicant can only apply to the same job once.
         unique_together = ('job', 'applicant')
+        constraints = [
+            # An applicant can't use the same key for two different applications.
+            models.UniqueConstraint(
+                fields=['applicant', 'idempotency_key'], name='application_unique_idempotency_key',
+            ),
+        ]
+        indexes = [
+            # Backs the per-job, per-status counts on the company dashboard.
+            models.Index(fields=['job', 'status'], name='application_job_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.applicant} for {self.job}"
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the application and updates the applicant's dashboard read model
+        (ApplicationSummary and ApplicationStatusCount) in the same transaction,
+        so the dashboard can never disagree with the real data. A status
+        change is also added to the history and the outbox.
+        """
+        from .summaries import record_application
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous_status = None
+            if not self._state.adding:
+                previous_status = (
+                    Application.objects.using(using).select_for_update()
+                    .filter(pk=self.pk).values_list('status', flat=True).first()
+                )
+            super().save(*args, **kwargs)
+            record_application(self, previous_status, using=using)
+            if previous_status is not None and previous_status != self.status:
+                # The history row and the event that emails the applicant
+                # later (see jobs/outbox.py).
+                from .outbox import record_status_changes
+                record_status_changes([(self.pk, previous_status, self.status)], using=using)
+
+
+# This model is a flattened copy of an Application, made for the applicant dashboard.
+class ApplicationSummary(models.Model):
+    """
+    Holds everything a row on the applicant dashboard shows, so the dashboard
+    is rendered from a single indexed query instead of walking
+    application -> job -> company for every row.
+    It is written by Application.save() and refreshed by the signals in jobs/signals.py.
+    """
+    application = models.OneToOneField(Application, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='application_summaries')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='+')
+    job_title = models.CharField(max_length=255)
+    company_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    applied_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Backs the keyset-paginated "My Applications" table.
+            models.Index(fields=['applicant', '-applied_at', '-application'], name='summary_applicant_applied_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_title} ({self.status})"
+
+
+# This model counts an applicant's applications per status.
+class ApplicationStatusCount(models.Model):
+    """
+    One row per (applicant, status) with the number of applications in that status.
+    Kept in step with ApplicationSummary so the dashboard never has to COUNT(*).
+    """
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='status_counts')
+    status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('applicant', 'status')
+
+    def __str__(self):
+        return f"{self.applicant}: {self.status}={self.count}"
+
+
+# This model records every status an application has moved through.
+class ApplicationStatusChange(models.Model):
+    """
+    The status history of applications: one row per change, never updated
+    or deleted. It has no database constraint on the application, so the
+    history stays after 'manage.py archive_jobs' moves the application to
+    ArchivedApplication (which keeps its id).
+    """
+    application = models.ForeignKey(
+        Application, on_delete=models.DO_NOTHING, db_constraint=False, related_name='status_changes',
+    )
+    from_status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    to_status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # One application's history, oldest first.
+            models.Index(fields=['application', 'id'], name='status_change_application_idx'),
+        ]
+
+    def __str__(self):
+        return f"Application {self.application_id}: {self.from_status} -> {self.to_status}"
+
+
+# This model holds status changes whose side effects haven't been handled yet.
+class ApplicationOutbox(models.Model):
+    """
+    One row per status change, written in the same transaction as the change,
+    so there is never a change without its event or the other way round.
+    'manage.py dispatch_outbox' handles the rows in id order (emails the
+    applicant, drops cached counts) and deletes them; see jobs/outbox.py.
+    """
+    application = models.ForeignKey(Application, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    from_status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    to_status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Failed deliveries are tried again from this time on.
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Event {self.pk}: application {self.application_id} -> {self.to_status}"
+
+
+# This model keeps a job after 'manage.py archive_jobs' has moved it out of the Job table.
+class ArchivedJob(models.Model):
+    """
+    A closed job posting, kept read-only for the record. It keeps the id it
+    had as a Job. The live tables only hold jobs that can still change.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='archived_jobs')
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    location = models.CharField(max_length=255)
+    job_type = models.CharField(max_length=50)
+    salary = models.CharField(max_length=100, blank=True, null=True)
+    external_id = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    expires_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # The changes feed (jobs/async_views.py) reports archived jobs in
+            # 'updated_at' order, next to the live ones.
+            models.Index(fields=['updated_at', 'id'], name='archived_job_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+# This model keeps an application to an archived job.
+class ArchivedApplication(models.Model):
+    """An Application that was archived together with its job. It keeps its original id."""
+    id = models.BigIntegerField(primary_key=True)
+    job = models.ForeignKey(ArchivedJob, on_delete=models.CASCADE, related_name='applications')
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='archived_applications')
+    status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    applied_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Backs the applicant's "Archived applications" page.
+            models.Index(fields=['applicant', '-applied_at', '-id'], name='archived_app_applicant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.applicant} for {self.job} (archived)"
+
+
+# This model holds one precomputed "similar job" (see jobs/recommendations.py).
+class SimilarJob(models.Model):
+    """
+    One of the active jobs whose text is most like 'job', with its rank (0 is
+    the closest) and cosine similarity. Written in bulk by
+    'manage.py build_recommendations' and read by the job detail page.
+    """
+    # Not indexed on its own: the (job, rank) constraint below already starts with it.
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='similar_jobs', db_index=False)
+    similar = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    built_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Also the index that serves a job's panel in rank order.
+            models.UniqueConstraint(fields=['job', 'rank'], name='similar_job_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} -> {self.similar_id} ({self.score:.2f})"
+
+
+# This model is an applicant's saved search, which emails them new jobs that match it.
+class SavedSearch(models.Model):
+    """
+    A job alert: keywords that must all appear in a job (title, description or
+    location), an optional location and an optional job type. New and updated
+    jobs are matched against every saved search by jobs/alerts.py.
+    """
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='saved_searches')
+    query = models.CharField(max_length=200, blank=True)
+    location = models.CharField(max_length=100, blank=True)
+    job_type = models.CharField(max_length=50, blank=True)
+    # The one term this search is filed under in the matcher's inverted index.
+    # Set on save, see jobs/alerts.py.
+    match_term = models.CharField(max_length=100, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The inverted index: the matcher looks searches up by the terms of a job.
+            models.Index(fields=['match_term'], name='saved_search_term_idx'),
+        ]
+
+    def __str__(self):
+        return ' / '.join(part for part in (self.query, self.location, self.job_type) if part) or 'All jobs'
+
+    def save(self, *args, **kwargs):
+        from .alerts import choose_match_term
+
+        self.match_term = choose_match_term(self.query, self.location, self.job_type)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'match_term' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'match_term']
+        super().save(*args, **kwargs)
+
+
+# This model records that a job matched a saved search, until the digest email goes out.
+class SavedSearchMatch(models.Model):
+    """
+    One (saved search, job) match. Rows are kept after they are emailed
+    ('notified_at' set) so that an edited job doesn't alert the same search
+    twice; 'manage.py send_job_alerts' prunes them after a while.
+    """
+    # Not indexed on its own: the (search, job) constraint below starts with it.
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches', db_index=False)
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='+')
+    # Copied from the search, so a digest is gathered without a join.
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='+', db_index=False)
+    matched_at = models.DateTimeField()
+    notified_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['search', 'job'], name='saved_search_match_unique'),
+        ]
+        indexes = [
+            # Finds the applicants with matches still to be emailed.
+            models.Index(
+                fields=['applicant', 'id'], condition=models.Q(notified_at__isnull=True), name='match_pending_idx',
+            ),
+            # Finds the emailed matches to prune. Partial, so the planner
+            # can't pick it for "notified_at IS NULL" over the index above.
+            models.Index(
+                fields=['notified_at'], condition=models.Q(notified_at__isnull=False), name='match_notified_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.search_id} -> {self.job_id}"
+
+
+# This model remembers how far the job alert matcher has got.
+class JobAlertCursor(models.Model):
+    """
+    A single row holding the keyset position (see jobs/pagination.py) of the
+    last job, in (updated_at, id) order, that was matched against the saved searches.
+    """
+    position = models.CharField(max_length=100, blank=True)
+
+    def __str__(self):
+        return self.position or '(start)'
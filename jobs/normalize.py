@@ -0,0 +1,244 @@
+# Path: /jobs/normalize.py
+
+"""
+Turns the free-text 'salary' and 'location' of a job into columns we can
+filter on with an index.
+
+* parse_salary() reads things like "$50,000 - $70,000 a year", "NGN 250k/month"
+  or "45 EUR per hour" into a SalaryRange: whole-unit min and max, an ISO
+  currency code ('' when none is given) and a period ('hour', 'day', 'week',
+  'month' or 'year').
+* resolve_location() looks a location up in the gazetteer bundled with the
+  app (jobs/data/gazetteer.csv), so no network service is involved, and
+  returns its latitude and longitude. "Lagos, Nigeria" or "Remote (Lagos)"
+  resolve too; anything it doesn't know stays unresolved.
+
+normalize_job() fills the Job columns from both. Job.save() and the importer
+call it, and 'manage.py normalize_jobs' backfills existing rows (run it again
+after editing the gazetteer).
+"""
+
+import csv
+import math
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+# The Job columns normalize_job() writes, for update_fields and bulk_update().
+NORMALIZED_FIELDS = ('salary_min', 'salary_max', 'salary_currency', 'salary_period', 'latitude', 'longitude')
+
+SALARY_PERIODS = ('hour', 'day', 'week', 'month', 'year')
+
+# Amounts above this are typos or not salaries at all ("call 0803 123 4567").
+MAX_SALARY = 10**9
+
+CURRENCY_CODES = frozenset(
+    'USD EUR GBP NGN GHS KES UGX TZS RWF ZAR EGP MAD XOF XAF ETB CAD AUD NZD INR JPY CNY CHF SEK NOK DKK AED SAR'.split()
+)
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '₦': 'NGN', '₵': 'GHS', '¥': 'JPY', '₹': 'INR'}
+CURRENCY_WORDS = {
+    'dollar': 'USD', 'dollars': 'USD', 'euro': 'EUR', 'euros': 'EUR', 'pound': 'GBP', 'pounds': 'GBP',
+    'naira': 'NGN', 'cedi': 'GHS', 'cedis': 'GHS', 'ksh': 'KES', 'kshs': 'KES', 'rand': 'ZAR',
+}
+
+_PERIOD_PATTERNS = [
+    ('hour', re.compile(r'\b(?:per\s+hour|an\s+hour|hourly|hour|hr|hrs|ph)\b|/\s*h\b')),
+    ('day', re.compile(r'\b(?:per\s+day|a\s+day|daily|day|pd)\b|/\s*d\b')),
+    ('week', re.compile(r'\b(?:per\s+week|a\s+week|weekly|week|wk|pw)\b')),
+    ('month', re.compile(r'\b(?:per\s+month|a\s+month|monthly|month|mo|mth|pcm)\b')),
+    ('year', re.compile(r'\b(?:per\s+(?:year|annum)|a\s+year|yearly|annually|annual|annum|year|yr|pa|p\.a)\b')),
+]
+# A number, with thousands separators ("1,200,000", "45.000", "1 200") or
+# decimals ("52.50"), then an optional k/m suffix.
+_AMOUNT_RE = re.compile(r'(\d{1,3}(?:[,.\s]\d{3})+(?:\.\d+)?|\d+(?:[.,]\d+)?)(?:\s*([km])\b)?')
+_WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+
+@dataclass(frozen=True)
+class SalaryRange:
+    minimum: int
+    maximum: int
+    currency: str
+    period: str
+
+
+def _parse_amount(digits, suffix):
+    digits = re.sub(r'\s', '', digits)
+    # "45.000" and "1.200.000" use dots as thousands separators; "52.50" doesn't.
+    if re.fullmatch(r'\d{1,3}(\.\d{3})+', digits):
+        digits = digits.replace('.', '')
+    # A lone comma followed by one or two digits is a decimal comma ("12,50").
+    elif re.fullmatch(r'\d+,\d{1,2}', digits):
+        digits = digits.replace(',', '.')
+    digits = digits.replace(',', '')
+    try:
+        amount = float(digits)
+    except ValueError:
+        return None
+    if suffix:
+        amount *= 1000 if suffix.lower() == 'k' else 1_000_000
+    return round(amount)
+
+
+def _guess_period(amount):
+    # Postings that don't say are read by size: 25 is hourly, 3,000 monthly, 60,000 yearly.
+    if amount < 300:
+        return 'hour'
+    if amount < 20_000:
+        return 'month'
+    return 'year'
+
+
+def parse_salary(text):
+    """Returns a SalaryRange for 'text', or None if it has no usable amount ("Competitive")."""
+    if not text:
+        return None
+    lowered = text.lower()
+    amounts = [_parse_amount(digits, suffix) for digits, suffix in _AMOUNT_RE.findall(lowered)]
+    amounts = [amount for amount in amounts if amount is not None and 0 < amount <= MAX_SALARY][:2]
+    if not amounts:
+        return None
+    # "50k-70k": a range. A single amount is both ends.
+    minimum, maximum = min(amounts), max(amounts)
+
+    # An ISO code or a currency's name beats a symbol: "CAD $50" is Canadian.
+    currency = next((
+        word.upper() if word.upper() in CURRENCY_CODES else CURRENCY_WORDS[word]
+        for word in _WORD_RE.findall(lowered) if word.upper() in CURRENCY_CODES or word in CURRENCY_WORDS
+    ), '')
+    if not currency:
+        currency = next((code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in text), '')
+
+    period = next((name for name, pattern in _PERIOD_PATTERNS if pattern.search(lowered)), None)
+    return SalaryRange(minimum, maximum, currency, period or _guess_period(maximum))
+
+
+def place_key(text):
+    """How place names are compared: lower case, no accents or punctuation."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer(path=GAZETTEER_PATH):
+    """Returns {place key: (name, country, latitude, longitude)} for every name and alias in the file."""
+    places = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            place = (row['name'], row['country'], float(row['latitude']), float(row['longitude']))
+            for name in [row['name'], *filter(None, row['aliases'].split('|'))]:
+                places.setdefault(place_key(name), place)
+    return places
+
+
+def resolve_location(text):
+    """
+    Returns (name, country, latitude, longitude) for a free-text location, or
+    None. The whole text is tried first, then each part split on commas,
+    slashes, dashes and brackets, left to right.
+    """
+    if not text:
+        return None
+    places = load_gazetteer()
+    place = places.get(place_key(text))
+    if place is None:
+        for part in re.split(r'[,/;|()\[\]]|\s[-–]\s', text):
+            place = places.get(place_key(part))
+            if place is not None:
+                break
+    return place
+
+
+def normalize_job(job):
+    """Fills the normalized salary and location columns of 'job'. Returns True if any changed."""
+    salary = parse_salary(job.salary)
+    place = resolve_location(job.location)
+    values = {
+        'salary_min': salary.minimum if salary else None,
+        'salary_max': salary.maximum if salary else None,
+        'salary_currency': salary.currency if salary else '',
+        'salary_period': salary.period if salary else '',
+        'latitude': place[2] if place else None,
+        'longitude': place[3] if place else None,
+    }
+    changed = any(getattr(job, name) != value for name, value in values.items())
+    for name, value in values.items():
+        setattr(job, name, value)
+    return changed
+
+
+# How many jobs 'manage.py normalize_jobs' reads and writes per transaction.
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill(batch_size=BACKFILL_BATCH_SIZE, using=DEFAULT_DB_ALIAS, on_batch=None):
+    """
+    Normalizes every existing job, a batch at a time in primary key order,
+    and writes only the rows whose columns changed. 'on_batch(seen, changed)'
+    is called after each batch. Returns (jobs seen, jobs changed).
+    """
+    from .models import Job
+    from . import cache as job_cache
+
+    seen = changed = 0
+    last_pk = 0
+    columns = ('pk', 'salary', 'location', *NORMALIZED_FIELDS)
+    quote = connections[using].ops.quote_name
+    update_sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(Job._meta.db_table),
+        ', '.join(f'{quote(Job._meta.get_field(name).column)} = %s' for name in NORMALIZED_FIELDS),
+        quote(Job._meta.pk.column),
+    )
+    while True:
+        jobs = list(
+            Job.objects.using(using).filter(pk__gt=last_pk).order_by('pk').only(*columns)[:batch_size]
+        )
+        if not jobs:
+            break
+        stale = [job for job in jobs if normalize_job(job)]
+        # One prepared UPDATE per row is much faster than bulk_update()'s big
+        # CASE expressions. updated_at stays: what visitors see hasn't changed.
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.executemany(update_sql, [
+                [getattr(job, name) for name in NORMALIZED_FIELDS] + [job.pk] for job in stale
+            ])
+        seen += len(jobs)
+        changed += len(stale)
+        last_pk = jobs[-1].pk
+        if on_batch:
+            on_batch(seen, changed)
+    if changed:
+        # Filtered listing pages may now hold different jobs.
+        job_cache.bump_catalog_version()
+    return seen, changed
+
+
+# Mean radius of the Earth, for turning kilometres into degrees.
+EARTH_RADIUS_KM = 6371.0088
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Returns (min_lat, max_lat, lon_ranges) around a point: every place within
+    radius_km lies inside it. lon_ranges holds one (min, max) pair, or two
+    when the box crosses the 180th meridian.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    # Near the poles the circle covers every longitude.
+    if min_lat <= -90 or max_lat >= 90:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude)))))
+    west, east = longitude - delta_lon, longitude + delta_lon
+    if west < -180:
+        return min_lat, max_lat, [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return min_lat, max_lat, [(west, 180.0), (-180.0, east - 360)]
+    return min_lat, max_lat, [(west, east)]
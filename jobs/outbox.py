@@ -0,0 +1,176 @@
+# Path: /jobs/outbox.py
+
+"""
+The status history and outbox of applications.
+
+Every status change appends a row to ApplicationStatusChange (the history)
+and one to ApplicationOutbox (the events still to handle), in the same
+transaction as the change itself. That is two INSERTs, whatever the change
+sets off later, so saving a status stays equally fast as more is hung on it.
+
+dispatch_outbox() ('manage.py dispatch_outbox') then handles the events in
+batches, in the order they were written:
+
+* it emails the applicant, over one mail connection per batch;
+* it drops the company's cached pipeline counts. The web process already
+  dropped its own copy after the commit; this reaches the other processes
+  when the cache is shared (Redis, Memcached).
+
+Delivery is at least once. An event is deleted only after it was handled, so
+a dispatcher that crashes half way sends some emails again on the next run.
+A failed email is retried later, with a growing delay. Until then the
+application's later events wait behind it, so an applicant never hears
+"rejected" before "in progress". Other applications carry on meanwhile. Run
+one dispatcher at a time.
+
+The applicant's dashboard counters (ApplicationSummary and
+ApplicationStatusCount) are not moved here. They are still written in the
+change's own transaction: the dashboard relies on them agreeing with the
+Application table, and deleting an application adjusts them at once.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import Application, ApplicationOutbox, ApplicationStatusChange
+from . import cache as job_cache
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 500
+# Delay before the first retry of a failed event. Each later one doubles it.
+RETRY_DELAY = timedelta(minutes=1)
+# After this many failed attempts an event is logged and dropped.
+MAX_ATTEMPTS = 8
+
+STATUS_LABELS = dict(Application.STATUS_CHOICES)
+
+
+def record_status_changes(changes, using=DEFAULT_DB_ALIAS):
+    """
+    Appends the history rows and outbox events for 'changes', a list of
+    (application id, previous status, new status). Call it inside the
+    transaction that changes the statuses.
+    """
+    if not changes:
+        return
+    now = timezone.now()
+    ApplicationStatusChange.objects.using(using).bulk_create([
+        ApplicationStatusChange(application_id=pk, from_status=old, to_status=new, changed_at=now)
+        for pk, old, new in changes
+    ])
+    ApplicationOutbox.objects.using(using).bulk_create([
+        ApplicationOutbox(application_id=pk, from_status=old, to_status=new, created_at=now, available_at=now)
+        for pk, old, new in changes
+    ])
+
+
+def status_email(username, email, job_title, company_name, status):
+    """The email telling an applicant their application for a job is now in 'status'."""
+    return EmailMessage(
+        f'Update on your application for {job_title}',
+        f'Hi {username},\n\n'
+        f'Your application for {job_title} at {company_name} is now '
+        f'"{STATUS_LABELS.get(status, status)}".\n\n'
+        f'Thanks,\nThe JobBoard Team',
+        None,
+        [email],
+    )
+
+
+def _applications(ids, using):
+    """{application id: (username, email, job title, company name, company id)} for the ones still there."""
+    rows = (
+        Application.objects.using(using).filter(pk__in=ids)
+        .values_list('pk', 'applicant__user__username', 'applicant__user__email',
+                     'job__title', 'job__company__name', 'job__company_id')
+    )
+    return {pk: rest for pk, *rest in rows}
+
+
+def _finish(done, failed, now, using):
+    """Deletes the handled events and pushes the failed ones back, in one transaction."""
+    with transaction.atomic(using=using):
+        ApplicationOutbox.objects.using(using).filter(pk__in=done).delete()
+        for event, error in failed:
+            event.attempts += 1
+            event.available_at = now + RETRY_DELAY * 2 ** (event.attempts - 1)
+            event.last_error = error
+            event.save(using=using, update_fields=['attempts', 'available_at', 'last_error'])
+
+
+def dispatch_batch(events, blocked, now, using=DEFAULT_DB_ALIAS):
+    """
+    Handles 'events' (ApplicationOutbox rows in id order). 'blocked' is the
+    set of applications with an earlier event still waiting, and is updated.
+    Returns a dict with 'done', 'sent', 'failed' and 'dropped' counts.
+    """
+    stats = {'done': 0, 'sent': 0, 'failed': 0, 'dropped': 0}
+    applications = _applications({event.application_id for event in events}, using)
+    done, failed, companies = [], [], set()
+    connection = None
+    try:
+        for event in events:
+            if event.application_id in blocked or event.available_at > now:
+                # Waits for an earlier event of the same application, or for its retry time.
+                blocked.add(event.application_id)
+                continue
+            application = applications.get(event.application_id)
+            if application is None:
+                # Deleted or archived since: nobody to tell.
+                done.append(event.pk)
+                continue
+            username, email, job_title, company_name, company_id = application
+            companies.add(company_id)
+            if email:
+                try:
+                    if connection is None:
+                        # One connection (one SMTP login) for the whole batch.
+                        connection = get_connection()
+                        connection.open()
+                    connection.send_messages([status_email(username, email, job_title, company_name, event.to_status)])
+                    stats['sent'] += 1
+                except Exception as error:
+                    if event.attempts + 1 < MAX_ATTEMPTS:
+                        failed.append((event, f"{type(error).__name__}: {error}"))
+                        blocked.add(event.application_id)
+                        stats['failed'] += 1
+                        continue
+                    logger.error("Dropping outbox event %s after %s attempts: %s", event.pk, MAX_ATTEMPTS, error)
+                    stats['dropped'] += 1
+            done.append(event.pk)
+    finally:
+        if connection is not None:
+            connection.close()
+    _finish(done, failed, now, using)
+    job_cache.forget_company_stats(*companies)
+    stats['done'] = len(done)
+    return stats
+
+
+def dispatch_outbox(batch_size=OUTBOX_BATCH_SIZE, using=DEFAULT_DB_ALIAS, now=None, on_batch=None):
+    """
+    Handles every due event in the outbox, oldest first. 'on_batch(stats)' is
+    called after each batch. Returns a dict with 'events' (looked at),
+    'done' (handled and deleted), 'sent', 'failed' (to be retried) and
+    'dropped' totals.
+    """
+    now = now or timezone.now()
+    totals = {'events': 0, 'done': 0, 'sent': 0, 'failed': 0, 'dropped': 0}
+    blocked = set()
+    last_id = 0
+    while True:
+        events = list(ApplicationOutbox.objects.using(using).filter(pk__gt=last_id).order_by('pk')[:batch_size])
+        if not events:
+            return totals
+        last_id = events[-1].pk
+        stats = dispatch_batch(events, blocked, now, using)
+        totals['events'] += len(events)
+        for key, value in stats.items():
+            totals[key] += value
+        if on_batch:
+            on_batch(totals)
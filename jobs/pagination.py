@@ -0,0 +1,81 @@
+# Path: /jobs/pagination.py
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+# How many job cards we show on a single page of the listing.
+JOB_LIST_PAGE_SIZE = 24
+
+
+def encode_cursor(obj, date_field='created_at'):
+    """
+    Turns the last row on a page into an opaque '?cursor=' value.
+    The cursor is just the (date, pk) pair of that row, base64 encoded.
+    """
+    raw = f"{getattr(obj, date_field).isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Turns a '?cursor=' value back into a (date, pk) pair.
+    Returns None if the cursor is missing or has been tampered with.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, pk = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _seek(queryset, cursor, date_field, ascending=False):
+    """Orders the queryset newest (or oldest) first and skips everything up to the cursor."""
+    if ascending:
+        queryset = queryset.order_by(date_field, 'pk')
+    else:
+        queryset = queryset.order_by(f'-{date_field}', '-pk')
+    position = decode_cursor(cursor)
+    if position is not None:
+        date, pk = position
+        after = 'gt' if ascending else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{after}': date}) | Q(**{date_field: date, f'pk__{after}': pk})
+        )
+    return queryset
+
+
+def _split_page(rows, page_size, date_field):
+    # We fetch one extra row so we know whether there is a next page.
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], date_field)
+    return rows, next_cursor
+
+
+def keyset_page(queryset, cursor, page_size=JOB_LIST_PAGE_SIZE, date_field='created_at', ascending=False):
+    """
+    Returns one page of rows that come *after* the given cursor, newest first
+    (oldest first with ascending=True), plus the cursor for the next page (or
+    None on the last page).
+
+    Unlike OFFSET pagination, the database seeks straight to the cursor using
+    an index on (date_field, pk), so page 10,000 costs the same as page 1 and
+    new rows being inserted never shift the pages underneath a reader.
+    """
+    queryset = _seek(queryset, cursor, date_field, ascending)
+    return _split_page(list(queryset[:page_size + 1]), page_size, date_field)
+
+
+async def akeyset_page(queryset, cursor, page_size=JOB_LIST_PAGE_SIZE, date_field='created_at', ascending=False):
+    """The async version of keyset_page(), for use in async views."""
+    queryset = _seek(queryset, cursor, date_field, ascending)
+    rows = [row async for row in queryset[:page_size + 1].aiterator()]
+    return _split_page(rows, page_size, date_field)
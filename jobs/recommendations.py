@@ -0,0 +1,274 @@
+# Path: /jobs/recommendations.py
+
+"""
+Precomputed "similar jobs" for the job detail page.
+
+Every active job is turned into a TF-IDF vector over the words of its title,
+description and location (title words count three times, location words
+twice). With the vectors scaled to length 1, the cosine similarity of two jobs
+is the dot product of their rows, so multiplying the matrix by its own
+transpose gives every pair's similarity at once.
+
+'manage.py build_recommendations' does that multiplication a block of rows at
+a time, keeps the top SIMILAR_JOBS_PER_JOB of each row and stores them as
+SimilarJob rows. Each block is at most MAX_BLOCK_CELLS similarities, so memory
+stays bounded however many jobs there are. The page then needs one indexed
+query (similar_jobs() below), and usually none since the result is cached.
+
+By default only "stale" jobs are recomputed: those edited or posted since
+their recommendations were stored. Their new scores are also merged into the
+lists of the jobs they should now appear in, or drop out of. Closed jobs are
+filtered out when the panel is read and cleaned up by the next '--full' run,
+which is worth scheduling nightly.
+
+NumPy and SciPy are only needed to build. Without them the site still works
+and the panel simply stays empty.
+"""
+
+import math
+import re
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Exists, Min, OuterRef
+from django.utils import timezone
+
+from .models import Job, SimilarJob
+from . import cache as job_cache
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # Optional: only 'manage.py build_recommendations' needs them.
+    np = sparse = None
+
+# How many neighbours are stored per job, and how many the page shows.
+SIMILAR_JOBS_PER_JOB = 10
+SIMILAR_JOBS_SHOWN = 3
+
+# How much a word in each field counts.
+FIELD_WEIGHTS = (('title', 3), ('description', 1), ('location', 2))
+
+# In a large catalog, a word used by more than this share of the jobs says
+# nothing about which ones are alike, and only makes the products denser.
+MAX_DOCUMENT_FREQUENCY = 0.5
+MIN_JOBS_FOR_MAX_DF = 1000
+
+# Upper bound on the similarities computed per block (rows x jobs). 25 million
+# float32 cells is 100 MB; the block size shrinks as the catalog grows.
+MAX_BLOCK_CELLS = 25_000_000
+
+# When more than this share of the jobs is stale, rebuilding everything is cheaper.
+FULL_REBUILD_SHARE = 0.5
+
+STOP_WORDS = frozenset('a an and are as at be by for from in is of on or our the to we with you your'.split())
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def available():
+    """True when NumPy and SciPy are installed."""
+    return np is not None
+
+
+def tokenize(text):
+    return [word for word in _TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS and len(word) > 1]
+
+
+def build_matrix(rows):
+    """
+    Turns (id, title, description, location) rows, ordered by id, into
+    (ids, matrix): a NumPy array of job ids and a CSR matrix with one L2
+    normalised TF-IDF row per job.
+    """
+    vocabulary = {}
+    ids, indices, data, indptr = array('q'), array('i'), array('f'), array('q', [0])
+    for pk, *fields in rows:
+        counts = Counter()
+        for text, (_, weight) in zip(fields, FIELD_WEIGHTS):
+            for word in tokenize(text or ''):
+                counts[vocabulary.setdefault(word, len(vocabulary))] += weight
+        ids.append(pk)
+        indices.extend(counts.keys())
+        # Sublinear term frequency: saying "python" ten times isn't ten times more relevant.
+        data.extend(1 + math.log(count) for count in counts.values())
+        indptr.append(len(indices))
+
+    ids = np.frombuffer(ids, dtype=np.int64) if ids else np.zeros(0, dtype=np.int64)
+    matrix = sparse.csr_matrix(
+        (np.frombuffer(data, dtype=np.float32) if data else np.zeros(0, dtype=np.float32),
+         np.frombuffer(indices, dtype=np.int32) if indices else np.zeros(0, dtype=np.int32),
+         np.frombuffer(indptr, dtype=np.int64)),
+        shape=(len(ids), len(vocabulary)),
+    )
+    count = len(ids)
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = (np.log((1 + count) / (1 + document_frequency)) + 1).astype(np.float32)
+    if count >= MIN_JOBS_FOR_MAX_DF:
+        idf[document_frequency > MAX_DOCUMENT_FREQUENCY * count] = 0
+    matrix = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags((1 / norms).astype(np.float32)) @ matrix
+    matrix.eliminate_zeros()
+    return ids, matrix.tocsr()
+
+
+def block_rows(job_count, chunk_size=None):
+    """How many rows to multiply at once so a block stays within MAX_BLOCK_CELLS."""
+    return chunk_size or max(1, min(2000, MAX_BLOCK_CELLS // max(job_count, 1)))
+
+
+def similarity_blocks(matrix, rows, chunk_size):
+    """Yields (rows, dense similarity block) for 'rows', a block at a time."""
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        # Sparse x dense writes straight into one dense (jobs x rows) array,
+        # without the sparse intermediate a sparse x sparse product builds
+        # when most jobs share a word or two. '.T' is a view, not a copy.
+        block = (matrix @ matrix[chunk].T.toarray()).T
+        # A job isn't similar to itself.
+        block[np.arange(len(chunk)), chunk] = 0
+        yield chunk, block
+
+
+def top_k(block, k, rows_at_once=128):
+    """Returns (columns, scores) of the k best scores of every row, best first."""
+    k = min(k, block.shape[1])
+    columns = np.zeros((block.shape[0], k), dtype=np.int64)
+    if k == 0:
+        return columns, np.zeros((block.shape[0], 0), dtype=block.dtype)
+    # argpartition returns an index for every cell; a few rows at a time keeps that small.
+    for start in range(0, block.shape[0], rows_at_once):
+        part = block[start:start + rows_at_once]
+        columns[start:start + rows_at_once] = np.argpartition(part, -k, axis=1)[:, -k:]
+    scores = np.take_along_axis(block, columns, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def stale_jobs(using=DEFAULT_DB_ALIAS):
+    """Active jobs posted or edited since their recommendations were stored."""
+    fresh = SimilarJob.objects.using(using).filter(job=OuterRef('pk'), built_at__gte=OuterRef('updated_at'))
+    return Job.objects.using(using).filter(is_active=True).exclude(Exists(fresh))
+
+
+def _write(lists, now, using):
+    """Replaces the stored lists of the given jobs. 'lists' maps job id -> [(similar id, score)]."""
+    with transaction.atomic(using=using):
+        SimilarJob.objects.using(using).filter(job_id__in=list(lists)).delete()
+        SimilarJob.objects.using(using).bulk_create([
+            SimilarJob(job_id=job_id, similar_id=similar_id, rank=rank, score=score, built_at=now)
+            for job_id, neighbours in lists.items()
+            for rank, (similar_id, score) in enumerate(neighbours)
+        ], batch_size=5000)
+
+
+def build_recommendations(full=False, k=SIMILAR_JOBS_PER_JOB, chunk_size=None, using=DEFAULT_DB_ALIAS, now=None):
+    """
+    Computes and stores the similar jobs of every stale job (every active job
+    with full=True). Returns a dict describing what was done.
+    """
+    if not available():
+        raise RuntimeError("Building recommendations needs NumPy and SciPy (pip install numpy scipy).")
+    started = time.perf_counter()
+    now = now or timezone.now()
+    if not full:
+        stale = np.fromiter(stale_jobs(using).values_list('pk', flat=True).iterator(), dtype=np.int64)
+        if not len(stale):
+            return {'mode': 'incremental', 'recomputed': 0, 'merged': 0,
+                    'seconds': round(time.perf_counter() - started, 2)}
+
+    rows = (
+        Job.objects.using(using).filter(is_active=True).order_by('pk')
+        .values_list('pk', *(name for name, _ in FIELD_WEIGHTS))
+        .iterator(chunk_size=2000)
+    )
+    ids, matrix = build_matrix(rows)
+    job_count = len(ids)
+
+    full = full or len(stale) > FULL_REBUILD_SHARE * job_count
+    if full:
+        targets = np.arange(job_count)
+    else:
+        # Jobs closed since 'stale' was read are no longer in the matrix.
+        targets = np.searchsorted(ids, np.sort(stale[np.isin(stale, ids)]))
+
+    # The score a job must beat to enter each full list (0 while a list has room).
+    threshold = np.zeros(job_count, dtype=np.float32)
+    if not full and len(targets):
+        lists = (SimilarJob.objects.using(using).values('job_id')
+                 .annotate(size=Count('pk'), lowest=Min('score')).filter(size__gte=k))
+        for row in lists.iterator():
+            position = np.searchsorted(ids, row['job_id'])
+            if position < job_count and ids[position] == row['job_id']:
+                threshold[position] = row['lowest']
+
+    chunk_size = block_rows(job_count, chunk_size)
+    # Fresh scores between a stale job and other jobs whose lists may change.
+    changes = defaultdict(dict)
+    for chunk, block in similarity_blocks(matrix, targets, chunk_size):
+        columns, scores = top_k(block, k)
+        _write({
+            int(ids[row]): [(int(ids[c]), float(s)) for c, s in zip(row_columns, row_scores) if s > 0]
+            for row, row_columns, row_scores in zip(chunk, columns, scores)
+        }, now, using)
+        if full:
+            continue
+        chunk_ids = ids[chunk]
+        # Jobs that already list one of these...
+        listed = SimilarJob.objects.using(using).filter(similar_id__in=chunk_ids.tolist()).values_list('job_id', 'similar_id')
+        for job_id, similar_id in listed.iterator():
+            i = np.searchsorted(chunk_ids, similar_id)
+            position = np.searchsorted(ids, job_id)
+            if position < job_count and ids[position] == job_id:
+                changes[job_id][similar_id] = float(block[i, position])
+        # ...and jobs these now beat the weakest entry of.
+        for i, position in zip(*np.nonzero(block > threshold)):
+            changes[int(ids[position])][int(chunk_ids[i])] = float(block[i, position])
+
+    # Merge the fresh scores into the lists of the jobs that weren't recomputed.
+    stale_ids = set(ids[targets].tolist())
+    affected = [job_id for job_id in changes if job_id not in stale_ids]
+    for start in range(0, len(affected), 5000):
+        batch = affected[start:start + 5000]
+        merged = defaultdict(dict)
+        stored = SimilarJob.objects.using(using).filter(job_id__in=batch).values_list('job_id', 'similar_id', 'score')
+        for job_id, similar_id, score in stored:
+            merged[job_id][similar_id] = score
+        for job_id in batch:
+            merged[job_id].update(changes[job_id])
+        _write({
+            job_id: sorted(((s, score) for s, score in neighbours.items() if score > 0), key=lambda p: -p[1])[:k]
+            for job_id, neighbours in merged.items()
+        }, now, using)
+
+    if full:
+        # Lists of jobs that closed since the last build.
+        SimilarJob.objects.using(using).exclude(job__is_active=True).delete()
+    # Only the panels showed the old lists; the listing pages stay cached.
+    job_cache.bump_similar_version()
+    return {
+        'mode': 'full' if full else 'incremental',
+        'recomputed': len(targets),
+        'merged': len(affected),
+        'vocabulary': matrix.shape[1],
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def similar_jobs(pk, limit=SIMILAR_JOBS_SHOWN):
+    """The stored similar jobs of job 'pk' that are still open, best first. Cached."""
+    key = job_cache.similar_jobs_key(pk)
+    jobs = cache.get(key)
+    if jobs is None:
+        rows = (
+            SimilarJob.objects.filter(job_id=pk, similar__is_active=True)
+            .select_related('similar__company')
+            .order_by('rank')[:limit]
+        )
+        jobs = [row.similar for row in rows]
+        cache.set(key, jobs, job_cache.cache_timeout())
+    return jobs
@@ -0,0 +1,189 @@
+# Path: /jobs/search.py
+
+"""
+Full-text search over job postings.
+
+On SQLite we keep an FTS5 virtual table ('jobs_job_fts') next to the 'jobs_job'
+table. Each row in it uses the job's id as its rowid and holds the title,
+description and location of an *active* job. The table is kept in sync by the
+signal handlers in jobs/signals.py and can be rebuilt in bulk with
+'manage.py rebuild_search_index'.
+
+On databases without FTS5 we fall back to a plain 'icontains' search, so the
+search page keeps working everywhere (just slower).
+"""
+
+import re
+
+from django.db import connections, DEFAULT_DB_ALIAS, OperationalError
+from django.db.models import Q
+
+from .models import Job
+
+FTS_TABLE = 'jobs_job_fts'
+
+# How much a match in each column is worth when ranking. A hit in the title
+# counts for much more than a hit somewhere in a long description.
+BM25_WEIGHTS = {'title': 10.0, 'description': 1.0, 'location': 5.0}
+
+# How many rows we write per INSERT when rebuilding the whole index.
+REBUILD_BATCH_SIZE = 5000
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available(using=DEFAULT_DB_ALIAS):
+    """Returns True if the given database can hold our FTS5 index."""
+    return connections[using].vendor == 'sqlite'
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS):
+    """Creates the FTS5 table if it doesn't exist yet. Safe to call repeatedly."""
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(title, description, location, tokenize='porter unicode61')"
+        )
+
+
+def index_job(job, using=DEFAULT_DB_ALIAS):
+    """Adds or refreshes a single job in the index. Inactive jobs are removed."""
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [job.pk])
+        if job.is_active:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)",
+                [job.pk, job.title, job.description, job.location],
+            )
+
+
+def index_jobs(jobs, using=DEFAULT_DB_ALIAS):
+    """Adds or refreshes many jobs at once, e.g. after a bulk import."""
+    if not fts_available(using) or not jobs:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[job.pk] for job in jobs])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)",
+            [[job.pk, job.title, job.description, job.location] for job in jobs if job.is_active],
+        )
+
+
+def remove_job(pk, using=DEFAULT_DB_ALIAS):
+    """Removes a single job from the index."""
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def remove_jobs(pks, using=DEFAULT_DB_ALIAS):
+    """Removes many jobs from the index at once."""
+    if not fts_available(using) or not pks:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[pk] for pk in pks])
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Throws the whole index away and fills it again from the 'jobs_job' table.
+    Jobs are streamed in batches so memory use stays flat however big the catalog is.
+    Returns the number of jobs indexed.
+    """
+    if not fts_available(using):
+        return 0
+    create_search_index(using)
+    rows = (
+        Job.objects.using(using).filter(is_active=True)
+        .values_list('pk', 'title', 'description', 'location')
+        .iterator(chunk_size=batch_size)
+    )
+    insert = f"INSERT INTO {FTS_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)"
+    total = 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(insert, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(insert, batch)
+            total += len(batch)
+        # Merge the b-tree segments left behind by all those inserts.
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def build_match_expression(query):
+    """
+    Turns free text typed by a user into a safe FTS5 MATCH expression.
+    Every word is quoted (so characters like '-' or '"' can't break the query
+    syntax) and all words must match. Returns '' if there is nothing to search for.
+    """
+    tokens = _TOKEN_RE.findall(query or '')
+    return ' '.join(f'"{token}"' for token in tokens)
+
+
+def search_jobs(query, job_type=None, location=None, company=None, limit=20, offset=0, using=DEFAULT_DB_ALIAS):
+    """
+    Returns a list of active jobs matching 'query', best match first.
+
+    'job_type' and 'company' (a Company primary key) are exact filters and
+    'location' is a case-insensitive substring filter. Each returned job has
+    its company already loaded.
+    """
+    match = build_match_expression(query)
+    if not match:
+        return []
+    if not fts_available(using):
+        return _fallback_search(query, job_type, location, company, limit, offset, using)
+
+    weights = ', '.join(str(BM25_WEIGHTS[column]) for column in ('title', 'description', 'location'))
+    sql = [
+        f"SELECT j.id FROM {FTS_TABLE} f JOIN {Job._meta.db_table} j ON j.id = f.rowid",
+        f"WHERE {FTS_TABLE} MATCH %s AND j.is_active",
+    ]
+    params = [match]
+    if job_type:
+        sql.append("AND j.job_type = %s")
+        params.append(job_type)
+    if location:
+        sql.append("AND j.location LIKE %s")
+        params.append(f'%{location}%')
+    if company:
+        sql.append("AND j.company_id = %s")
+        params.append(company)
+    sql.append(f"ORDER BY bm25({FTS_TABLE}, {weights}), j.id DESC LIMIT %s OFFSET %s")
+    params.extend([limit, offset])
+
+    try:
+        with connections[using].cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            ids = [row[0] for row in cursor.fetchall()]
+    except OperationalError:
+        # The FTS table hasn't been created yet (e.g. migrate never ran).
+        return _fallback_search(query, job_type, location, company, limit, offset, using)
+
+    jobs = Job.objects.using(using).select_related('company').in_bulk(ids)
+    return [jobs[pk] for pk in ids if pk in jobs]
+
+
+def _fallback_search(query, job_type, location, company, limit, offset, using):
+    jobs = Job.objects.using(using).filter(is_active=True).select_related('company')
+    for token in _TOKEN_RE.findall(query):
+        jobs = jobs.filter(Q(title__icontains=token) | Q(description__icontains=token) | Q(location__icontains=token))
+    if job_type:
+        jobs = jobs.filter(job_type=job_type)
+    if location:
+        jobs = jobs.filter(location__icontains=location)
+    if company:
+        jobs = jobs.filter(company_id=company)
+    return list(jobs.order_by('-created_at', '-id')[offset:offset + limit])
@@ -0,0 +1,59 @@
+# Path: /jobs/serializers.py
+
+# Plain functions that turn jobs into JSON-friendly dicts for the API views.
+
+
+def job_to_dict(job):
+    """Returns the public fields of a job. The company must already be loaded."""
+    return {
+        'id': job.pk,
+        'title': job.title,
+        'company': {'id': job.company.pk, 'name': job.company.name},
+        'location': job.location,
+        'job_type': job.job_type,
+        'salary': job.salary,
+        'description': job.description,
+        'is_active': job.is_active,
+        'created_at': job.created_at.isoformat(),
+        'updated_at': job.updated_at.isoformat(),
+    }
+
+
+def removed_job_to_dict(job):
+    """
+    What the changes feed says about an archived job (an ArchivedJob): only
+    that it is gone, so a copy kept in sync can drop it.
+    """
+    return {
+        'id': job.pk,
+        'is_active': False,
+        'removed': True,
+        'updated_at': job.updated_at.isoformat(),
+    }
+
+
+# The columns job_row_to_dict() needs, for use with .values_list().
+JOB_ROW_FIELDS = (
+    'id', 'title', 'company_id', 'company__name', 'location', 'job_type', 'salary',
+    'description', 'is_active', 'created_at', 'updated_at',
+)
+
+
+def job_row_to_dict(row):
+    """
+    Same as job_to_dict(), but for a tuple of JOB_ROW_FIELDS. Skipping model
+    instances makes this much faster for big exports.
+    """
+    pk, title, company_id, company_name, location, job_type, salary, description, is_active, created, updated = row
+    return {
+        'id': pk,
+        'title': title,
+        'company': {'id': company_id, 'name': company_name},
+        'location': location,
+        'job_type': job_type,
+        'salary': salary,
+        'description': description,
+        'is_active': is_active,
+        'created_at': created.isoformat(),
+        'updated_at': updated.isoformat(),
+    }
@@ -0,0 +1,66 @@
+# Path: /jobs/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Company
+from .models import Job, Application
+from . import search, summaries
+from . import cache as job_cache
+
+
+@receiver(post_save, sender=Job)
+def update_search_index(sender, instance, using, **kwargs):
+    """Keeps the full-text index in step with every saved job."""
+    search.index_job(instance, using=using)
+
+
+@receiver(post_delete, sender=Job)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    search.remove_job(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_job_cache(sender, instance, **kwargs):
+    job_cache.forget_jobs(instance.pk)
+    job_cache.bump_catalog_version()
+
+
+@receiver(post_save, sender=Company)
+def invalidate_company_jobs(sender, instance, created, using, **kwargs):
+    """
+    Job cards show the company name, so renaming a company bumps the version
+    of all of its jobs. This is one UPDATE and companies rarely change.
+    """
+    if created:
+        return
+    pks = list(Job.objects.using(using).filter(company=instance).values_list('pk', flat=True))
+    Job.objects.using(using).filter(pk__in=pks).update(updated_at=timezone.now())
+    job_cache.forget_jobs(*pks)
+    job_cache.bump_catalog_version()
+
+
+def create_search_index(sender, using, **kwargs):
+    """Creates the FTS table once 'migrate' has created the jobs tables."""
+    search.create_search_index(using=using)
+
+
+@receiver(post_save, sender=Job)
+def refresh_application_summaries(sender, instance, created, using, **kwargs):
+    """Job titles are copied into ApplicationSummary, so keep them current."""
+    if not created:
+        summaries.refresh_job(instance, using=using)
+
+
+@receiver(post_save, sender=Company)
+def refresh_company_summaries(sender, instance, created, using, **kwargs):
+    if not created:
+        summaries.refresh_company(instance, using=using)
+
+
+@receiver(post_delete, sender=Application)
+def update_status_counts(sender, instance, using, **kwargs):
+    summaries.forget_application(instance, using=using)
+
@@ -0,0 +1,56 @@
+# Path: /jobs/status.py
+
+"""
+Changing the status of many applications at once.
+
+Saving applications one by one costs several queries each. bulk_change_status()
+moves any number of them with a single UPDATE on the Application table, and
+then brings the dashboard read model up to date and records the changes in
+the history and outbox with a fixed number of statements, all in one
+transaction.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+
+from .models import Application, ApplicationSummary
+from .summaries import shift_status_counts
+from .outbox import record_status_changes
+from . import cache as job_cache
+
+# The statuses a company can move applications to in bulk from its dashboard.
+BULK_STATUSES = ('progress', 'rejected')
+
+
+def bulk_change_status(applications, status, using=DEFAULT_DB_ALIAS):
+    """
+    Moves every application in the 'applications' queryset to 'status'.
+    Returns the number of applications that actually changed.
+    """
+    with transaction.atomic(using=using):
+        changing = applications.using(using).exclude(status=status).select_for_update()
+        previous = list(changing.values_list('pk', 'status'))
+        if not previous:
+            return 0
+        ids = [pk for pk, _ in previous]
+        moved = (
+            Application.objects.using(using).filter(pk__in=ids)
+            .values_list('applicant_id', 'status', 'job__company_id')
+            .annotate(total=Count('pk'))
+            .order_by()
+        )
+        deltas = {}
+        company_ids = set()
+        for applicant_id, old_status, company_id, total in moved:
+            deltas[(applicant_id, old_status)] = deltas.get((applicant_id, old_status), 0) - total
+            deltas[(applicant_id, status)] = deltas.get((applicant_id, status), 0) + total
+            company_ids.add(company_id)
+
+        Application.objects.using(using).filter(pk__in=ids).update(status=status)
+        ApplicationSummary.objects.using(using).filter(application_id__in=ids).update(status=status)
+        shift_status_counts(deltas, using)
+        # Applicants are told about the change by the outbox dispatcher, not by us.
+        record_status_changes([(pk, old_status, status) for pk, old_status in previous], using=using)
+
+    job_cache.forget_company_stats(*company_ids)
+    return len(ids)
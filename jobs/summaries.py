@@ -0,0 +1,168 @@
+# Path: /jobs/summaries.py
+
+"""
+Keeps the applicant dashboard read model up to date.
+
+ApplicationSummary holds one flattened row per application and
+ApplicationStatusCount holds per-status counters. Both are written in the same
+transaction as the Application they describe (see Application.save() and the
+post_delete handler in jobs/signals.py). Whenever the counters change, the
+cached pipeline counts of the application's company are dropped as well.
+"""
+
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+
+from .models import Job, Application, ApplicationSummary, ApplicationStatusCount
+from . import cache as job_cache
+
+REBUILD_BATCH_SIZE = 2000
+# How many counters one statement of shift_status_counts() touches at most.
+SHIFT_BATCH_SIZE = 500
+
+
+def adjust_status_count(applicant_id, status, delta, using=DEFAULT_DB_ALIAS):
+    """Adds 'delta' to one of an applicant's status counters, creating it if needed."""
+    counts = ApplicationStatusCount.objects.using(using).filter(applicant_id=applicant_id, status=status)
+    if counts.update(count=F('count') + delta) or delta < 0:
+        # Nothing to decrement means the applicant is being deleted along with their counters.
+        return
+    # First application in this status. ignore_conflicts makes a concurrent
+    # insert of the same row harmless, then we apply our change on top.
+    ApplicationStatusCount.objects.using(using).bulk_create(
+        [ApplicationStatusCount(applicant_id=applicant_id, status=status, count=0)],
+        ignore_conflicts=True,
+    )
+    counts.update(count=F('count') + delta)
+
+
+def shift_status_counts(deltas, using=DEFAULT_DB_ALIAS):
+    """
+    Applies {(applicant_id, status): delta} to ApplicationStatusCount,
+    creating missing counters first.
+
+    Counters that move by the same amount in the same status share one
+    UPDATE ... WHERE applicant_id IN (...), so a bulk move of thousands of
+    applications is a handful of statements, each with a flat list of ids
+    (one OR-ed condition per counter gets too deep for SQLite past a few
+    hundred).
+    """
+    if not deltas:
+        return
+    ApplicationStatusCount.objects.using(using).bulk_create(
+        [ApplicationStatusCount(applicant_id=applicant_id, status=status, count=0)
+         for (applicant_id, status), delta in deltas.items() if delta > 0],
+        batch_size=SHIFT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    groups = defaultdict(list)
+    for (applicant_id, status), delta in deltas.items():
+        if delta:
+            groups[status, delta].append(applicant_id)
+    for (status, delta), applicant_ids in groups.items():
+        for start in range(0, len(applicant_ids), SHIFT_BATCH_SIZE):
+            ApplicationStatusCount.objects.using(using).filter(
+                applicant_id__in=applicant_ids[start:start + SHIFT_BATCH_SIZE], status=status,
+            ).update(count=F('count') + delta)
+
+
+def _company_id(application, using=DEFAULT_DB_ALIAS):
+    """The application's company id, from its job if that is loaded already, else from one small query."""
+    if Application.job.is_cached(application):
+        return application.job.company_id
+    return Job.objects.using(using).filter(pk=application.job_id).values_list('company_id', flat=True).first()
+
+
+def record_application(application, previous_status, using=DEFAULT_DB_ALIAS):
+    """
+    Called after an application is saved. 'previous_status' is the status it
+    had before the save, or None if it was just created.
+    """
+    if previous_status is None:
+        job = application.job
+        ApplicationSummary.objects.using(using).update_or_create(
+            application=application,
+            defaults={
+                'applicant_id': application.applicant_id,
+                'job': job,
+                'job_title': job.title,
+                'company_name': job.company.name,
+                'status': application.status,
+                'applied_at': application.applied_at,
+            },
+        )
+        adjust_status_count(application.applicant_id, application.status, 1, using)
+        job_cache.forget_company_stats(job.company_id)
+    elif previous_status != application.status:
+        ApplicationSummary.objects.using(using).filter(application=application).update(status=application.status)
+        adjust_status_count(application.applicant_id, previous_status, -1, using)
+        adjust_status_count(application.applicant_id, application.status, 1, using)
+        job_cache.forget_company_stats(_company_id(application, using))
+    # Otherwise the status didn't change, and neither did any counts.
+
+
+def forget_application(application, using=DEFAULT_DB_ALIAS):
+    """Called after an application is deleted. Its summary row goes with it (CASCADE)."""
+    adjust_status_count(application.applicant_id, application.status, -1, using)
+    job_cache.forget_company_stats(_company_id(application, using))
+
+
+def refresh_job(job, using=DEFAULT_DB_ALIAS):
+    """Copies a job's current title and company name into its summaries."""
+    ApplicationSummary.objects.using(using).filter(job=job).exclude(
+        job_title=job.title, company_name=job.company.name,
+    ).update(job_title=job.title, company_name=job.company.name)
+
+
+def refresh_job_titles(job_ids, using=DEFAULT_DB_ALIAS):
+    """Copies the current titles of many jobs into their summaries in one UPDATE."""
+    title = Job.objects.using(using).filter(pk=OuterRef('job_id')).values('title')[:1]
+    ApplicationSummary.objects.using(using).filter(job_id__in=job_ids).update(job_title=Subquery(title))
+
+
+def refresh_company(company, using=DEFAULT_DB_ALIAS):
+    """Copies a company's new name into the summaries of all its jobs."""
+    ApplicationSummary.objects.using(using).filter(job__company=company).exclude(
+        company_name=company.name,
+    ).update(company_name=company.name)
+
+
+def rebuild_summaries(using=DEFAULT_DB_ALIAS, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Rebuilds the whole read model from the Application table, e.g. after a
+    bulk import that bypassed Application.save(). Returns the number of rows written.
+    """
+    applications = (
+        Application.objects.using(using)
+        .values_list('pk', 'applicant_id', 'job_id', 'job__title', 'job__company__name', 'status', 'applied_at')
+        .iterator(chunk_size=batch_size)
+    )
+    total = 0
+    with transaction.atomic(using=using):
+        ApplicationSummary.objects.using(using).all().delete()
+        ApplicationStatusCount.objects.using(using).all().delete()
+        batch = []
+        for pk, applicant_id, job_id, title, company_name, status, applied_at in applications:
+            batch.append(ApplicationSummary(
+                application_id=pk, applicant_id=applicant_id, job_id=job_id, job_title=title,
+                company_name=company_name, status=status, applied_at=applied_at,
+            ))
+            if len(batch) >= batch_size:
+                ApplicationSummary.objects.using(using).bulk_create(batch)
+                total += len(batch)
+                batch = []
+        ApplicationSummary.objects.using(using).bulk_create(batch)
+        total += len(batch)
+
+        counts = (
+            Application.objects.using(using).values('applicant_id', 'status')
+            .annotate(total=Count('pk')).order_by()
+        )
+        ApplicationStatusCount.objects.using(using).bulk_create(
+            [ApplicationStatusCount(applicant_id=row['applicant_id'], status=row['status'], count=row['total'])
+             for row in counts.iterator()],
+            batch_size=batch_size,
+        )
+    return total
@@ -1,3 +1,1341 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User, Company, Applicant, CVBlob
+from benchmarks.seed import seed_database
+from benchmarks.suite import QUERY_BUDGETS, build_pages, count_queries
+from job_board import admin_paging, perf
+from job_board.middleware import PIN_COOKIE, PerformanceMiddleware, ReplicaRoutingMiddleware
+from job_board.routers import PrimaryReplicaRouter
+from .applications import apply_to_job
+from .archive import ARCHIVED_RELATIONS, archive_batch
+from . import alerts, outbox, recommendations, zipstream
+from . import cache as job_cache
+from .exports import ApplicationExport
+from .filters import parse_job_filters
+from .models import (
+    Job, Application, ApplicationOutbox, ApplicationStatusChange, ApplicationStatusCount, ApplicationSummary,
+    ArchivedApplication, ArchivedJob, SavedSearch, SavedSearchMatch, SimilarJob,
+)
+from .normalize import SalaryRange, parse_salary, resolve_location
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .search import rebuild_search_index, search_jobs
+
+
+def make_company(username='acme', name='Acme'):
+    user = User.objects.create_user(username=username, password='pass12345', user_type='company')
+    return Company.objects.create(user=user, name=name)
+
+
+def make_jobs(company, count, **kwargs):
+    now = timezone.now()
+    jobs = Job.objects.bulk_create([
+        Job(company=company, title=f'Job {i}', description='Write code.', location='Lagos', **kwargs)
+        for i in range(count)
+    ])
+    # bulk_create fills created_at with the same timestamp, spread them out a bit.
+    for i, job in enumerate(jobs):
+        Job.objects.filter(pk=job.pk).update(created_at=now - timedelta(minutes=i))
+    return jobs
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.company = make_company()
+
+    def test_cursor_round_trip(self):
+        job = make_jobs(self.company, 1)[0]
+        job.refresh_from_db()
+        self.assertEqual(decode_cursor(encode_cursor(job)), (job.created_at, job.pk))
+
+    def test_bad_cursor_is_ignored(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertIsNone(decode_cursor(''))
+
+    def test_pages_cover_every_job_once(self):
+        make_jobs(self.company, 7)
+        seen, cursor = [], None
+        while True:
+            page, cursor = keyset_page(Job.objects.all(), cursor, page_size=3)
+            seen.extend(job.pk for job in page)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(Job.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_ties_on_created_at_are_broken_by_id(self):
+        jobs = make_jobs(self.company, 4)
+        Job.objects.update(created_at=timezone.now())
+        first, cursor = keyset_page(Job.objects.all(), None, page_size=2)
+        second, cursor = keyset_page(Job.objects.all(), cursor, page_size=2)
+        self.assertIsNone(cursor)
+        self.assertEqual([j.pk for j in first + second], sorted((j.pk for j in jobs), reverse=True))
+
+    def test_new_jobs_do_not_shift_next_page(self):
+        make_jobs(self.company, 4)
+        first, cursor = keyset_page(Job.objects.all(), None, page_size=2)
+        Job.objects.create(company=self.company, title='Fresh', description='New.', location='Abuja')
+        second, _ = keyset_page(Job.objects.all(), cursor, page_size=2)
+        self.assertTrue(set(j.pk for j in first).isdisjoint(j.pk for j in second))
+        self.assertNotIn('Fresh', [j.title for j in second])
+
+
+class JobListViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_listing_runs_a_single_query(self):
+        company = make_company()
+        make_jobs(company, 5)
+        make_jobs(make_company('globex', 'Globex'), 5)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('job_list'))
+        self.assertContains(response, 'Globex')
+
+    def test_inactive_jobs_are_hidden(self):
+        make_jobs(make_company(), 1, is_active=False)
+        response = self.client.get(reverse('job_list'))
+        self.assertContains(response, 'No jobs posted yet.')
+
+
+class NormalizeTests(TestCase):
+    def test_salary_text_is_parsed(self):
+        self.assertEqual(parse_salary('$50,000 - $70,000 a year'), SalaryRange(50000, 70000, 'USD', 'year'))
+        self.assertEqual(parse_salary('NGN 250k/month'), SalaryRange(250000, 250000, 'NGN', 'month'))
+        self.assertEqual(parse_salary('€45.000'), SalaryRange(45000, 45000, 'EUR', 'year'))
+        self.assertEqual(parse_salary('25 per hour'), SalaryRange(25, 25, '', 'hour'))
+        self.assertIsNone(parse_salary('Competitive'))
+
+    def test_locations_resolve_from_the_gazetteer(self):
+        self.assertEqual(resolve_location('Lagos, Nigeria')[:2], ('Lagos', 'NG'))
+        self.assertEqual(resolve_location('Remote (São Paulo)')[0], 'Sao Paulo')
+        self.assertEqual(resolve_location('NYC')[0], 'New York')
+        self.assertIsNone(resolve_location('Remote'))
+
+    def test_columns_follow_the_text_on_save(self):
+        job = Job.objects.create(company=make_company(), title='Cook', description='Cook.',
+                                 location='Nairobi', salary='KES 80,000 monthly')
+        job.refresh_from_db()
+        self.assertEqual((job.salary_min, job.salary_currency, job.salary_period), (80000, 'KES', 'month'))
+        self.assertAlmostEqual(job.latitude, -1.2921)
+        job.location, job.salary = 'Atlantis', ''
+        job.save(update_fields=['location', 'salary'])
+        job.refresh_from_db()
+        self.assertEqual((job.latitude, job.salary_min, job.salary_period), (None, None, ''))
+
+    def test_backfill_only_writes_changed_rows(self):
+        make_jobs(make_company(), 3, salary='30k-40k a year')
+        self.assertEqual(Job.objects.filter(latitude__isnull=True).count(), 3)
+        out = StringIO()
+        call_command('normalize_jobs', batch_size=2, stdout=out)
+        self.assertIn('Normalized 3 jobs (3 updated)', out.getvalue())
+        self.assertEqual(Job.objects.filter(latitude__isnull=False, salary_max=40000).count(), 3)
+        call_command('normalize_jobs', stdout=out)
+        self.assertIn('Normalized 3 jobs (0 updated)', out.getvalue())
+
+
+class JobFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        company = make_company()
+        self.lagos = Job.objects.create(company=company, title='Lagos Dev', description='.',
+                                        location='Lagos', salary='$60,000 - $80,000 a year')
+        self.ibadan = Job.objects.create(company=company, title='Ibadan Dev', description='.',
+                                         location='Ibadan, Nigeria', salary='$30,000 a year')
+        self.london = Job.objects.create(company=company, title='London Dev', description='.',
+                                         location='London', salary='£90k per annum')
+
+    def titles(self, **params):
+        response = self.client.get(reverse('job_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(job.title for job in response.context['jobs'])
+
+    def test_radius_filter(self):
+        # Ibadan is about 110 km from Lagos.
+        self.assertEqual(self.titles(near='Lagos', radius=50), ['Lagos Dev'])
+        self.assertEqual(self.titles(near='Lagos', radius=250), ['Ibadan Dev', 'Lagos Dev'])
+        self.assertEqual(self.titles(lat='51.5', lng='-0.1'), ['London Dev'])
+
+    def test_salary_filters_match_overlapping_ranges(self):
+        self.assertEqual(self.titles(salary_min=70000), ['Lagos Dev', 'London Dev'])
+        self.assertEqual(self.titles(salary_min=70000, currency='usd'), ['Lagos Dev'])
+        self.assertEqual(self.titles(salary_max=40000), ['Ibadan Dev'])
+        self.assertEqual(self.titles(salary_min=1, period='hour'), [])
+
+    def test_filters_combine_and_page_with_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.titles(near='Lagos', radius=250, salary_min=50000), ['Lagos Dev'])
+
+    def test_unreadable_parameters_are_ignored(self):
+        self.assertEqual(parse_job_filters({'salary_min': 'lots', 'lat': 'nan', 'lng': '3'}), {})
+        response = self.client.get(reverse('job_list'), {'near': 'Atlantis'})
+        self.assertEqual(len(response.context['jobs']), 3)
+        self.assertContains(response, 'We couldn\'t find "Atlantis"')
+
+    def test_filtered_pages_are_cached_separately(self):
+        self.assertEqual(len(self.titles()), 3)
+        self.assertEqual(self.titles(near='London'), ['London Dev'])
+        self.assertEqual(len(self.titles()), 3)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.acme = make_company()
+        self.globex = make_company('globex', 'Globex')
+        self.python = Job.objects.create(company=self.acme, title='Python Developer',
+                                         description='Build APIs with Django.', location='Lagos')
+        self.mention = Job.objects.create(company=self.globex, title='Office Manager',
+                                          description='Our python team needs snacks.', location='Nairobi',
+                                          job_type='Part-Time')
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(search_jobs('python'), [self.python, self.mention])
+
+    def test_filters(self):
+        self.assertEqual(search_jobs('python', job_type='Part-Time'), [self.mention])
+        self.assertEqual(search_jobs('python', location='lagos'), [self.python])
+        self.assertEqual(search_jobs('python', company=self.globex.pk), [self.mention])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.python.title = 'Rust Developer'
+        self.python.save()
+        self.assertEqual(search_jobs('rust'), [self.python])
+        self.python.is_active = False
+        self.python.save()
+        self.assertEqual(search_jobs('rust'), [])
+        self.mention.delete()
+        self.assertEqual(search_jobs('python'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(search_jobs('"python* -('), [self.python, self.mention])
+        self.assertEqual(search_jobs('  '), [])
+
+    def test_rebuild_picks_up_bulk_inserts(self):
+        make_jobs(self.acme, 3)
+        self.assertEqual(search_jobs('code'), [])
+        self.assertEqual(rebuild_search_index(), 5)
+        self.assertEqual(len(search_jobs('code')), 3)
+
+    def test_search_view(self):
+        cache.clear()
+        response = self.client.get(reverse('job_search'), {'q': 'django'})
+        self.assertContains(response, 'Python Developer')
+        self.assertNotContains(response, 'Office Manager')
+        # A company that isn't an id is ignored, with or without the FTS index.
+        for fts in (True, False):
+            with mock.patch('jobs.search.fts_available', return_value=fts):
+                response = self.client.get(reverse('job_search'), {'q': 'python', 'company': 'acme'})
+            self.assertContains(response, 'Office Manager')
+
+
+class JobCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = make_company()
+        self.job = Job.objects.create(company=self.company, title='Cached Job',
+                                      description='Stays warm.', location='Lagos')
+
+    def test_listing_is_served_from_cache_until_a_job_changes(self):
+        self.client.get(reverse('job_list'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('job_list'))
+        self.job.title = 'Renamed Job'
+        self.job.save()
+        response = self.client.get(reverse('job_list'))
+        self.assertContains(response, 'Renamed Job')
+
+    def test_company_rename_refreshes_cards(self):
+        self.client.get(reverse('job_list'))
+        self.company.name = 'Acme Worldwide'
+        self.company.save()
+        self.assertContains(self.client.get(reverse('job_list')), 'Acme Worldwide')
+        self.assertContains(self.client.get(reverse('job_detail', args=[self.job.pk])), 'Acme Worldwide')
+
+    def test_job_list_conditional_get(self):
+        response = self.client.get(reverse('job_list'))
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(self.client.get(reverse('job_list'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Job.objects.create(company=self.company, title='Another', description='x', location='Abuja')
+        self.assertEqual(self.client.get(reverse('job_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_job_detail_conditional_get(self):
+        url = reverse('job_detail', args=[self.job.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.job.description = 'Changed.'
+        self.job.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Changed.')
+
+    def test_deactivated_job_is_not_served_from_cache(self):
+        url = reverse('job_detail', args=[self.job.pk])
+        self.client.get(url)
+        self.job.is_active = False
+        self.job.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ImportJobsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.acme = make_company()
+        self.globex = make_company('globex', 'Globex')
+
+    def write_feed(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as feed:
+            feed.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_jobs', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_and_rerun(self):
+        path = self.write_feed('.csv', (
+            "external_id,company,title,description,location,salary\n"
+            "A1,acme,Welder,Weld things.,Lagos,\n"
+            "G1,globex,Chef,Cook things.,Accra,1000 USD\n"
+            "X1,nobody,Ghost,Boo.,Nowhere,\n"
+        ))
+        out, err = self.run_import(path)
+        self.assertIn('2 created', out)
+        self.assertIn("unknown company 'nobody'", err)
+        chef = Job.objects.get(external_id='G1')
+        self.assertEqual((chef.company, chef.salary), (self.globex, '1000 USD'))
+        self.assertEqual(search_jobs('welder')[0].external_id, 'A1')
+
+        out, _ = self.run_import(path)
+        self.assertIn('0 created, 0 updated, 2 unchanged', out)
+
+    def test_changed_rows_are_updated_in_place(self):
+        self.run_import(self.write_feed('.jsonl', json.dumps(
+            {'external_id': 'A1', 'title': 'Welder', 'description': 'Weld.', 'location': 'Lagos'}) + '\n'
+        ), '--company', 'acme')
+        job = Job.objects.get()
+        out, _ = self.run_import(self.write_feed('.jsonl', json.dumps(
+            {'external_id': 'A1', 'title': 'Senior Welder', 'description': 'Weld.', 'location': 'Lagos'}) + '\n'
+            + 'not json\n'
+        ), '--company', 'acme')
+        self.assertIn('1 updated', out)
+        self.assertEqual(Job.objects.get().pk, job.pk)
+        self.assertEqual(Job.objects.get().title, 'Senior Welder')
+        self.assertEqual(search_jobs('senior')[0].pk, job.pk)
+
+    def test_rows_without_external_id_are_matched_by_content(self):
+        path = self.write_feed('.csv', (
+            "title,description,location\n"
+            "Cook,Cook.,Lagos\n"
+            "Cook,Cook.,Lagos\n"
+        ))
+        out, _ = self.run_import(path, '--company', 'acme')
+        self.assertIn('1 created', out)
+        self.assertIn('1 duplicates', out)
+        out, _ = self.run_import(path, '--company', 'acme')
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_saved_jobs_get_a_content_hash(self):
+        job = Job.objects.create(company=self.acme, title='Cook', description='Cook.', location='Lagos')
+        self.assertEqual(job.content_hash, job.compute_content_hash())
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = make_company()
+        self.job = Job.objects.create(company=self.company, title='Async Job', description='Await.', location='Lagos')
+
+    def test_views_under_wsgi(self):
+        self.assertContains(self.client.get(reverse('job_list_async')), 'Async Job')
+        self.assertContains(self.client.get(reverse('job_detail_async', args=[self.job.pk])), 'Await.')
+        self.assertEqual(self.client.get(reverse('job_detail_async', args=[0])).status_code, 404)
+
+    async def test_views_under_asgi(self):
+        response = await self.async_client.get(reverse('job_list_async'))
+        self.assertContains(response, 'Async Job')
+        etag = response['ETag']
+        response = await self.async_client.get(reverse('job_list_async'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(reverse('job_detail_async', args=[self.job.pk]))
+        self.assertContains(response, 'Await.')
+
+    async def test_logged_in_user_is_shown(self):
+        await self.async_client.aforce_login(self.company.user)
+        response = await self.async_client.get(reverse('job_list_async'))
+        self.assertContains(response, 'Welcome, acme!')
+
+    async def test_json_listing(self):
+        response = await self.async_client.get(reverse('job_api_list'))
+        data = response.json()
+        self.assertEqual(data['next'], None)
+        self.assertEqual(data['results'][0]['title'], 'Async Job')
+        self.assertEqual(data['results'][0]['company']['name'], 'Acme')
+
+    def test_sync_and_async_pages_share_etags(self):
+        sync_etag = self.client.get(reverse('job_detail', args=[self.job.pk]))['ETag']
+        async_etag = self.client.get(reverse('job_detail_async', args=[self.job.pk]))['ETag']
+        self.assertEqual(sync_etag, async_etag)
+
+
+class ApplyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.job = Job.objects.create(company=make_company(), title='Apply Job', description='.', location='Lagos')
+        user = User.objects.create_user(username='ada', password='pass12345', user_type='applicant')
+        Applicant.objects.create(user=user)
+        self.client.force_login(user)
+        self.url = reverse('apply_for_job', args=[self.job.pk])
+
+    def apply(self, key=None, **extra):
+        headers = {'accept': 'application/json'}
+        if key:
+            headers['idempotency-key'] = key
+        return self.client.post(self.url, headers=headers, **extra)
+
+    def test_apply_then_duplicate(self):
+        response = self.client.post(self.url, follow=True)
+        self.assertContains(response, 'submitted successfully')
+        response = self.client.post(self.url, follow=True)
+        self.assertContains(response, 'already applied')
+        self.assertEqual(Application.objects.count(), 1)
+        self.assertEqual(ApplicationStatusCount.objects.get().count, 1)
+
+    def test_json_mode_and_idempotent_retries(self):
+        first = self.apply('key-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()['outcome'], 'created')
+        retry = self.apply('key-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json()['application'], first.json()['application'])
+        self.assertEqual(self.apply('key-2').status_code, 409)
+        self.assertEqual(self.apply().status_code, 409)
+
+    def test_key_reused_for_another_job(self):
+        other = Job.objects.create(company=self.job.company, title='Other', description='.', location='Lagos')
+        self.apply('key-1')
+        response = self.client.post(
+            reverse('apply_for_job', args=[other.pk]), headers={'accept': 'application/json', 'idempotency-key': 'key-1'},
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Application.objects.filter(job=other).exists())
+
+    def test_inactive_jobs_and_companies_are_refused(self):
+        self.job.is_active = False
+        self.job.save()
+        self.assertEqual(self.apply().status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+        self.job.is_active = True
+        self.job.save()
+        self.client.force_login(self.job.company.user)
+        self.assertEqual(self.apply().status_code, 403)
+        self.assertFalse(Application.objects.exists())
+
+    def test_a_job_closed_after_it_was_cached_is_refused(self):
+        self.assertEqual(self.client.get(reverse('job_detail', args=[self.job.pk])).status_code, 200)
+        # Closed and archived behind the cache's back, e.g. by another process.
+        Job.objects.filter(pk=self.job.pk).update(is_active=False)
+        self.assertEqual(self.apply().status_code, 404)
+        Job.objects.filter(pk=self.job.pk).delete()
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+        self.assertFalse(Application.objects.exists())
+
+    def test_get_is_not_an_application(self):
+        self.assertRedirects(self.client.get(self.url), reverse('job_detail', args=[self.job.pk]))
+        self.assertEqual(self.client.get(self.url, {'format': 'json'}).status_code, 405)
+
+
+class ConcurrentApplyTests(TransactionTestCase):
+    def test_simultaneous_applies_create_one_application(self):
+        job = Job.objects.create(company=make_company(), title='Busy Job', description='.', location='Lagos')
+        user = User.objects.create_user(username='ada', password='pass12345', user_type='applicant')
+        Applicant.objects.create(user=user)
+        outcomes = []
+        start = threading.Barrier(8)
+
+        def worker():
+            start.wait()
+            try:
+                while True:
+                    try:
+                        outcomes.append(apply_to_job(job.pk, user.pk, 'same-key')[1])
+                        return
+                    except OperationalError:
+                        # The in-memory test database reports a locked table
+                        # straight away instead of waiting, so just try again.
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), ['created'] + ['replayed'] * 7)
+        self.assertEqual(Application.objects.count(), 1)
+        self.assertEqual(ApplicationStatusCount.objects.get().count, 1)
+
+
+class ApplyWithoutProfileTests(TransactionTestCase):
+    # The missing profile shows up as a foreign key error, which is only
+    # checked when a real transaction commits.
+    def test_applicant_without_a_profile(self):
+        job = Job.objects.create(company=make_company(), title='Apply Job', description='.', location='Lagos')
+        user = User.objects.create_user(username='ada', password='pass12345', user_type='applicant')
+        self.client.force_login(user)
+        response = self.client.post(reverse('apply_for_job', args=[job.pk]), headers={'accept': 'application/json'})
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('no applicant profile', response.json()['error'])
+        self.assertFalse(Application.objects.exists())
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, request, write=False):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Job))
+            if write:
+                self.router.db_for_write(Job)
+                seen.append(self.router.db_for_read(Job))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Job), 'default')
+        self.assertEqual(self.router.db_for_write(Job), 'default')
+
+    def test_get_requests_read_from_the_replica_until_they_write(self):
+        seen, response = self.run_request(self.factory.get('/'))
+        self.assertEqual(seen, ['replica'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        seen, response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(seen, ['replica', 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_posts_and_pinned_browsers_use_the_primary(self):
+        seen, response = self.run_request(self.factory.post('/'))
+        self.assertEqual(seen, ['default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.run_request(request)[0], ['default'])
+        self.assertEqual(self.router.db_for_read(Job), 'default')
+
+
+class QueryBudgetTests(TestCase):
+    def test_hot_pages_stay_within_their_query_budgets(self):
+        cache.clear()
+        out = StringIO()
+        call_command('seed_benchmark', jobs=60, applicants=3, applications_per_applicant=2, stdout=out)
+        self.assertIn('Created 60 jobs', out.getvalue())
+        self.assertEqual(Application.objects.count(), 6)
+        for name, request_page in build_pages().items():
+            with self.subTest(page=name):
+                self.assertLessEqual(count_queries(request_page), QUERY_BUDGETS[name])
+
+
+@override_settings(PERF_SAMPLE_RATE=1.0)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        perf.reset_stats()
+        make_jobs(make_company(), 3)
+
+    def test_server_timing_header(self):
+        with override_settings(DEBUG=True):
+            timing = self.client.get(reverse('job_list'))['Server-Timing']
+        self.assertIn('desc="1 queries"', timing)
+        # Without DEBUG, visitors don't get it.
+        self.assertFalse(self.client.get(reverse('job_list')).has_header('Server-Timing'))
+
+        staff = User.objects.create_user(username='ops', password='pass12345', is_staff=True)
+        self.client.force_login(staff)
+        timing = dict(
+            part.split(';dur=')[0:2] for part in self.client.get(reverse('job_list'))['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timing), {'db', 'session', 'tpl', 'total'})
+        # The page was rendered through TimedDjangoTemplates.
+        self.assertGreater(float(timing['tpl']), 0)
+
+    def test_session_queries_are_told_apart(self):
+        from django.contrib.sessions.models import Session
+
+        perf.install()
+        token = perf.start()
+        try:
+            Session.objects.filter(session_key='missing').exists()
+            Job.objects.exists()
+        finally:
+            profile = perf.finish(token)
+        self.assertEqual(profile.sql_count, 2)
+        self.assertGreater(profile.session_ms, 0)
+        self.assertLess(profile.session_ms, profile.sql_ms)
+
+    def test_repeated_queries_are_logged(self):
+        def view(request):
+            for job in Job.objects.all():
+                job.company.name  # One query per job: an N+1.
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        with override_settings(PERF_DUPLICATE_QUERY_THRESHOLD=3), self.assertLogs('job_board.perf') as logs:
+            PerformanceMiddleware(view)(request)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'repeated_queries')
+        self.assertEqual(record['repeated_queries'][0]['count'], 3)
+
+    def test_percentiles_are_staff_only(self):
+        for _ in range(3):
+            self.client.get(reverse('job_list'))
+        self.assertEqual(self.client.get(reverse('perf_stats')).status_code, 302)
+        staff = User.objects.create_user(username='ops', password='pass12345', is_staff=True)
+        self.client.force_login(staff)
+        stats = self.client.get(reverse('perf_stats')).json()['urls']
+        self.assertEqual(stats['job_list']['count'], 3)
+        self.assertLessEqual(stats['job_list']['p50_ms'], stats['job_list']['p99_ms'])
+
+    def test_disabled_or_unsampled(self):
+        with override_settings(PERF_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                PerformanceMiddleware(lambda request: HttpResponse())
+        with override_settings(PERF_SAMPLE_RATE=0):
+            response = PerformanceMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class JobFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = make_company()
+        self.jobs = make_jobs(self.company, 5, job_type='Contract')
+
+    def test_list_filters_and_detail(self):
+        Job.objects.filter(pk=self.jobs[0].pk).update(job_type='Internship')
+        data = self.client.get(reverse('job_api_list'), {'job_type': 'Contract'}).json()
+        self.assertEqual(len(data['results']), 4)
+        response = self.client.get(reverse('job_api_detail', args=[self.jobs[1].pk]))
+        self.assertEqual(response.json()['title'], 'Job 1')
+        not_modified = self.client.get(
+            reverse('job_api_detail', args=[self.jobs[1].pk]), headers={'if-none-match': response['ETag']},
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_feed(self):
+        start = timezone.now() - timedelta(days=1)
+        seen = []
+        since = start.isoformat()
+        with mock.patch('jobs.async_views.API_PAGE_SIZE', 2):
+            while True:
+                data = self.client.get(reverse('job_api_list'), {'since': since}).json()
+                since = data['next']
+                if not data['results']:
+                    break
+                seen.extend(job['id'] for job in data['results'])
+            self.assertCountEqual(seen, [job.pk for job in self.jobs])
+
+            # A later change shows up from the saved position, deactivations included.
+            job = self.jobs[2]
+            job.is_active = False
+            job.save()
+            results = self.client.get(reverse('job_api_list'), {'since': since}).json()['results']
+        self.assertEqual([(r['id'], r['is_active']) for r in results], [(job.pk, False)])
+        self.assertEqual(self.client.get(reverse('job_api_list'), {'since': 'yesterday'}).status_code, 400)
+
+    def test_changes_feed_reports_archived_jobs(self):
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        job = self.jobs[1]
+        job.is_active = False
+        job.save()
+        archive_batch([job.pk])
+        with mock.patch('jobs.async_views.API_PAGE_SIZE', 2):
+            results = []
+            while True:
+                data = self.client.get(reverse('job_api_list'), {'since': since}).json()
+                if not data['results']:
+                    break
+                results.extend(data['results'])
+                since = data['next']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[-1], {'id': job.pk, 'is_active': False, 'removed': True,
+                                       'updated_at': results[-1]['updated_at']})
+
+    def read_export(self, **kwargs):
+        response = self.client.get(reverse('job_export'), **kwargs)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_export_formats(self):
+        response, body = self.read_export()
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([line['id'] for line in lines], [job.pk for job in self.jobs])
+        self.assertEqual(lines[0]['company']['name'], 'Acme')
+
+        response, body = self.read_export(data={'format': 'json'})
+        self.assertEqual(len(json.loads(body)), 5)
+
+        response, body = self.read_export(headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(gzip.decompress(body).splitlines()), 5)
+
+    async def test_export_is_streamed_under_asgi(self):
+        response = await self.async_client.get(reverse('job_export'), {'format': 'json'},
+                                               headers={'accept-encoding': 'gzip'})
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response])
+        self.assertEqual(len(json.loads(gzip.decompress(body))), 5)
+
+    def test_export_etag_follows_the_catalog(self):
+        response, _ = self.read_export()
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('job_export'), headers={'if-none-match': etag}).status_code, 304)
+        Job.objects.get(pk=self.jobs[0].pk).save()
+        self.assertEqual(self.client.get(reverse('job_export'), headers={'if-none-match': etag}).status_code, 200)
+
+
+class ArchiveJobsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = make_company()
+        self.user = User.objects.create_user(username='ada', password='pass12345', user_type='applicant')
+        self.applicant = Applicant.objects.create(user=self.user)
+        self.old, self.open = make_jobs(self.company, 2)
+        Application.objects.create(job=self.old, applicant=self.applicant)
+        Application.objects.create(job=self.open, applicant=self.applicant, status='hold')
+
+    def close(self, job, days_ago):
+        job.is_active = False
+        job.save()
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_expired_jobs_are_deactivated(self):
+        Job.objects.filter(pk=self.old.pk).update(expires_at=timezone.now() - timedelta(hours=1))
+        call_command('archive_jobs', stdout=StringIO())
+        self.old.refresh_from_db()
+        self.assertFalse(self.old.is_active)
+        self.assertNotIn(self.old, search_jobs('Job'))
+
+    def test_old_inactive_jobs_move_to_the_archive(self):
+        self.close(self.old, days_ago=200)
+        self.close(self.open, days_ago=1)  # Closed, but not for long enough.
+        out = StringIO()
+        call_command('archive_jobs', '--batch-size', '1', stdout=out)
+        self.assertIn('archived 1 jobs with 1 applications', out.getvalue())
+
+        self.assertFalse(Job.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(ArchivedJob.objects.get().pk, self.old.pk)
+        archived = ArchivedApplication.objects.get()
+        self.assertEqual((archived.job_id, archived.applicant_id, archived.status), (self.old.pk, self.user.pk, 'applied'))
+        self.assertFalse(ApplicationSummary.objects.filter(job_id=self.old.pk).exists())
+        counts = dict(ApplicationStatusCount.objects.values_list('status', 'count'))
+        self.assertEqual((counts['applied'], counts['hold']), (0, 1))
+
+    def test_every_relation_is_handled(self):
+        # archive_batch() deletes without a cascade, so a new relation to Job
+        # or Application must be handled there and listed in ARCHIVED_RELATIONS.
+        # include_hidden also finds the related_name='+' ones, which
+        # _meta.related_objects leaves out.
+        relations = {
+            f'{field.related_model._meta.label}.{field.field.name}'
+            for model in (Job, Application)
+            for field in model._meta.get_fields(include_hidden=True)
+            if field.auto_created and not field.concrete
+        }
+        self.assertEqual(relations, set(ARCHIVED_RELATIONS))
+
+    def test_archived_applications_stay_visible(self):
+        self.close(self.old, days_ago=200)
+        call_command('archive_jobs', stdout=StringIO())
+        self.client.force_login(self.user)
+        self.assertNotContains(self.client.get(reverse('applicant_dashboard')), 'Job 0')
+        response = self.client.get(reverse('applicant_archive'))
+        self.assertContains(response, 'Job 0')
+        self.assertContains(response, 'Acme')
+
+        admin = User.objects.create_superuser(username='root', password='pass12345', email='root@example.com')
+        self.client.force_login(admin)
+        url = reverse('admin:jobs_archivedjob_change', args=[self.old.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Job 0')
+        self.assertEqual(self.client.post(url, {'title': 'Changed'}).status_code, 403)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345', user_type='company')
+        self.client.force_login(self.admin)
+        self.job = Job.objects.create(company=make_company(), title='Welder', description='Weld.', location='Lagos')
+
+    def add_applications(self, count, start=0):
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f'applicant-{i}', password='pass12345', user_type='applicant')
+            Application.objects.create(job=self.job, applicant=Applicant.objects.create(user=user))
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('admin:jobs_application_changelist')).status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_applications(2)
+        few = self.changelist_queries()
+        self.add_applications(8, start=2)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_forms_use_id_inputs_instead_of_selects(self):
+        response = self.client.get(reverse('admin:jobs_application_add'))
+        self.assertNotContains(response, '<select name="applicant"')
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+
+    def test_large_unfiltered_tables_are_estimated(self):
+        make_jobs(self.job.company, 3)
+        Job.objects.filter(pk=self.job.pk).delete()
+        jobs = Job.objects.order_by('pk')
+        with mock.patch.object(admin_paging, 'ESTIMATE_ABOVE', 0):
+            # Without statistics the rows are counted (the deleted one isn't).
+            self.assertEqual(admin_paging.EstimatedCountPaginator(jobs, 10).count, 3)
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                make_jobs(self.job.company, 2)
+                # The statistics still say 3 until the next ANALYZE.
+                self.assertEqual(admin_paging.EstimatedCountPaginator(jobs, 10).count, 3)
+        self.assertEqual(admin_paging.EstimatedCountPaginator(jobs, 10).count, Job.objects.count())
+        with mock.patch.object(admin_paging, 'FILTERED_COUNT_LIMIT', 1):
+            self.assertEqual(admin_paging.EstimatedCountPaginator(jobs.filter(is_active=True), 10).count, 2)
+
+    def test_status_action_updates_applications_in_bulk(self):
+        self.add_applications(3)
+        ids = list(Application.objects.values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:jobs_application_changelist'), {
+                'action': 'mark_rejected', '_selected_action': ids,
+            })
+        self.assertEqual(response.status_code, 302)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "jobs_application"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(ApplicationSummary.objects.values_list('status', flat=True)), {'rejected'})
+        self.assertEqual(set(ApplicationStatusCount.objects.filter(count__gt=0).values_list('status', flat=True)),
+                         {'rejected'})
+        self.assertEqual(set(ApplicationOutbox.objects.values_list('to_status', flat=True)), {'rejected'})
+        self.assertEqual(ApplicationStatusChange.objects.count(), 3)
+
+    def test_close_action_takes_jobs_out_of_the_listing(self):
+        response = self.client.post(reverse('admin:jobs_job_changelist'), {
+            'action': 'close_jobs', '_selected_action': [self.job.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        job = Job.objects.get(pk=self.job.pk)
+        self.assertFalse(job.is_active)
+        # The importer compares content hashes, so the hash follows is_active.
+        self.assertEqual(job.content_hash, job.compute_content_hash())
+        self.assertEqual(search_jobs('welder'), [])
+        self.assertContains(self.client.get(reverse('job_list')), 'No jobs posted yet.')
+
+
+class StaticAssetTests(TestCase):
+    def test_bundle_is_up_to_date(self):
+        err = StringIO()
+        call_command('build_css', check=True, stdout=StringIO(), stderr=err)
+        self.assertEqual(err.getvalue(), '')
+
+    def test_pages_use_the_bundle(self):
+        response = self.client.get(reverse('job_list'))
+        self.assertContains(response, '/static/css/site.css')
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
+
+    def test_collected_files_are_hashed_and_compressed(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = re.search(r'href="(/static/css/site\.\w+\.css)"', self.client.get(reverse('job_list')).text)[1]
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            source = (settings.BASE_DIR / 'static' / 'css' / 'site.css').read_bytes()
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), source)
+
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(b''.join(response.streaming_content), source)
+            self.assertEqual(self.client.get('/static/css/site.css')['Cache-Control'], 'no-cache')
+            self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+
+@skipUnless(recommendations.available(), "NumPy and SciPy are not installed")
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        company = make_company()
+        self.python = Job.objects.create(company=company, title='Python Developer', location='Lagos',
+                                         description='Build Django web apps in Python.')
+        self.senior = Job.objects.create(company=company, title='Senior Python Engineer', location='Lagos',
+                                         description='Lead a team writing Python and Django services.')
+        self.nurse = Job.objects.create(company=company, title='Nurse', location='Accra',
+                                        description='Care for patients on the ward.')
+        self.night = Job.objects.create(company=company, title='Night Nurse', location='Accra',
+                                        description='Care for patients at night in a busy hospital ward.')
+
+    def similar(self, job):
+        return list(SimilarJob.objects.filter(job=job).order_by('rank').values_list('similar__title', flat=True))
+
+    def test_full_build_and_page(self):
+        out = StringIO()
+        call_command('build_recommendations', full=True, stdout=out)
+        self.assertIn('recomputed 4 jobs', out.getvalue())
+        self.assertEqual(self.similar(self.python)[0], 'Senior Python Engineer')
+        self.assertEqual(self.similar(self.nurse)[0], 'Night Nurse')
+
+        # Serving is one indexed query, then cached.
+        with self.assertNumQueries(1):
+            self.assertEqual(recommendations.similar_jobs(self.python.pk)[0], self.senior)
+        with self.assertNumQueries(0):
+            recommendations.similar_jobs(self.python.pk)
+        # Rebuilding refreshes the panels but leaves the listing pages cached.
+        version = job_cache.get_catalog_version()
+        recommendations.build_recommendations(full=True)
+        self.assertEqual(job_cache.get_catalog_version(), version)
+        with self.assertNumQueries(1):
+            recommendations.similar_jobs(self.python.pk)
+        response = self.client.get(reverse('job_detail', args=[self.python.pk]))
+        self.assertContains(response, 'Similar Jobs')
+        self.assertContains(response, 'Senior Python Engineer')
+
+        # Closed jobs drop out of the panel straight away.
+        self.senior.is_active = False
+        self.senior.save()
+        self.assertNotIn(self.senior, recommendations.similar_jobs(self.python.pk))
+
+    def test_detail_pages_follow_the_panel(self):
+        recommendations.build_recommendations(full=True)
+        for name in ('job_detail', 'job_detail_async'):
+            with self.subTest(view=name):
+                url = reverse(name, args=[self.python.pk])
+                response = self.client.get(url)
+                self.assertContains(response, 'Similar Jobs')
+                self.assertContains(response, 'Senior Python Engineer')
+                etag = response['ETag']
+                self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+                # A rebuild may change the panel, so the old copy is no longer fresh.
+                recommendations.build_recommendations(full=True)
+                response = self.client.get(url, headers={'if-none-match': etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_incremental_build(self):
+        recommendations.build_recommendations(full=True)
+        self.assertEqual(recommendations.build_recommendations()['recomputed'], 0)
+
+        backend = Job.objects.create(company=self.python.company, title='Python Backend Developer',
+                                     location='Lagos', description='Python and Django APIs.')
+        self.night.description = 'Drive a delivery van.'
+        self.night.title = 'Driver'
+        self.night.location = 'Kigali'
+        self.night.save()
+        result = recommendations.build_recommendations(chunk_size=1)
+        self.assertEqual((result['mode'], result['recomputed']), ('incremental', 2))
+        self.assertEqual(self.similar(backend)[0], 'Python Developer')
+        # The new job was merged into its neighbours' lists, and the edited one left them.
+        self.assertIn('Python Backend Developer', self.similar(self.python))
+        self.assertNotIn('Driver', self.similar(self.nurse))
+
+    def test_archiving_removes_recommendations(self):
+        recommendations.build_recommendations(full=True)
+        self.senior.is_active = False
+        self.senior.save()
+        Job.objects.filter(pk=self.senior.pk).update(updated_at=timezone.now() - timedelta(days=200))
+        call_command('archive_jobs', stdout=StringIO())
+        self.assertFalse(SimilarJob.objects.filter(similar_id=self.senior.pk).exists())
+        self.assertFalse(SimilarJob.objects.filter(job_id=self.senior.pk).exists())
+
+
+@mock.patch.object(alerts, 'MATCH_DELAY', timedelta(0))
+class JobAlertTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = make_company()
+        user = User.objects.create_user(username='ada', email='ada@example.com', password='pass12345',
+                                        user_type='applicant', email_verified=True)
+        self.applicant = Applicant.objects.create(user=user)
+        # The first run only sets the starting point.
+        alerts.match_new_jobs()
+
+    def save_search(self, query='', location='', job_type=''):
+        return SavedSearch.objects.create(applicant=self.applicant, query=query, location=location, job_type=job_type)
+
+    def post_job(self, title, description='', location='Lagos', job_type='Full-Time'):
+        return Job.objects.create(company=self.company, title=title, description=description,
+                                  location=location, job_type=job_type)
+
+    def test_matches_are_emailed_once_in_a_digest(self):
+        python = self.save_search('python developer', location='Lagos')
+        self.save_search('nurse')
+        self.save_search(job_type='contract')
+        self.post_job('Python Developer', 'Django and Python.', location='Lagos, Nigeria')
+        self.post_job('Senior Python Developer', location='Accra')
+        self.post_job('Night Nurse', 'Care for patients.', job_type='Contract')
+        self.post_job('Welder')
+
+        out = StringIO()
+        call_command('send_job_alerts', base_url='https://jobboard.example/', stdout=out)
+        self.assertIn('Matched 4 jobs (3 matches), sent 1 digests', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual((message.to, message.subject), (['ada@example.com'], '2 new jobs matching your saved searches'))
+        self.assertIn('Python Developer at Acme (Lagos, Nigeria, Full-Time)', message.body)
+        self.assertIn('Night Nurse', message.body)
+        self.assertNotIn('Senior', message.body)
+        self.assertIn('https://jobboard.example/alerts/', message.body)
+        self.assertEqual(SavedSearchMatch.objects.filter(search=python).count(), 1)
+
+        # Editing a job that was already emailed doesn't alert again.
+        job = Job.objects.get(title='Python Developer')
+        job.description = 'Django, Python and Postgres.'
+        job.save()
+        call_command('send_job_alerts', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_only_searches_anchored_on_the_jobs_terms_are_read(self):
+        for i in range(3):
+            self.post_job(f'Python Developer {i}')
+        rebuild_search_index()
+        # 'django' is in no job yet, so it is rarer than 'python'.
+        search = self.save_search('python django')
+        self.assertEqual(search.match_term, 'django')
+        self.save_search('welder')
+
+        jobs = [self.post_job('Django Developer', 'Python APIs.'), self.post_job('Python Developer')]
+        with self.assertNumQueries(1):
+            found = alerts.match_jobs(jobs)
+        self.assertEqual(found, [(search.pk, self.applicant.pk, jobs[0].pk)])
+
+    def test_long_digests_list_the_newest_jobs(self):
+        self.save_search('python')
+        self.save_search('developer')
+        for i in range(3):
+            self.post_job(f'Python Developer {i}')
+        alerts.match_new_jobs()
+        with mock.patch.object(alerts, 'DIGEST_MAX_JOBS', 2):
+            self.assertEqual(alerts.send_digests('http://testserver/'), 1)
+        body = mail.outbox[0].body
+        self.assertEqual(mail.outbox[0].subject, '3 new jobs matching your saved searches')
+        self.assertIn('Python Developer 2', body)
+        self.assertNotIn('Python Developer 0', body)
+        self.assertIn('...and 1 more.', body)
+
+    def test_closed_jobs_and_unverified_addresses_get_no_email(self):
+        self.save_search('python')
+        closed = self.post_job('Python Developer')
+        alerts.match_new_jobs()
+        closed.is_active = False
+        closed.save()
+        self.assertEqual(alerts.send_digests('http://testserver/'), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+        User.objects.filter(pk=self.applicant.pk).update(email_verified=False)
+        self.post_job('Python Engineer')
+        alerts.match_new_jobs()
+        self.assertEqual(alerts.send_digests('http://testserver/'), 0)
+        self.assertFalse(SavedSearchMatch.objects.filter(notified_at__isnull=True).exists())
+
+    def test_matches_added_while_sending_wait_for_the_next_digest(self):
+        self.save_search('python')
+        self.post_job('Python Developer')
+        alerts.match_new_jobs()
+        digest = alerts._digest
+
+        def digest_then_match(*args):
+            # Another process matches a new job while the digests are built.
+            self.post_job('Python Engineer')
+            alerts.match_new_jobs()
+            return digest(*args)
+
+        with mock.patch.object(alerts, '_digest', side_effect=digest_then_match):
+            self.assertEqual(alerts.send_digests('http://testserver/'), 1)
+        self.assertEqual(alerts.send_digests('http://testserver/'), 1)
+        self.assertIn('Python Engineer', mail.outbox[1].body)
+
+    def test_archiving_removes_matches(self):
+        self.save_search('python')
+        job = self.post_job('Python Developer')
+        alerts.match_new_jobs()
+        Job.objects.filter(pk=job.pk).update(is_active=False, updated_at=timezone.now() - timedelta(days=200))
+        call_command('archive_jobs', stdout=StringIO())
+        self.assertFalse(SavedSearchMatch.objects.exists())
+
+    def test_saved_search_pages(self):
+        self.client.force_login(self.applicant.user)
+        response = self.client.get(reverse('job_search'), {'q': 'python', 'location': 'Lagos'})
+        self.assertContains(response, 'Email me new jobs like these')
+
+        data = {'query': 'python', 'location': 'Lagos', 'job_type': ''}
+        self.client.post(reverse('saved_searches'), data)
+        response = self.client.post(reverse('saved_searches'), data, follow=True)
+        self.assertContains(response, 'You have already saved this search.')
+        search = SavedSearch.objects.get()
+        self.assertEqual((search.query, search.match_term), ('python', 'python'))
+
+        response = self.client.post(reverse('saved_searches'), {'query': '', 'location': '', 'job_type': ''})
+        self.assertContains(response, 'Enter keywords, a location or a job type.')
+
+        self.client.post(reverse('delete_saved_search', args=[search.pk]))
+        self.assertFalse(SavedSearch.objects.exists())
+
+
+class ApplicationExportTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.company = make_company()
+        self.job = make_jobs(self.company, 1)[0]
+        for username, cv in (('ada', b'%PDF-1.4 ada'), ('bob', b'%PDF-1.4 bob, "quoted"'), ('cy', None)):
+            user = User.objects.create_user(username=username, email=f'{username}@example.com',
+                                            password='pass12345', user_type='applicant')
+            applicant = Applicant.objects.create(user=user)
+            if cv:
+                applicant.cv_original_name = f'{username} cv.pdf'
+                applicant.cv.save(f'{username}.pdf', ContentFile(cv))
+            Application.objects.create(job=self.job, applicant=applicant)
+        self.client.force_login(self.company.user)
+        self.url = reverse('export_applications', args=[self.job.pk])
+
+    def download(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_archive_holds_the_manifest_and_cvs(self):
+        response, body = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        archive = zipfile.ZipFile(BytesIO(body))
+        self.assertIsNone(archive.testzip())
+        ada, bob = Application.objects.order_by('pk')[:2]
+        self.assertEqual(archive.namelist(), [f'cvs/{ada.pk}-ada.pdf', f'cvs/{bob.pk}-bob.pdf', 'applications.csv'])
+        self.assertEqual(archive.read(f'cvs/{bob.pk}-bob.pdf'), b'%PDF-1.4 bob, "quoted"')
+        manifest = archive.read('applications.csv').decode().splitlines()
+        self.assertEqual(len(manifest), 4)
+        self.assertTrue(manifest[1].startswith(f'{ada.pk},applied,'))
+        self.assertTrue(manifest[1].endswith(f',cvs/{ada.pk}-ada.pdf,ada cv.pdf'))
+        self.assertTrue(manifest[3].endswith(',cy@example.com,,'))
+
+        # Other companies can't see it.
+        self.client.force_login(make_company('rival', 'Rival').user)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_interrupted_downloads_resume(self):
+        response, body = self.download()
+        etag = response['ETag']
+        response, part = self.download(Range='bytes=100-', If_Range=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-{len(body) - 1}/{len(body)}')
+        self.assertEqual(part, body[100:])
+        self.assertEqual(self.download(Range='bytes=30-59')[1], body[30:60])
+        self.assertEqual(self.download(Range='bytes=-22')[1], body[-22:])
+        self.assertEqual(self.download(Range=f'bytes={len(body)}-')[0].status_code, 416)
+        self.assertEqual(self.download(If_None_Match=etag)[0].status_code, 304)
+
+        # A new application changes the archive, so an old part isn't resumed.
+        user = User.objects.create_user(username='dee', password='pass12345', user_type='applicant')
+        Application.objects.create(job=self.job, applicant=Applicant.objects.create(user=user))
+        response, body = self.download(Range='bytes=100-', If_Range=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(zipfile.ZipFile(BytesIO(body)).read('applications.csv').splitlines()), 5)
+
+    def test_changes_during_a_download_do_not_change_the_archive(self):
+        export = ApplicationExport(self.job)
+        self.addCleanup(export.close)
+        chunks = export.iter_bytes()
+        # A new application and a status change after planning, before streaming.
+        user = User.objects.create_user(username='dee', password='pass12345', user_type='applicant')
+        Application.objects.create(job=self.job, applicant=Applicant.objects.create(user=user))
+        Application.objects.update(status='rejected')
+        body = b''.join(chunks)
+        self.assertEqual(len(body), export.size)
+        archive = zipfile.ZipFile(BytesIO(body))
+        self.assertIsNone(archive.testzip())
+        manifest = archive.read('applications.csv').decode().splitlines()
+        self.assertEqual(len(manifest), 4)
+        self.assertNotIn('rejected', ''.join(manifest))
+
+    def test_a_member_longer_than_planned_is_an_error(self):
+        member = zipstream.ZipMember('a.txt', 3, 0, timezone.now(), lambda offset: iter((b'abcd'[offset:],)))
+        with self.assertRaisesMessage(ValueError, 'a.txt is longer than expected'):
+            b''.join(zipstream.iter_zip(lambda: [member]))
+
+    async def test_asgi_download_is_streamed(self):
+        await self.async_client.aforce_login(self.company.user)
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response])
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertIsNone(zipfile.ZipFile(BytesIO(body)).testzip())
+
+    def test_missing_checksums_are_filled_in(self):
+        CVBlob.objects.update(crc32=None)
+        body = self.download()[1]
+        self.assertIsNone(zipfile.ZipFile(BytesIO(body)).testzip())
+        self.assertFalse(CVBlob.objects.filter(crc32__isnull=True).exists())
+
+    def test_zip64_records(self):
+        # Pretend 4 GiB is a few bytes, so every offset after the first needs ZIP64.
+        with mock.patch.object(zipstream, 'ZIP64_LIMIT', 50):
+            response, body = self.download()
+        self.assertEqual(int(response['Content-Length']), len(body))
+        archive = zipfile.ZipFile(BytesIO(body))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(len(archive.namelist()), 3)
+
+    def test_command_resumes_a_partial_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'export.zip')
+        call_command('export_applications', self.job.pk, output, stdout=StringIO())
+        with open(output, 'rb') as f:
+            body = f.read()
+        os.remove(output)
+
+        etag = self.download()[0]['ETag'].strip('"')
+        with open(f'{output}.{etag}.part', 'wb') as f:
+            f.write(body[:150])
+        out = StringIO()
+        call_command('export_applications', self.job.pk, output, stdout=out)
+        self.assertIn('Resuming at byte 150', out.getvalue())
+        with open(output, 'rb') as f:
+            self.assertEqual(f.read(), body)
+        self.assertEqual(os.listdir(directory), ['export.zip'])
+
+
+class ApplicationOutboxTests(TestCase):
+    def setUp(self):
+        company = make_company()
+        job = make_jobs(company, 1)[0]
+        self.applications = []
+        for username in ('ada', 'bob'):
+            user = User.objects.create_user(username=username, email=f'{username}@example.com',
+                                            password='pass12345', user_type='applicant')
+            self.applications.append(Application.objects.create(job=job, applicant=Applicant.objects.create(user=user)))
+
+    def move(self, application, status):
+        application.status = status
+        application.save()
+
+    def sent(self):
+        return [(message.to[0], message.body.split('"')[1]) for message in mail.outbox]
+
+    def test_changes_are_recorded_then_dispatched_once(self):
+        ada, _ = self.applications
+        with CaptureQueriesContext(connection) as queries:
+            self.move(ada, 'progress')
+        # The change only adds two rows; everything else happens later.
+        written = [q['sql'] for q in queries if 'applicationoutbox' in q['sql'] or 'applicationstatuschange' in q['sql']]
+        self.assertEqual([sql.split()[0] for sql in written], ['INSERT', 'INSERT'])
+        change = ApplicationStatusChange.objects.get()
+        self.assertEqual((change.application_id, change.from_status, change.to_status), (ada.pk, 'applied', 'progress'))
+        self.assertEqual(mail.outbox, [])
+
+        out = StringIO()
+        call_command('dispatch_outbox', stdout=out)
+        self.assertIn('Handled 1 of 1 events', out.getvalue())
+        self.assertEqual(self.sent(), [('ada@example.com', 'In Progress')])
+        self.assertFalse(ApplicationOutbox.objects.exists())
+        self.assertEqual(outbox.dispatch_outbox()['events'], 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_company_stats_follow_status_changes(self):
+        ada, bob = self.applications
+        job = ada.job
+        self.assertEqual(job_cache.get_company_stats(job.company_id), {job.pk: {'applied': 2}})
+        self.move(Application.objects.get(pk=ada.pk), 'progress')
+        self.assertEqual(job_cache.get_company_stats(job.company_id), {job.pk: {'applied': 1, 'progress': 1}})
+        bob.delete()
+        self.assertEqual(job_cache.get_company_stats(job.company_id), {job.pk: {'progress': 1}})
+
+        # Saving without a status change leaves the counts, and the job, alone.
+        with CaptureQueriesContext(connection) as queries:
+            Application.objects.get(pk=ada.pk).save()
+        self.assertFalse([q['sql'] for q in queries if 'jobs_job' in q['sql']])
+
+    def test_failed_emails_are_retried_in_order(self):
+        ada, bob = self.applications
+        self.move(ada, 'progress')
+        self.move(bob, 'hold')
+        self.move(ada, 'rejected')
+        send = mail.get_connection().send_messages
+        failures = [ConnectionError("mail server went away")]
+
+        def flaky(messages):
+            # The first email to Ada fails.
+            if messages[0].to == ['ada@example.com'] and failures:
+                raise failures.pop()
+            return send(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=flaky):
+            totals = outbox.dispatch_outbox(batch_size=2)
+            self.assertEqual((totals['sent'], totals['failed']), (1, 1))
+            # Ada's second event waits behind her first one.
+            self.assertEqual(self.sent(), [('bob@example.com', 'On Hold')])
+            self.assertEqual(ApplicationOutbox.objects.filter(application=ada).count(), 2)
+            self.assertEqual(ApplicationOutbox.objects.filter(attempts=1).get().to_status, 'progress')
+
+            # Not due yet.
+            self.assertEqual(outbox.dispatch_outbox()['sent'], 0)
+            later = timezone.now() + outbox.RETRY_DELAY
+            self.assertEqual(outbox.dispatch_outbox(now=later)['sent'], 2)
+        self.assertEqual(self.sent()[1:], [('ada@example.com', 'In Progress'), ('ada@example.com', 'Rejected')])
+        self.assertFalse(ApplicationOutbox.objects.exists())
+
+    def test_a_crash_before_the_events_are_deleted_sends_them_again(self):
+        ada, bob = self.applications
+        self.move(ada, 'selected')
+        self.move(bob, 'rejected')
+        with mock.patch.object(outbox, '_finish', side_effect=RuntimeError("killed")):
+            with self.assertRaises(RuntimeError):
+                outbox.dispatch_outbox()
+        self.assertEqual(ApplicationOutbox.objects.count(), 2)
+        outbox.dispatch_outbox()
+        # At least once: both applicants got their email, twice.
+        self.assertEqual(sorted(self.sent()), [('ada@example.com', 'Selected')] * 2 + [('bob@example.com', 'Rejected')] * 2)
+        self.assertFalse(ApplicationOutbox.objects.exists())
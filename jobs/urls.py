@@ -1,10 +1,24 @@
 # In jobs/urls.py
 from django.urls import path
-from . import views
+from . import views, async_views, feeds, exports
 
 urlpatterns = [
     # This will be the main job listing page
     path('', views.job_list, name='job_list'),
+    path('search/', views.job_search, name='job_search'),
     path('job/<int:pk>/', views.job_detail, name='job_detail'),
     path('job/<int:pk>/apply/', views.apply_for_job, name='apply_for_job'),
+    # Every application and CV of a job in one ZIP file, for the company that posted it.
+    path('job/<int:pk>/applications/export/', exports.export_applications, name='export_applications'),
+    # Saved searches (job alerts) of the logged-in applicant.
+    path('alerts/', views.saved_searches, name='saved_searches'),
+    path('alerts/<int:pk>/delete/', views.delete_saved_search, name='delete_saved_search'),
+
+    # Async versions of the read-only pages, meant to be served under ASGI.
+    path('async/', async_views.job_list, name='job_list_async'),
+    path('async/job/<int:pk>/', async_views.job_detail, name='job_detail_async'),
+    path('api/jobs/', async_views.job_api_list, name='job_api_list'),
+    path('api/jobs/<int:pk>/', async_views.job_api_detail, name='job_api_detail'),
+    # The whole catalog in one streamed download, for aggregator partners.
+    path('api/jobs/export/', feeds.job_export, name='job_export'),
 ]
\ No newline at end of file
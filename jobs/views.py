@@ -1,47 +1,221 @@
 # Path: /jobs/views.py
 
-from django.shortcuts import render, get_object_or_404, redirect
+import uuid
+
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Job, Application
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_POST
+from .models import Job, SavedSearch
+from . import applications, cache as job_cache
+from .alerts import MAX_SAVED_SEARCHES
+from .forms import SavedSearchForm
+from .filters import PERIOD_CHOICES, RADIUS_CHOICES, filter_jobs, filter_query, filters_key, parse_job_filters
+from .pagination import keyset_page, JOB_LIST_PAGE_SIZE
+from .recommendations import similar_jobs
+from .search import search_jobs
 
-# ... job_list and job_detail views are already here ...
+# These are the only columns the job cards on the listing page need.
+JOB_CARD_FIELDS = (
+    'id', 'title', 'description', 'location', 'job_type', 'created_at', 'updated_at',
+    'company__user_id', 'company__name',
+)
 
+@condition(etag_func=job_cache.job_list_etag, last_modified_func=job_cache.job_list_last_modified)
 def job_list(request):
-    jobs = Job.objects.filter(is_active=True).order_by('-created_at')
-    return render(request, 'jobs/job_list.html', {'jobs': jobs})
+    cursor = request.GET.get('cursor')
+    # Optional salary and distance filters, see jobs/filters.py.
+    filters = parse_job_filters(request.GET)
+    # Each page is cached under the current catalog version, so any change to
+    # a job or company simply makes us look under a new key.
+    key = job_cache.job_list_key(cursor, filters=filters_key(filters))
+    page = cache.get(key)
+    if page is None:
+        # We join the company in the same query so the cards don't trigger
+        # one extra query per job when they show the company name.
+        jobs = (
+            Job.objects.filter(is_active=True)
+            .select_related('company')
+            .only(*JOB_CARD_FIELDS)
+        )
+        page = keyset_page(filter_jobs(jobs, filters), cursor)
+        cache.set(key, page, job_cache.cache_timeout())
+    jobs, next_cursor = page
+    return render(request, 'jobs/job_list.html', job_list_context(jobs, next_cursor, filters))
+
+
+def job_list_context(jobs, next_cursor, filters):
+    """The template context of a listing page. Shared with the async view."""
+    return {
+        'jobs': jobs,
+        'next_cursor': next_cursor,
+        'filters': filters,
+        # Kept on the 'Load more jobs' link so every page is filtered the same way.
+        'filter_query': filter_query(filters),
+        'radius_choices': RADIUS_CHOICES,
+        'period_choices': PERIOD_CHOICES,
+    }
+
+def job_search(request):
+    """
+    Ranked full-text search over active jobs, with optional filters.
+    Results are paged with '?page=' since they are ordered by relevance, not date.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    # Ignore a company that isn't an id, like the JSON API does.
+    company = request.GET.get('company', '')
 
+    jobs = search_jobs(
+        query,
+        job_type=request.GET.get('job_type') or None,
+        location=request.GET.get('location') or None,
+        company=int(company) if company.isdigit() else None,
+        limit=JOB_LIST_PAGE_SIZE + 1,
+        offset=(page - 1) * JOB_LIST_PAGE_SIZE,
+    )
+    # The 'next' link keeps every filter and only bumps the page number.
+    next_query = None
+    if len(jobs) > JOB_LIST_PAGE_SIZE:
+        params = request.GET.copy()
+        params['page'] = page + 1
+        next_query = params.urlencode()
+    context = {
+        'jobs': jobs[:JOB_LIST_PAGE_SIZE],
+        'query': query,
+        'next_query': next_query,
+        # Offered to applicants as a job alert (see saved_searches below).
+        'search_location': request.GET.get('location', ''),
+        'search_job_type': request.GET.get('job_type', ''),
+    }
+    return render(request, 'jobs/job_list.html', context)
+
+@condition(etag_func=job_cache.job_detail_etag, last_modified_func=job_cache.job_detail_last_modified)
 def job_detail(request, pk):
-    job = get_object_or_404(Job, pk=pk, is_active=True)
-    return render(request, 'jobs/job_detail.html', {'job': job})
+    job = job_cache.get_job(pk)
+    if job is None:
+        raise Http404("No active job found.")
+    context = {
+        'job': job,
+        'idempotency_key': uuid.uuid4().hex,
+        # Precomputed by 'manage.py build_recommendations', one indexed query at most.
+        'similar_jobs': similar_jobs(job.pk),
+    }
+    return render(request, 'jobs/job_detail.html', context)
+
+
+def _wants_json(request):
+    """API clients ask for JSON with an Accept header or '?format=json'."""
+    return request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', '')
+
+
+# Messages and JSON status codes for each outcome of apply_to_job().
+APPLY_RESPONSES = {
+    applications.CREATED: (201, messages.SUCCESS, 'Your application has been submitted successfully!'),
+    applications.REPLAYED: (200, messages.SUCCESS, 'Your application has been submitted successfully!'),
+    applications.DUPLICATE: (409, messages.WARNING, 'You have already applied for this job.'),
+    applications.KEY_REUSED: (422, messages.ERROR, 'This request was already used to apply for another job.'),
+    applications.NO_PROFILE: (403, messages.ERROR, 'Your account has no applicant profile, so it cannot apply for jobs.'),
+}
 
 
-# Add this new view
 @login_required
 def apply_for_job(request, pk):
     """
     This view handles the logic for a user applying to a job.
+
+    Browsers get redirected back to the job page with a message. Clients that
+    ask for JSON get the outcome as JSON with a matching status code. Either
+    can send an 'Idempotency-Key' header (or 'idempotency_key' form field) so
+    that retrying a request is always safe.
     """
-    # Get the specific job the user is applying to
-    job = get_object_or_404(Job, pk=pk)
+    as_json = _wants_json(request)
 
     # We only handle POST requests here, as applying is an action
+    if request.method != 'POST':
+        if as_json:
+            return JsonResponse({'error': 'Use POST to apply.'}, status=405)
+        return redirect('job_detail', pk=pk)
+
+    # Check if the user is an applicant
+    if request.user.user_type != 'applicant':
+        if as_json:
+            return JsonResponse({'error': 'Only applicants can apply for jobs.'}, status=403)
+        messages.error(request, 'Only applicants can apply for jobs.')
+        return redirect('job_detail', pk=pk)
+
+    key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key')
+    if key and len(key) > applications.MAX_IDEMPOTENCY_KEY_LENGTH:
+        if as_json:
+            return JsonResponse({'error': 'The idempotency key is too long.'}, status=400)
+        key = None
+
+    # The Applicant's primary key is the user's, so no extra query is needed.
+    # Only active jobs accept applications; apply_to_job() checks that itself.
+    application, outcome = applications.apply_to_job(pk, request.user.pk, key)
+    if outcome == applications.CLOSED:
+        if as_json:
+            return JsonResponse({'error': 'No active job found.'}, status=404)
+        raise Http404("No active job found.")
+    status, level, text = APPLY_RESPONSES[outcome]
+    if application is None:
+        if as_json:
+            return JsonResponse({'error': text}, status=status)
+        messages.add_message(request, level, text)
+        return redirect('job_detail', pk=pk)
+    if as_json:
+        return JsonResponse({
+            'outcome': outcome,
+            'application': {
+                'id': application.pk,
+                'job': application.job_id,
+                'status': application.status,
+                'applied_at': application.applied_at.isoformat(),
+            },
+        }, status=status)
+    messages.add_message(request, level, text)
+    return redirect('job_detail', pk=pk)
+
+
+@login_required
+def saved_searches(request):
+    """
+    Lists the applicant's saved searches, which email them new matching jobs
+    (see jobs/alerts.py). A POST saves a new one, e.g. from the search page.
+    """
+    if request.user.user_type != 'applicant':
+        messages.error(request, 'Only applicants can save searches.')
+        return redirect('job_list')
+
+    searches = SavedSearch.objects.filter(applicant_id=request.user.pk).order_by('-created_at')
+    form = SavedSearchForm()
     if request.method == 'POST':
-        # Check if the user is an applicant
-        if request.user.user_type != 'applicant':
-            messages.error(request, 'Only applicants can apply for jobs.')
-            return redirect('job_detail', pk=job.pk)
-
-        # Check if the user has already applied
-        already_applied = Application.objects.filter(job=job, applicant=request.user.applicant).exists()
-        if already_applied:
-            messages.warning(request, 'You have already applied for this job.')
-            return redirect('job_detail', pk=job.pk)
-
-        # Create the application
-        Application.objects.create(job=job, applicant=request.user.applicant)
-        messages.success(request, 'Your application has been submitted successfully!')
-        return redirect('job_detail', pk=job.pk)
-
-    # If it's not a POST request, just redirect back to the job detail page
-    return redirect('job_detail', pk=job.pk)
+        form = SavedSearchForm(request.POST)
+        if form.is_valid():
+            saved = form.save(commit=False)
+            existing = list(searches.values_list('query', 'location', 'job_type'))
+            if (saved.query, saved.location, saved.job_type) in existing:
+                messages.info(request, 'You have already saved this search.')
+            elif len(existing) >= MAX_SAVED_SEARCHES:
+                messages.error(request, f'You can save up to {MAX_SAVED_SEARCHES} searches. Delete one first.')
+            else:
+                saved.applicant_id = request.user.pk
+                saved.save()
+                messages.success(request, "Search saved. We'll email you new jobs that match it.")
+            return redirect('saved_searches')
+    return render(request, 'jobs/saved_searches.html', {'searches': searches, 'form': form})
+
+
+@login_required
+@require_POST
+def delete_saved_search(request, pk):
+    """Deletes one of the applicant's saved searches, which stops its emails."""
+    deleted, _ = SavedSearch.objects.filter(pk=pk, applicant_id=request.user.pk).delete()
+    if deleted:
+        messages.success(request, 'Saved search deleted.')
+    return redirect('saved_searches')
@@ -0,0 +1,204 @@
+# Path: /jobs/zipstream.py
+
+"""
+A small ZIP writer for archives that are streamed instead of stored.
+
+Python's zipfile module wants a seekable file to write to. Without one it
+writes each member's size and checksum after the member's data. Here every
+member's size and CRC-32 are known before we start (see ZipMember), so the
+whole layout of the archive is fixed before a single byte is written. That
+gives us two things:
+
+* the total size, for the Content-Length header;
+* any byte range of the archive, produced without producing what comes
+  before it, which is what resuming an interrupted download needs.
+
+Members are stored, not compressed. CVs are PDFs and Word files, which are
+compressed already, and compressing would make the sizes unknown up front.
+Archives over 4 GiB or with more than 65,534 members get ZIP64 records.
+"""
+
+import struct
+from typing import Callable, Iterator, NamedTuple
+from datetime import datetime
+
+# Offsets and counts from these on need ZIP64 records.
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_MEMBERS = 0xFFFF
+# What the classic fields hold when the real value is in a ZIP64 record.
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP64_COUNT_MARKER = 0xFFFF
+# The largest member we can describe without ZIP64 local headers.
+MAX_MEMBER_SIZE = 0xFFFFFFFF - 1
+
+CHUNK_SIZE = 64 * 1024
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+ZIP64_OFFSET_EXTRA = struct.Struct('<HHQ')
+ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+END = struct.Struct('<IHHHHIIH')
+
+# Bit 11: the member names are UTF-8.
+UTF8_FLAG = 0x800
+VERSION = 20
+VERSION_ZIP64 = 45
+
+
+class ZipMember(NamedTuple):
+    """One file in the archive. 'read(offset)' yields its content from byte 'offset' on."""
+    name: str
+    size: int
+    crc32: int
+    modified: datetime
+    read: Callable[[int], Iterator[bytes]]
+
+
+class ZipLayout:
+    """Works out where every member goes and how big the archive is, without any content."""
+
+    def __init__(self):
+        self.members = 0
+        # Where the next member goes, i.e. where the central directory starts.
+        self.offset = 0
+        self.central_size = 0
+
+    def add(self, name, size):
+        """Places a member of 'size' bytes after the others and returns its offset."""
+        if size > MAX_MEMBER_SIZE:
+            raise ValueError(f"{name} is too large to store ({size} bytes)")
+        name_length = len(name.encode())
+        offset = self.offset
+        self.offset += LOCAL_HEADER.size + name_length + size
+        self.central_size += CENTRAL_HEADER.size + name_length
+        if offset >= ZIP64_LIMIT:
+            self.central_size += ZIP64_OFFSET_EXTRA.size
+        self.members += 1
+        return offset
+
+    @property
+    def zip64(self):
+        return self.members >= ZIP_MAX_MEMBERS or self.offset >= ZIP64_LIMIT or self.central_size >= ZIP64_LIMIT
+
+    @property
+    def size(self):
+        """The size of the whole archive."""
+        size = self.offset + self.central_size + END.size
+        if self.zip64:
+            size += ZIP64_END.size + ZIP64_LOCATOR.size
+        return size
+
+
+def _dos_time(moment):
+    """A datetime as the (time, date) pair of MS-DOS that ZIP headers use."""
+    if moment.year < 1980:
+        return 0, (1 << 5) | 1
+    return (
+        (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2),
+        ((moment.year - 1980) << 9) | (moment.month << 5) | moment.day,
+    )
+
+
+def local_header(member):
+    name = member.name.encode()
+    time, date = _dos_time(member.modified)
+    return LOCAL_HEADER.pack(
+        0x04034b50, VERSION, UTF8_FLAG, 0, time, date,
+        member.crc32, member.size, member.size, len(name), 0,
+    ) + name
+
+
+def central_header(member, offset):
+    name = member.name.encode()
+    time, date = _dos_time(member.modified)
+    extra = b''
+    if offset >= ZIP64_LIMIT:
+        extra = ZIP64_OFFSET_EXTRA.pack(0x0001, 8, offset)
+    return CENTRAL_HEADER.pack(
+        0x02014b50, VERSION_ZIP64 if extra else VERSION, VERSION_ZIP64 if extra else VERSION,
+        UTF8_FLAG, 0, time, date, member.crc32, member.size, member.size,
+        len(name), len(extra), 0, 0, 0, 0, ZIP64_MARKER if extra else offset,
+    ) + name + extra
+
+
+def end_records(layout):
+    """The records that close the archive, after the central directory."""
+    if not layout.zip64:
+        return END.pack(
+            0x06054b50, 0, 0, layout.members, layout.members, layout.central_size, layout.offset, 0,
+        )
+    return ZIP64_END.pack(
+        0x06064b50, ZIP64_END.size - 12, VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+        layout.members, layout.members, layout.central_size, layout.offset,
+    ) + ZIP64_LOCATOR.pack(
+        0x07064b50, 0, layout.offset + layout.central_size, 1,
+    ) + END.pack(
+        0x06054b50, 0, 0, ZIP64_COUNT_MARKER, ZIP64_COUNT_MARKER, ZIP64_MARKER, ZIP64_MARKER, 0,
+    )
+
+
+def _constant(data):
+    return lambda offset: iter((data[offset:],))
+
+
+def _pieces(members):
+    """Yields (label, length, read) for every piece of the archive, in order."""
+    layout = ZipLayout()
+    for member in members():
+        layout.add(member.name, member.size)
+        header = local_header(member)
+        yield member.name, len(header), _constant(header)
+        yield member.name, member.size, member.read
+    # The central directory repeats every member with its offset, so go
+    # through them again instead of keeping them all in memory.
+    offsets = ZipLayout()
+    for member in members():
+        entry = central_header(member, offsets.add(member.name, member.size))
+        yield 'central directory', len(entry), _constant(entry)
+    records = end_records(layout)
+    yield 'end of archive', len(records), _constant(records)
+
+
+def iter_zip(members, start=0, stop=None):
+    """
+    Yields bytes 'start' to 'stop' (exclusive; None for the end) of the ZIP
+    archive of 'members', a function returning the ZipMembers in archive order.
+    It is called twice and must return the same members both times.
+    Pieces that end before 'start' are skipped without being read. A member
+    whose content turns out shorter or longer than its size raises
+    ValueError, since the bytes already sent can't be taken back.
+    """
+    position = 0
+    buffer = []
+    buffered = 0
+    for label, length, read in _pieces(members):
+        if position + length <= start:
+            position += length
+            continue
+        if stop is not None and position >= stop:
+            break
+        skip = max(start - position, 0)
+        # 'left' is what the piece still holds, 'wanted' what we send of it.
+        left = length - skip
+        wanted = left if stop is None else min(stop - position - skip, left)
+        for chunk in read(skip) if wanted else ():
+            if len(chunk) > left:
+                raise ValueError(f"{label} is longer than expected")
+            left -= len(chunk)
+            chunk = chunk[:wanted]
+            wanted -= len(chunk)
+            # Headers are tiny, so they are sent together with what follows.
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= CHUNK_SIZE:
+                yield b''.join(buffer)
+                buffer, buffered = [], 0
+            if not wanted and left:
+                # The range stops inside this piece.
+                break
+        if wanted:
+            raise ValueError(f"{label} is {wanted} bytes shorter than expected")
+        position += length
+    if buffer:
+        yield b''.join(buffer)
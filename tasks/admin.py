@@ -0,0 +1,6 @@
+# Path: /tasks/admin.py
+
+from django.contrib import admin
+from .models import Task
+
+admin.site.register(Task)
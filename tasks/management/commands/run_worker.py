@@ -0,0 +1,63 @@
+# Path: /tasks/management/commands/run_worker.py
+
+import json
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from tasks.worker import Worker, queue_stats
+
+
+class Command(BaseCommand):
+    help = "Runs queued background tasks until stopped (Ctrl+C or SIGTERM)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=getattr(settings, 'TASKS_WORKER_CONCURRENCY', 4),
+                            help="How many tasks to run at the same time.")
+        parser.add_argument('--processes', action='store_true',
+                            help="Run tasks in a process pool instead of a thread pool (for CPU-heavy tasks).")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Run until the queue has no due tasks left, then exit.")
+        parser.add_argument('--stats', action='store_true', help="Print queue metrics as JSON and exit.")
+        parser.add_argument('--purge', action='store_true',
+                            help="Delete finished tasks older than TASKS_KEEP_FINISHED_DAYS and exit.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(queue_stats(options['database']), indent=2))
+            return
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            use_processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            using=options['database'],
+        )
+        if options['purge']:
+            deleted = worker.purge_finished()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} finished task(s)."))
+            return
+        if options['once']:
+            total = 0
+            try:
+                while ran := worker.run_once():
+                    total += ran
+            finally:
+                worker.close()
+            self.stdout.write(self.style.SUCCESS(f"Ran {total} task(s)."))
+            return
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        self.stdout.write(f"Worker started with concurrency {worker.concurrency}. Press Ctrl+C to stop.")
+        try:
+            worker.run_forever(stop=lambda: bool(stopping))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Worker stopped.")
@@ -0,0 +1,43 @@
+# Path: /tasks/models.py
+
+from django.db import models
+
+
+# This model stores one unit of background work waiting for (or done by) a worker.
+class Task(models.Model):
+    """
+    A queued call to a function decorated with @task (see tasks/registry.py).
+    Rows are created by Task.enqueue() and picked up by 'manage.py run_worker'.
+    """
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+    # The dotted path of the task function, e.g. 'accounts.tasks.send_verification_email'.
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # The task won't be picked up before this time. Retries push it into the future.
+    run_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Which worker claimed the task, so a crashed worker's tasks can be found again.
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers look for the oldest due task in a given status.
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+            # Used for latency metrics and for purging old finished tasks.
+            models.Index(fields=['status', 'finished_at'], name='task_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
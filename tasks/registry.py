@@ -0,0 +1,106 @@
+# Path: /tasks/registry.py
+
+"""
+The @task decorator.
+
+Decorating a function registers it as a background task. Calling it still runs
+it right away; calling '.enqueue(...)' stores the call in the Task table so a
+worker runs it later:
+
+    @task(max_attempts=5)
+    def send_welcome_email(user_id):
+        ...
+
+    send_welcome_email.enqueue(user.pk)
+
+Arguments must be JSON-serializable, so pass ids rather than model instances.
+Enqueuing writes to the database in the caller's transaction: if the view
+rolls back, the task is never queued.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+# Every task function, by dotted name. Filled in as modules are imported.
+registry = {}
+
+
+class TaskFunction:
+    """Wraps a task function and adds .enqueue() and .enqueue_many()."""
+
+    def __init__(self, func, max_attempts, backoff):
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def _build(self, args, kwargs, delay):
+        from .models import Task
+
+        return Task(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def enqueue(self, *args, _delay=0, _using=DEFAULT_DB_ALIAS, **kwargs):
+        """Queues one call. With TASKS_EAGER = True the call runs immediately instead."""
+        if getattr(settings, 'TASKS_EAGER', False):
+            self.func(*args, **kwargs)
+            return None
+        task = self._build(args, kwargs, _delay)
+        task.save(using=_using)
+        return task
+
+    def enqueue_many(self, calls, _using=DEFAULT_DB_ALIAS):
+        """Queues many calls, given as (args, kwargs) pairs, with one INSERT."""
+        from .models import Task
+
+        if getattr(settings, 'TASKS_EAGER', False):
+            for args, kwargs in calls:
+                self.func(*args, **kwargs)
+            return []
+        return Task.objects.using(_using).bulk_create(
+            [self._build(args, kwargs, 0) for args, kwargs in calls]
+        )
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before the next try, doubling after every failure."""
+        return self.backoff * (2 ** (attempts - 1))
+
+
+def task(func=None, *, max_attempts=3, backoff=30):
+    """
+    Registers a function as a background task. 'max_attempts' is how many
+    times it is tried in total and 'backoff' the delay (in seconds) before the
+    first retry; each later retry waits twice as long as the one before.
+    """
+    def decorator(func):
+        wrapped = TaskFunction(func, max_attempts, backoff)
+        registry[wrapped.name] = wrapped
+        return wrapped
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_task(name):
+    """Returns the registered task called 'name', importing its module if needed."""
+    if name not in registry:
+        from django.utils.module_loading import import_string
+        try:
+            import_string(name)
+        except ImportError:
+            pass
+    return registry.get(name)
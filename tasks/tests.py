@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Task
+from .registry import task
+from .worker import Worker, queue_stats
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2, backoff=10)
+def explode():
+    raise RuntimeError("boom")
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(concurrency=2)
+        self.addCleanup(self.worker.close)
+
+    def test_enqueue_and_run(self):
+        record.enqueue('a')
+        record.enqueue_many([(['b'], {}), (['c'], {})])
+        self.assertEqual(Task.objects.filter(status='queued').count(), 3)
+        self.assertEqual(self.worker.run_once(), 3)
+        self.assertEqual(sorted(calls), ['a', 'b', 'c'])
+        self.assertEqual(Task.objects.filter(status='done').count(), 3)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_delayed_tasks_wait(self):
+        record.enqueue('later', _delay=60)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_failures_are_retried_with_backoff(self):
+        explode.enqueue()
+        with self.assertLogs('tasks.worker', 'WARNING'):
+            self.worker.run_once()
+        task_row = Task.objects.get()
+        self.assertEqual((task_row.status, task_row.attempts), ('queued', 1))
+        self.assertIn('boom', task_row.last_error)
+        self.assertGreater(task_row.run_at, timezone.now() + timedelta(seconds=5))
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('tasks.worker', 'ERROR'):
+            self.worker.run_once()
+        task_row.refresh_from_db()
+        self.assertEqual((task_row.status, task_row.attempts), ('failed', 2))
+
+    def test_unknown_tasks_fail(self):
+        Task.objects.create(name='tasks.tests.missing', run_at=timezone.now())
+        with self.assertLogs('tasks.worker', 'ERROR'):
+            self.worker.run_once()
+        self.assertEqual(Task.objects.get().status, 'failed')
+
+    def test_stale_tasks_are_requeued(self):
+        record.enqueue('x')
+        Task.objects.update(status='running', started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.worker.requeue_stale(), 1)
+        self.assertEqual(self.worker.run_once(), 1)
+
+    def test_stale_tasks_without_attempts_left_fail(self):
+        record.enqueue('x')
+        Task.objects.update(status='running', attempts=3, started_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('tasks.worker', 'ERROR'):
+            self.assertEqual(self.worker.requeue_stale(), 1)
+        self.assertEqual(Task.objects.get().status, 'failed')
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_old_finished_tasks_are_purged(self):
+        record.enqueue('old')
+        record.enqueue('new')
+        self.worker.run_once()
+        Task.objects.filter(args=['old']).update(finished_at=timezone.now() - timedelta(days=30))
+        explode.enqueue()
+        self.assertEqual(self.worker.purge_finished(), 1)
+        self.assertEqual(sorted(Task.objects.values_list('status', flat=True)), ['done', 'queued'])
+
+    def test_a_requeued_task_is_left_to_its_new_run(self):
+        record.enqueue('x')
+        [task_row] = self.worker.claim()
+        # It outran its lease: requeued and claimed again by another worker.
+        Task.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.worker.requeue_stale()
+        [again] = Worker().claim()
+        with self.assertLogs('tasks.worker', 'WARNING'):
+            self.worker._finish(task_row, None)
+        again.refresh_from_db()
+        self.assertEqual(again.status, 'running')
+
+    def test_queue_stats(self):
+        record.enqueue('x')
+        record.enqueue('y')
+        self.assertEqual(queue_stats()['depth']['queued'], 2)
+        self.worker.run_once()
+        stats = queue_stats()
+        self.assertEqual((stats['depth']['done'], stats['sampled']), (2, 2))
+
+
+class TaskUsageTests(TestCase):
+    def test_signup_queues_verification_email(self):
+        self.client.post(reverse('applicant_signup'), {
+            'first_name': 'Ada', 'last_name': 'L', 'username': 'ada', 'email': 'ada@example.com',
+            'password': 'pass12345', 'confirm_password': 'pass12345',
+        })
+        queued = Task.objects.get()
+        self.assertEqual(queued.name, 'accounts.tasks.send_verification_email')
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_verification_link_works(self):
+        self.client.post(reverse('company_signup'), {
+            'username': 'acme', 'email': 'hr@acme.com', 'company_name': 'Acme',
+            'password': 'pass12345', 'confirm_password': 'pass12345',
+        })
+        self.assertEqual(len(mail.outbox), 1)
+        link = mail.outbox[0].body.split('href="')[1].split('"')[0]
+        self.client.get(link)
+        self.assertTrue(User.objects.get(username='acme').email_verified)
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get(reverse('task_metrics')).status_code, 302)
+        User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        self.client.login(username='root', password='pass12345')
+        self.assertEqual(self.client.get(reverse('task_metrics')).json()['depth']['queued'], 0)
@@ -0,0 +1,8 @@
+# Path: /tasks/urls.py
+
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metrics/', views.metrics, name='task_metrics'),
+]
@@ -0,0 +1,12 @@
+# Path: /tasks/views.py
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .worker import queue_stats
+
+
+@staff_member_required
+def metrics(request):
+    """Queue depth and latency, as JSON, for staff and monitoring."""
+    return JsonResponse(queue_stats())
@@ -0,0 +1,223 @@
+# Path: /tasks/worker.py
+
+"""
+The worker that runs queued tasks (started with 'manage.py run_worker').
+
+A worker repeatedly claims a batch of due tasks, runs them on a thread or
+process pool and records the outcome. Failed tasks are retried with
+exponential backoff until they run out of attempts. Now and then the worker
+also puts back tasks whose worker died, and deletes finished tasks older than
+TASKS_KEEP_FINISHED_DAYS.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED on databases that support it,
+so many workers can share one queue without blocking each other. SQLite has no
+row locks, but it only allows one writer at a time, so there a single
+conditional UPDATE claims the batch atomically instead.
+"""
+
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Task
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+
+def _run_task(name, args, kwargs):
+    """Runs one task and returns None on success or the error text on failure."""
+    task = get_task(name)
+    if task is None:
+        return f"Unknown task {name!r}"
+    try:
+        task.func(*args, **kwargs)
+        return None
+    except Exception:
+        return traceback.format_exc()
+    finally:
+        # Pool threads/processes live for a long time; don't keep connections open between tasks.
+        connections.close_all()
+
+
+def _init_process():
+    import django
+    django.setup()
+
+
+class Worker:
+    def __init__(self, concurrency=None, use_processes=False, batch_size=None, poll_interval=1.0,
+                 lease_seconds=None, using=DEFAULT_DB_ALIAS):
+        self.concurrency = concurrency or getattr(settings, 'TASKS_WORKER_CONCURRENCY', 4)
+        self.use_processes = use_processes
+        self.batch_size = batch_size or self.concurrency * 2
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds or getattr(settings, 'TASKS_LEASE_SECONDS', 300)
+        self.using = using
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool = None
+
+    # --- Claiming ---
+
+    def claim(self, limit=None):
+        """Marks up to 'limit' due tasks as running for this worker and returns them."""
+        limit = limit or self.batch_size
+        now = timezone.now()
+        token = f"{self.name}:{uuid.uuid4().hex[:8]}"
+        due = Task.objects.using(self.using).filter(status='queued', run_at__lte=now).order_by('run_at', 'pk')
+        claim = {'status': 'running', 'locked_by': token, 'started_at': now, 'attempts': F('attempts') + 1}
+        try:
+            if connections[self.using].features.has_select_for_update_skip_locked:
+                with transaction.atomic(using=self.using):
+                    ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+                    Task.objects.using(self.using).filter(pk__in=ids).update(**claim)
+            else:
+                Task.objects.using(self.using).filter(
+                    pk__in=due.values('pk')[:limit], status='queued',
+                ).update(**claim)
+        except OperationalError:
+            # Another worker holds the write lock right now; try again next round.
+            logger.debug("Could not claim tasks, database busy.")
+            return []
+        return list(Task.objects.using(self.using).filter(locked_by=token, status='running'))
+
+    def requeue_stale(self):
+        """
+        Puts back tasks whose worker died while running them. A task that has
+        used up its attempts is marked failed instead, so a task that keeps
+        killing its worker doesn't come back forever. Returns how many tasks
+        were put back or failed.
+        """
+        now = timezone.now()
+        stale = Task.objects.using(self.using).filter(
+            status='running', started_at__lt=now - timedelta(seconds=self.lease_seconds),
+        )
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status='failed', locked_by='', finished_at=now,
+            last_error="The worker running it stopped and it has no attempts left.",
+        )
+        if failed:
+            logger.error("%s stale task(s) failed for good: no attempts left.", failed)
+        return failed + stale.update(status='queued', locked_by='', run_at=now)
+
+    def purge_finished(self, batch_size=1000):
+        """
+        Deletes done and failed tasks that finished more than
+        TASKS_KEEP_FINISHED_DAYS ago, a batch at a time so the table isn't
+        locked for long. Returns how many were deleted.
+        """
+        cutoff = timezone.now() - timedelta(days=getattr(settings, 'TASKS_KEEP_FINISHED_DAYS', 7))
+        tasks = Task.objects.using(self.using)
+        deleted = 0
+        for status in ('done', 'failed'):
+            # The (status, finished_at) index finds these without a table scan.
+            old = tasks.filter(status=status, finished_at__lt=cutoff)
+            while ids := list(old.values_list('pk', flat=True)[:batch_size]):
+                deleted += tasks.filter(pk__in=ids).delete()[0]
+        return deleted
+
+    # --- Running ---
+
+    def _finish(self, task, error):
+        now = timezone.now()
+        if error is None:
+            changes = {'status': 'done', 'finished_at': now, 'last_error': ''}
+        else:
+            registered = get_task(task.name)
+            if registered is None or task.attempts >= task.max_attempts:
+                logger.error("Task %s failed for good after %s attempt(s):\n%s", task, task.attempts, error)
+                changes = {'status': 'failed', 'finished_at': now, 'last_error': error}
+            else:
+                delay = registered.retry_delay(task.attempts)
+                logger.warning("Task %s failed, retrying in %ss:\n%s", task, delay, error)
+                changes = {'status': 'queued', 'locked_by': '', 'run_at': now + timedelta(seconds=delay),
+                           'last_error': error}
+        # Only while the task is still ours: if it outran its lease,
+        # requeue_stale() may have handed it to another run meanwhile, and
+        # that run's result is the one to keep.
+        tasks = Task.objects.using(self.using).filter(pk=task.pk, locked_by=task.locked_by)
+        if not tasks.update(**changes):
+            logger.warning("Task %s was requeued while it ran; leaving it to its new run.", task)
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.use_processes:
+                # Forked children must not share our database connections.
+                connections.close_all()
+                self._pool = ProcessPoolExecutor(self.concurrency, initializer=_init_process)
+            else:
+                self._pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix='task-worker')
+        return self._pool
+
+    def run_once(self):
+        """Claims one batch, runs it to completion and returns how many tasks ran."""
+        tasks = self.claim()
+        if not tasks:
+            return 0
+        pool = self._get_pool()
+        futures = [(task, pool.submit(_run_task, task.name, task.args, task.kwargs)) for task in tasks]
+        for task, future in futures:
+            try:
+                error = future.result()
+            except Exception:
+                error = traceback.format_exc()
+            self._finish(task, error)
+        return len(tasks)
+
+    def run_forever(self, stop=None, housekeeping_interval=60):
+        """Keeps running batches until 'stop()' returns True (or forever)."""
+        logger.info("Worker %s started with %s %s.", self.name, self.concurrency,
+                    'processes' if self.use_processes else 'threads')
+        last_housekeeping = 0
+        try:
+            while not (stop and stop()):
+                if time.monotonic() - last_housekeeping > housekeeping_interval:
+                    self.requeue_stale()
+                    self.purge_finished()
+                    last_housekeeping = time.monotonic()
+                if not self.run_once():
+                    time.sleep(self.poll_interval)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+def queue_stats(using=DEFAULT_DB_ALIAS, sample=1000):
+    """
+    Returns queue depth per status and latency figures:
+    'oldest_due_age_s' is how long the oldest due task has been waiting, and
+    'wait_ms'/'run_ms' are averages over the last 'sample' finished tasks.
+    """
+    now = timezone.now()
+    tasks = Task.objects.using(using)
+    depth = {status: 0 for status, _ in Task.STATUS_CHOICES}
+    depth.update(tasks.values_list('status').annotate(total=Count('pk')).order_by())
+
+    oldest = tasks.filter(status='queued', run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    recent = list(
+        tasks.filter(status='done').order_by('-finished_at')
+        .values_list('run_at', 'started_at', 'finished_at')[:sample]
+    )
+    waits = [(started - run_at).total_seconds() for run_at, started, _ in recent]
+    runs = [(finished - started).total_seconds() for _, started, finished in recent]
+    return {
+        'depth': depth,
+        'oldest_due_age_s': round((now - oldest).total_seconds(), 3) if oldest else 0,
+        'wait_ms': round(1000 * sum(waits) / len(waits), 1) if waits else None,
+        'run_ms': round(1000 * sum(runs) / len(runs), 1) if runs else None,
+        'sampled': len(recent),
+    }